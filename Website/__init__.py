@@ -3,9 +3,10 @@ from config import Config
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
-import markdown
+from .replica import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession sends reads from @use_replica views to the replica bind
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app(config_class=Config):
@@ -17,26 +18,63 @@ def create_app(config_class=Config):
     enables to run flask db commands from terminal to manage schema
     create_all() only creates tables that don’t exist yet, so using 
     this instead is more scalable'''
-    migrate.init_app(app, db)
+    from .search import include_object
+    migrate.init_app(app, db, include_object=include_object)
     login_manager=LoginManager()
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
-    from .models import User
+    # current_user is a cached snapshot rather than a fresh User row per
+    # request (see identity.py)
+    from .identity import identity_cache
+    identity_cache.init_app(app)
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return identity_cache.load(int(user_id))
+
+    from .llm import init_llm
+    from .jobs import report_jobs
+    from .cache import summary_cache
+    init_llm(app)
+    report_jobs.init_app(app)
+    summary_cache.init_app(app)
+
+    # engines for the async views of the ASGI app (see asgi.py)
+    from .asyncdb import async_db
+    async_db.init_app(app)
+
+    from .storage import init_storage
+    from .previews import previews
+    init_storage(app)
+    previews.init_app(app)
+    from .avatars import avatars, avatar_url
+    avatars.init_app(app)
+    app.jinja_env.globals['avatar_url'] = avatar_url
 
     from .auth import auth
     from .views import views
 
     app.register_blueprint(views,url_prefix='/')
     app.register_blueprint(auth,url_prefix='/')
+
+    # Prometheus /metrics: request latency/counters, DB time, LLM durations
+    from .metrics import init_metrics
+    init_metrics(app)
+
+    # per-request query counts / N+1 warnings, off unless SQL_PROFILING is set
+    from .sqlstats import init_sql_stats
+    init_sql_stats(app)
+
+    # ETags for the record pages from the per-user data revision
+    from .revisions import init_revisions
+    init_revisions(app)
+
+    from .commands import register_commands
+    register_commands(app)
     
-    # Add custom Jinja2 filter for markdown rendering
-    @app.template_filter('markdown')
-    def markdown_filter(text):
-        return markdown.markdown(text, extensions=['nl2br', 'fenced_code'])
+    # Add custom Jinja2 filter for markdown rendering (cached, see rendering.py)
+    from .rendering import init_rendering
+    init_rendering(app)
     
     # Add context processor for current year
     from datetime import datetime
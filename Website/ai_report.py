@@ -1,34 +1,69 @@
-from .models import JournalEntry, Medication, Visit
+from .models import JournalEntry, Medication, Visit, Report
+from . import db
 from datetime import datetime
+from sqlalchemy import select, literal, union_all, cast, null
 from flask import current_app
-from google import genai
-from google.genai import types
-import os 
+from .llm import get_llm
+from .asyncdb import get_async_db
+from .cache import get_summary_cache, summary_cache_key
+from .prompt import compact_journal_lines, estimate_tokens, format_entry
+from .rendering import get_renderer
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the prompt text below changes, so cached summaries built from
+# the old prompt are not served for the new one
+PROMPT_VERSION = 1
 
 class ReportGenerator:
     def __init__(self,user_id):
         self.id=user_id
+        self.last_error=None
+
+
+    def _section_queries(self,start,end):
+        # Only the columns the prompt uses, as (section, date, text_a, text_b)
+        # so the three selects can be combined into one UNION ALL
+        journals = select(literal('journal').label('section'),
+                          JournalEntry.created_at.label('event_date'),
+                          JournalEntry.content.label('text_a'),
+                          JournalEntry.severity.label('text_b')
+                          ).where(JournalEntry.user_id==self.id,
+                                  JournalEntry.created_at.between(start,end))
+        visits = select(literal('visit'), Visit.visit_date, Visit.reason, Visit.diagnosis
+                        ).where(Visit.user_id==self.id,
+                                Visit.visit_date.between(start,end))
+        medications = select(literal('medication'), cast(null(), db.DateTime(timezone=True)),
+                             Medication.name, Medication.dosage
+                             ).where(Medication.user_id==self.id)
+        return journals, visits, medications
+
+
+    def fetch_rows(self,start,end,single_round_trip=True,session=None):
+        """Returns (journal_rows, visit_rows, medication_rows) for the report.
+        Visits are bounded by the same date window as the journal entries;
+        medications have no date and are all current."""
+        session = db.session if session is None else session
+        sections = {'journal': [], 'visit': [], 'medication': []}
+        queries = self._section_queries(start,end)
+        if single_round_trip:
+            merged = union_all(*queries).subquery()
+            rows = session.execute(
+                select(merged).order_by(merged.c.section, merged.c.event_date, merged.c.text_a))
+        else:
+            rows = [row for query in queries for row in session.execute(query)]
+        for section, event_date, text_a, text_b in rows:
+            sections[section].append((event_date, text_a, text_b))
+        return sections['journal'], sections['visit'], sections['medication']
 
 
-    def fetch_data(self,start,end):
-
-        j_list=[]
-        journals =JournalEntry.query.filter(JournalEntry.user_id==self.id,JournalEntry.created_at.between(start,end)).all()
-
-        for journal in journals:
-            j_list.append(f"{journal.created_at.strftime('%Y-%m-%d')}: {journal.content}. {journal.severity}")
+    def fetch_data(self,start,end,session=None):
+        journals, visits, medications = self.fetch_rows(start,end,session=session)
 
-        if not j_list:
-            journal_details = "No symptom logs found for this specific period."
-        else:
-            journal_details = "### RECENT SYMPTOMS\n"+"\n".join(j_list)
-
-        
         v_list=[]
-        visits= Visit.query.filter(Visit.user_id==self.id).all()
-        
-        for visit in visits:
-            v_list.append(f"{visit.visit_date.strftime('%Y-%m-%d')}: {visit.reason}.  {visit.diagnosis}")
+        for visit_date, reason, diagnosis in visits:
+            v_list.append(f"{visit_date.strftime('%Y-%m-%d')}: {reason}.  {diagnosis}")
 
         if not v_list:
             visit_details = "No visits found."
@@ -36,27 +71,38 @@ class ReportGenerator:
             visit_details = "### CLINICAL HISTORY\n" + "\n".join(v_list)
 
         m_list=[]
-        medications = Medication.query.filter(Medication.user_id==self.id).all()
-
-        for medicine in medications:
-            m_list.append(f"{medicine.name}  {medicine.dosage}")
+        for _, name, dosage in medications:
+            m_list.append(f"{name}  {dosage}")
 
         if not m_list:
             medication_details = "No medications found."
         else:
             medication_details = "### CURRENT MEDICATIONS\n" +"\n".join(m_list)
 
+        # Journals get whatever the prompt budget leaves after everything else
+        budget = current_app.config['PROMPT_TOKEN_BUDGET']
+        fixed_tokens = estimate_tokens(self.build_prompt(["### RECENT SYMPTOMS\n", visit_details, medication_details]))
+        j_list, stages = compact_journal_lines(journals, max(budget - fixed_tokens, 0))
+
+        if not j_list:
+            journal_details = "No symptom logs found for this specific period."
+        else:
+            journal_details = "### RECENT SYMPTOMS\n"+"\n".join(j_list)
+
+        original_tokens = fixed_tokens + estimate_tokens("\n".join(format_entry(*row) for row in journals))
+        compacted_tokens = fixed_tokens + estimate_tokens("\n".join(j_list))
+        logger.info("Report prompt for user %s: %d journal entries, ~%d tokens -> ~%d tokens "
+                    "(budget %d, compaction: %s)", self.id, len(journals), original_tokens,
+                    compacted_tokens, budget, ', '.join(stages) or 'none')
+
         return [journal_details, visit_details, medication_details]
     
 
 
-    def generate_summary(self,raw_data_list):
+    def build_prompt(self,raw_data_list):
         journals, visits, meds = raw_data_list
 
-        api_key = current_app.config['GEMINI_API_KEY']
-        client = genai.Client(api_key=api_key)
-
-        prompt = f"""You are an expert Medical Documentation Specialist creating a pre-consultation brief for a physician.
+        return f"""You are an expert Medical Documentation Specialist creating a pre-consultation brief for a physician.
 
 ## PATIENT DATA PROVIDED:
 
@@ -147,12 +193,113 @@ Create a concise, scannable consultation brief using the SOAP format. The doctor
 ✗ Do NOT include filler words or unnecessary elaboration
 
 Remember: Clarity and scannability are paramount. The physician needs to grasp the patient's status at a glance."""
-        
+
+
+    def source_hash(self,raw_data_list):
+        """Content address of a report: what the summary cache and the stored
+        Report rows are keyed by."""
+        return summary_cache_key(raw_data_list, current_app.config['GEMINI_MODEL'], PROMPT_VERSION)
+
+
+    def find_report(self,start,end,raw_data_list,session=None):
+        """A stored report for this period built from exactly this data, if there is one."""
+        session = db.session if session is None else session
+        return session.scalars(
+            select(Report)
+            .filter_by(user_id=self.id, source_hash=self.source_hash(raw_data_list),
+                       start_date=start, end_date=end)
+            .order_by(Report.created_at.desc())
+            .limit(1)
+        ).first()
+
+
+    def save_report(self,start,end,raw_data_list,summary,session=None):
+        session = db.session if session is None else session
+        report = Report(user_id=self.id,
+                        start_date=start,
+                        end_date=end,
+                        source_hash=self.source_hash(raw_data_list),
+                        model=current_app.config['GEMINI_MODEL'],
+                        markdown=summary,
+                        html=get_renderer().render(summary))
+        session.add(report)
+        session.commit()
+        return report
+
+
+    def summarize(self,raw_data_list):
+        """Like generate_summary, but raises instead of returning the error text."""
+        model = current_app.config['GEMINI_MODEL']
+        cache = get_summary_cache()
+        key = self.source_hash(raw_data_list)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        prompt = self.build_prompt(raw_data_list)
+        summary = get_llm().generate(prompt, model=model)
+        cache.set(key, self.id, summary, model)
+        return summary
+
+
+    def generate_summary(self,raw_data_list):
+        try:
+            return self.summarize(raw_data_list)
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+
+    def stream_summary(self,raw_data_list):
+        """Yields the summary as markdown chunks as soon as the model produces
+        them. The full text is cached at the end just like generate_summary.
+        If the model fails the error text is yielded and kept in last_error."""
+        self.last_error = None
+        model = current_app.config['GEMINI_MODEL']
+        cache = get_summary_cache()
+        key = self.source_hash(raw_data_list)
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self.build_prompt(raw_data_list)
+
+        chunks = []
+        try:
+            for chunk in get_llm().stream(prompt, model=model):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            self.last_error = str(e)
+            yield f"\n\nError generating summary: {str(e)}"
+            return
+        cache.set(key, self.id, ''.join(chunks), model)
+
+
+    async def astream_summary(self,raw_data_list):
+        """stream_summary for the ASGI app (see asgi.py): the model is awaited
+        instead of holding a thread, and the summary cache is read and written
+        over the async engine."""
+        self.last_error = None
+        model = current_app.config['GEMINI_MODEL']
+        cache = get_summary_cache()
+        key = self.source_hash(raw_data_list)
+        async_db = get_async_db()
+        cached = await async_db.run(lambda session: cache.get(key, session=session))
+        if cached is not None:
+            yield cached
+            return
+
+        prompt = self.build_prompt(raw_data_list)
+
+        chunks = []
         try:
-            response = client.models.generate_content(
-                model='gemini-2.5-flash',
-                contents=prompt
-            )
-            return response.text
+            async for chunk in get_llm().astream(prompt, model=model):
+                chunks.append(chunk)
+                yield chunk
         except Exception as e:
-            return f"Error generating summary: {str(e)}"
\ No newline at end of file
+            self.last_error = str(e)
+            yield f"\n\nError generating summary: {str(e)}"
+            return
+        summary = ''.join(chunks)
+        await async_db.run(lambda session: cache.set(key, self.id, summary, model, session=session))
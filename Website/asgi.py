@@ -0,0 +1,378 @@
+import io
+import json
+from collections import namedtuple
+from contextlib import aclosing
+from datetime import datetime
+from functools import wraps
+
+import anyio
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from flask import Response, abort, current_app, flash, redirect, request, request_started, url_for
+from flask_login import current_user
+from flask_wtf.csrf import validate_csrf
+from sqlalchemy import select
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.utils import secure_filename
+from wtforms.validators import ValidationError
+
+from . import db
+from .ai_report import ReportGenerator
+from .asyncdb import get_async_db
+from .forms import DOCUMENT_EXTENSIONS
+from .models import MedicalDocument, Visit
+from .previews import get_previews
+from .replica import stick_to_primary
+from .search import search_records
+from .storage import CHUNK_SIZE, UploadTooLarge, get_storage
+from .views import render_search_results
+
+'''
+ASGI entry point (see asgi.py in the project root):
+
+    uvicorn asgi:app
+
+The slow, I/O-bound routes (streaming a report, uploading and downloading
+documents, search) are served by the coroutines below. They await the model,
+the database (asyncdb.py), the request body and the disk instead of holding a
+thread, so one worker keeps hundreds of them in flight. Every other request
+goes to the unchanged Flask app through a2wsgi, on ASGI_WSGI_THREADS threads.
+
+A coroutine is picked by Flask endpoint and method, so the URLs and url_for()
+are those of views.py. It runs inside an ordinary request context: the
+session, flash(), templates, before/after_request hooks (metrics, SQL stats)
+and error handlers work as they do for the sync views.
+'''
+
+_VIEWS = {}
+
+# a file part being written to storage
+_Upload = namedtuple('_Upload', 'filename writer')
+
+
+def async_view(endpoint, methods, streams_body=False):
+    '''Serves `endpoint` for `methods` with the decorated coroutine, called as
+    view(receive, **view_args). The request body is read into request.form
+    first unless `streams_body`, in which case the view reads `receive`.'''
+    def register(view):
+        for method in methods:
+            _VIEWS[(endpoint, method)] = (view, streams_body)
+        return view
+    return register
+
+
+def _load_user():
+    try:
+        return current_user._get_current_object()
+    finally:
+        # hand the loader's connection back now: the view may run for minutes
+        db.session.close()
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(receive, **kwargs):
+        # the user loader may query the database (identity.py), so not on the loop
+        user = await anyio.to_thread.run_sync(_load_user)
+        if not user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        return await view(receive, **kwargs)
+    return wrapper
+
+
+def stream(response, body):
+    '''Makes an async iterator of str/bytes the body of `response`.'''
+    response.async_body = body
+    response.automatically_set_content_length = False
+    return response
+
+
+class AsyncApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config.get('ASGI_WSGI_THREADS', 10))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        route = self.match(scope) if scope['type'] == 'http' else None
+        if route is None:
+            await self.wsgi(scope, receive, send)
+        else:
+            await self.dispatch(*route, scope, receive, send)
+
+    def match(self, scope):
+        adapter = self.flask_app.url_map.bind_to_environ(build_environ(scope, io.BytesIO()))
+        try:
+            endpoint, _ = adapter.match()
+        except HTTPException:
+            # 404s, 405s and redirects are the sync app's business
+            return None
+        return _VIEWS.get((endpoint, scope['method']))
+
+    async def dispatch(self, view, streams_body, scope, receive, send):
+        # the same steps as Flask.wsgi_app / full_dispatch_request, with the view awaited
+        app = self.flask_app
+        body = b'' if streams_body else await _read_body(receive)
+        environ = build_environ(scope, io.BytesIO(body))
+        ctx = app.request_context(environ)
+        ctx.push()
+        error = None
+        try:
+            try:
+                try:
+                    request_started.send(app, _async_wrapper=app.ensure_sync)
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(receive, **request.view_args)
+                except Exception as e:
+                    rv = app.handle_user_exception(e)
+                response = app.finalize_request(rv)
+            except Exception as e:
+                error = e
+                response = app.handle_exception(e)
+            await _send_response(response, environ, send)
+        finally:
+            ctx.pop(error)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.flask_app.extensions['async_db'].dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def create_asgi_app(flask_app):
+    return AsyncApp(flask_app)
+
+
+async def _read_body(receive):
+    chunks = []
+    more = True
+    while more:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        more = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def _send_response(response, environ, send):
+    headers = response.get_wsgi_headers(environ)
+    await send({'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in headers.to_wsgi_list()]})
+    try:
+        body = getattr(response, 'async_body', None)
+        if body is None or response.status_code in (204, 304):
+            # werkzeug leaves out the body of 304s, 204s and HEAD responses
+            for chunk in response.get_app_iter(environ):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        else:
+            async with aclosing(body):
+                async for chunk in body:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        response.close()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _file_chunks(path, start, length):
+    async with await anyio.open_file(path, 'rb') as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def _receive_upload(receive, storage):
+    '''Parses the multipart body as it arrives. Returns the form fields and the
+    `file` part, which has been written to a BlobWriter chunk by chunk.'''
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    if mimetype != 'multipart/form-data' or not options.get('boundary'):
+        abort(400)
+    max_field_size = current_app.config['MAX_FORM_MEMORY_SIZE']
+    decoder = MultipartDecoder(options['boundary'].encode('latin-1'), max_field_size,
+                               max_parts=current_app.config['MAX_FORM_PARTS'])
+    fields, upload, part, buffer = {}, None, None, []
+    try:
+        more = True
+        while more:
+            message = await receive()
+            more = message.get('more_body', False)
+            decoder.receive_data(message.get('body', b''))
+            if not more:
+                decoder.receive_data(None)
+            event = decoder.next_event()
+            while not isinstance(event, (NeedData, Epilogue)):
+                if isinstance(event, Field):
+                    part, buffer = event, []
+                elif isinstance(event, File):
+                    part = event
+                    if event.name == 'file' and upload is None:
+                        upload = _Upload(event.filename, storage.writer())
+                        upload_part = event
+                elif isinstance(part, Field):
+                    buffer.append(event.data)
+                    if sum(map(len, buffer)) > max_field_size:
+                        raise RequestEntityTooLarge()
+                    if not event.more_data:
+                        fields[part.name] = b''.join(buffer).decode('utf-8', 'replace')
+                elif upload is not None and part is upload_part:
+                    upload.writer.write(event.data)
+                event = decoder.next_event()
+    except BaseException as e:
+        if upload is not None:
+            upload.writer.discard()
+        if isinstance(e, ValueError) and not isinstance(e, UploadTooLarge):
+            # truncated or malformed body
+            abort(400)
+        raise
+    return fields, upload
+
+
+# --- views ------------------------------------------------------------------
+
+@async_view('views.report_stream', ['GET'])
+@login_required
+async def report_stream(receive):
+    """views.report_stream, awaiting the model (LLM astream) and the database."""
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        abort(400)
+    if start_date > end_date:
+        abort(400)
+
+    report = ReportGenerator(current_user.id)
+    async_db = get_async_db()
+    raw_data = await async_db.run(lambda session: report.fetch_data(start_date, end_date, session=session))
+    render_markdown = current_app.jinja_env.filters['markdown']
+
+    async def events():
+        parts = []
+        async for chunk in report.astream_summary(raw_data):
+            parts.append(chunk)
+            yield f"data: {json.dumps(chunk)}\n\n"
+        summary = ''.join(parts)
+        done = {'html': render_markdown(summary), 'url': None}
+        if report.last_error is None:
+            stored = await async_db.run(lambda session: (
+                report.find_report(start_date, end_date, raw_data, session=session)
+                or report.save_report(start_date, end_date, raw_data, summary, session=session)))
+            done = {'html': stored.html, 'url': url_for('views.report_detail', report_id=stored.id)}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return stream(Response(mimetype='text/event-stream',
+                           headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}),
+                  events())
+
+
+@async_view('views.search', ['GET', 'POST'])
+@login_required
+async def search(receive):
+    """views.search over the async engine, reading from the replica if there is one."""
+    query = request.values.get('search_query', '').strip()
+    page = request.args.get('page', 1, type=int)
+    if not query:
+        flash('Please enter a search term.', 'warning')
+        return redirect(url_for('views.dashboard'))
+
+    user_id = current_user.id
+    per_page = current_app.config['SEARCH_PAGE_SIZE']
+    results = await get_async_db().run(
+        lambda session: search_records(user_id, query, page=page, per_page=per_page, session=session),
+        replica=True)
+    return render_search_results(query, results)
+
+
+@async_view('views.get_file', ['GET'])
+@login_required
+async def get_file(receive, doc_id):
+    """views.get_file; the bytes are read off the disk without holding a thread
+    for the whole download."""
+    user_id = current_user.id
+    doc = await get_async_db().run(lambda session: session.scalars(
+        select(MedicalDocument).filter_by(id=doc_id, user_id=user_id)).first())
+    if doc is None:
+        abort(404)
+    storage = get_storage()
+    # headers, conditional GET, Range and sendfile offload as for the sync view
+    response = storage.send(doc)
+    if response is None:
+        abort(404)
+    if response.direct_passthrough and response.status_code in (200, 206):
+        start = response.content_range.start if response.content_range else 0
+        length = response.content_length
+        response.close()
+        stream(response, _file_chunks(storage.resolve(doc), start, length))
+    return response
+
+
+def _record_document(session, storage, blob, filename, user_id, visit_id):
+    if visit_id is not None and session.scalar(
+            select(Visit.id).filter_by(id=visit_id, user_id=user_id)) is None:
+        raise ValidationError('Not a valid choice.')
+    doc = MedicalDocument(filename=filename,
+                          filepath=blob.path,
+                          content_hash=blob.sha256,
+                          size=blob.size,
+                          preview_status='pending',
+                          user_id=user_id,
+                          visit_id=visit_id)
+    storage.add_reference(blob, session=session)
+    session.add(doc)
+    session.flush()
+    return doc
+
+
+@async_view('views.upload_document', ['POST'], streams_body=True)
+@login_required
+async def upload_document(receive):
+    """The POST side of views.upload_document: the upload is written to storage
+    as it arrives, so a slow client holds no thread. The form (GET) is still
+    rendered by the sync view, and errors are flashed there."""
+    storage = get_storage()
+    try:
+        fields, upload = await _receive_upload(receive, storage)
+    except UploadTooLarge as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('views.upload_document'))
+
+    # the checks DocumentUploadForm makes
+    try:
+        if current_app.config.get('WTF_CSRF_ENABLED', True):
+            validate_csrf(fields.get('csrf_token'))
+        if upload is None or not upload.filename:
+            raise ValidationError('This field is required.')
+        if upload.filename.rsplit('.', 1)[-1].lower() not in DOCUMENT_EXTENSIONS:
+            raise ValidationError('Images and PDFs only!')
+        visit_id = int(fields.get('visit') or 0) or None
+        filename = secure_filename(upload.filename)
+        with storage.store(upload.writer) as blob:
+            doc = await get_async_db().run(lambda session: _record_document(
+                session, storage, blob, filename, current_user.id, visit_id))
+    except (ValidationError, ValueError) as e:
+        if upload is not None:
+            upload.writer.discard()
+        flash(str(e) if isinstance(e, ValidationError) else 'Not a valid choice.', 'danger')
+        return redirect(url_for('views.upload_document'))
+    stick_to_primary()
+
+    # the thumbnail is rendered by the preview pool, not on this request
+    await anyio.to_thread.run_sync(get_previews().submit, doc, blob.path)
+    flash('Document uploaded successfully!', 'success')
+    return redirect(url_for('views.dashboard'))
@@ -0,0 +1,88 @@
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+
+from . import db
+from .replica import REPLICA_BIND, replica_allowed
+
+'''
+Async SQLAlchemy for the ASGI app (see asgi.py).
+
+The async views hand a plain function to AsyncDatabase.run(), which calls it
+with a Session whose I/O goes over an async driver (aiosqlite, asyncpg)
+through SQLAlchemy's greenlet bridge. So the async views share the ORM code
+of the sync ones (search_records, ReportGenerator.fetch_data, ...) without
+blocking the event loop on the database. Each run() is its own short
+transaction: a request waiting on the LLM holds no connection.
+
+The engines point at the same databases as db.engines and are created on
+first use, on the server's event loop; under plain WSGI nothing here runs.
+'''
+
+
+def async_database_url(url):
+    '''The async-driver equivalent of a sync SQLAlchemy URL.'''
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite')
+    if backend in ('postgres', 'postgresql'):
+        query = dict(url.query)
+        # asyncpg spells libpq's sslmode as ssl
+        if 'sslmode' in query:
+            query['ssl'] = query.pop('sslmode')
+        return url.set(drivername='postgresql+asyncpg', query=query)
+    raise ValueError(f'No async driver for {backend} databases')
+
+
+class AsyncDatabase:
+    def __init__(self, app=None):
+        self.engines = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.engines = {}
+        # same pool sizing as the sync engine (see config.ProductionConfig)
+        self.engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+        if app.config.get('DB_PGBOUNCER'):
+            # asyncpg prepares statements; under transaction pooling they must
+            # not be cached or reuse names across server connections
+            self.engine_options['connect_args'] = {
+                'statement_cache_size': 0,
+                'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__',
+            }
+        app.extensions['async_db'] = self
+
+    def engine(self, bind=None):
+        if bind not in self.engines:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            url = async_database_url(db.engines[bind].url)
+            self.engines[bind] = create_async_engine(url, **self.engine_options)
+        return self.engines[bind]
+
+    async def run(self, fn, replica=False):
+        '''Returns fn(session) and commits. With `replica`, reads go to the
+        replica if there is one and the user hasn't just written (replica.py);
+        callers that write and want that stickiness call stick_to_primary().'''
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        bind = REPLICA_BIND if replica and REPLICA_BIND in db.engines and replica_allowed() else None
+        async with AsyncSession(self.engine(bind), expire_on_commit=False) as session:
+            result = await session.run_sync(fn)
+            await session.commit()
+        return result
+
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+        self.engines = {}
+
+
+async_db = AsyncDatabase()
+
+
+def get_async_db():
+    return current_app.extensions['async_db']
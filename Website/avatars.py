@@ -0,0 +1,187 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app, url_for
+
+from . import db
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+'''
+Profile pictures, processed off the request thread.
+
+The upload is streamed to a temp file (hashing it on the way, and refusing it
+past MAX_AVATAR_SIZE) and handed to a small process pool; the request returns straight away. The worker decodes
+JPEGs in draft mode (at a fraction of full resolution), crops to a square and
+writes one WebP per size in AVATAR_SIZES as <hash>-<size>.webp. Only then is
+User.image_file switched to the hash and the previous picture removed.
+
+Because the names are content hashes a file never changes, so /avatars/ is
+served with far-future cache headers. image_file values with an extension
+(default.jpg, older uploads) are single files from before this and still work.
+'''
+
+AVATAR_SIZES = (64, 128, 256)
+CHUNK_SIZE = 256 * 1024
+
+
+class AvatarBusy(RuntimeError):
+    pass
+
+
+class AvatarTooLarge(ValueError):
+    pass
+
+
+def render_avatar(source_path, out_dir, name, sizes):
+    '''Runs in a pool process: no app, no database.'''
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(source_path) as image:
+            # JPEG only: let the decoder scale down by up to 8x while decoding
+            image.draft('RGB', (max(sizes) * 2, max(sizes) * 2))
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            for size in sizes:
+                path = os.path.join(out_dir, f'{name}-{size}.webp')
+                tmp_path = path + '.tmp'
+                ImageOps.fit(image, (size, size), Image.LANCZOS).save(tmp_path, 'WEBP', quality=82, method=4)
+                os.replace(tmp_path, path)
+    finally:
+        os.remove(source_path)
+    return name
+
+
+def is_processed(image_file):
+    return '.' not in image_file
+
+
+def avatar_filenames(image_file):
+    if is_processed(image_file):
+        return [f'{image_file}-{size}.webp' for size in AVATAR_SIZES]
+    return [image_file]
+
+
+class AvatarProcessor:
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.eager = app.config.get('AVATARS_EAGER', False)
+        self.workers = app.config.get('AVATAR_WORKERS', 1)
+        self.directory = app.config['AVATAR_DIR']
+        self.tmp_dir = app.config['AVATAR_TMP_DIR']
+        self.max_size = app.config.get('MAX_AVATAR_SIZE', 5 * 1024 * 1024)
+        # uploads waiting for or in the pool; past this the upload is refused
+        # rather than queued without bound
+        self.slots = threading.BoundedSemaphore(self.workers * 4)
+        app.extensions['avatars'] = self
+
+    def _pool(self):
+        if self.executor is None:
+            with self._lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                        mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def _receive(self, file_storage):
+        '''Streams the upload to a temp file; returns (path, content hash).
+        Raises AvatarTooLarge, leaving nothing behind, past max_size.'''
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = file_storage.stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise AvatarTooLarge(f'Pictures can be at most {self.max_size // (1024 * 1024)} MB.')
+                    digest.update(chunk)
+                    out.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+        # 16 hex chars: fits User.image_file and is plenty to tell pictures apart
+        return path, digest.hexdigest()[:16]
+
+    def submit(self, user_id, file_storage):
+        if not self.slots.acquire(blocking=False):
+            raise AvatarBusy('Too many pictures are being processed, please try again in a moment.')
+        try:
+            source_path, name = self._receive(file_storage)
+        except BaseException:
+            self.slots.release()
+            raise
+        args = (source_path, self.directory, name, AVATAR_SIZES)
+        if self.eager:
+            try:
+                self._finish(user_id, render_avatar(*args), None)
+            except Exception as e:
+                self._finish(user_id, None, e)
+            return
+        try:
+            future = self._pool().submit(render_avatar, *args)
+        except Exception as e:
+            self._finish(user_id, None, e)
+            return
+        future.add_done_callback(
+            lambda f: self._finish(user_id, None if f.exception() else f.result(), f.exception()))
+
+    def _finish(self, user_id, name, exc):
+        try:
+            if exc is not None:
+                logger.warning('Avatar for user %s failed: %r', user_id, exc)
+                return
+            with self.app.app_context():
+                user = db.session.get(User, user_id)
+                if user is None:
+                    return
+                old = user.image_file
+                # an ORM change, so the identity cache version is bumped too
+                user.image_file = name
+                db.session.commit()
+                if old != name:
+                    self._remove_unused(old)
+        finally:
+            self.slots.release()
+
+    def _remove_unused(self, image_file):
+        if image_file == 'default.jpg' or User.query.filter_by(image_file=image_file).first():
+            return
+        for filename in avatar_filenames(image_file):
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+avatars = AvatarProcessor()
+
+
+def get_avatars():
+    return current_app.extensions['avatars']
+
+
+def avatar_url(user, size=128):
+    '''Jinja global: URL of the user's picture at (at least) `size` pixels.'''
+    if is_processed(user.image_file):
+        size = next((s for s in AVATAR_SIZES if s >= size), AVATAR_SIZES[-1])
+        return url_for('views.avatar', filename=f'{user.image_file}-{size}.webp')
+    return url_for('static', filename='profile_pics/' + user.image_file)
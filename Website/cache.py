@@ -0,0 +1,154 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import JournalEntry, Medication, SummaryCacheEntry, Visit
+
+
+class LRUCache:
+    '''Small thread-safe LRU with a per-entry TTL. Used as the in-process tier
+    in front of slower stores.'''
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def summary_cache_key(raw_data_list, model, prompt_version):
+    '''Content address of a summary: the exact data the prompt is built from
+    plus everything else that changes the model output.'''
+    payload = json.dumps([prompt_version, model, *raw_data_list], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    '''Generated report summaries, keyed by summary_cache_key().
+
+    Lookups go to a per-process LRU first and then to the summary_cache_entry
+    table, which survives restarts and is shared by every gunicorn worker.
+    Since the key hashes the source data, an edit can never serve a stale
+    summary; the explicit per-user invalidation below only frees the space.'''
+
+    def __init__(self, app=None):
+        self.memory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('SUMMARY_CACHE_TTL', 7 * 24 * 3600)
+        self.memory = LRUCache(maxsize=app.config.get('SUMMARY_CACHE_SIZE', 256), ttl=self.ttl)
+        app.extensions['summary_cache'] = self
+
+    def get(self, key, session=None):
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry[1]
+        session = db.session if session is None else session
+        row = session.get(SummaryCacheEntry, key)
+        if row is None:
+            return None
+        expires_at = row.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at <= datetime.now(timezone.utc):
+            return None
+        remaining = (expires_at - datetime.now(timezone.utc)).total_seconds()
+        self.memory.set(key, (row.user_id, row.summary), ttl=remaining)
+        return row.summary
+
+    def set(self, key, user_id, summary, model, session=None):
+        now = datetime.now(timezone.utc)
+        self.memory.set(key, (user_id, summary))
+        session = db.session if session is None else session
+        session.execute(delete(SummaryCacheEntry).where(SummaryCacheEntry.expires_at <= now))
+        session.merge(SummaryCacheEntry(key=key, user_id=user_id, summary=summary, model=model,
+                                        created_at=now, expires_at=now + timedelta(seconds=self.ttl)))
+        session.commit()
+
+    def invalidate_user(self, user_id):
+        self.memory.discard_where(lambda key, entry: entry[0] == user_id)
+        # runs from after_commit, where the session itself can't issue SQL
+        with db.engine.begin() as conn:
+            conn.execute(delete(SummaryCacheEntry).where(SummaryCacheEntry.user_id == user_id))
+
+
+summary_cache = SummaryCache()
+
+
+def get_summary_cache():
+    return current_app.extensions['summary_cache']
+
+
+# --- invalidation -------------------------------------------------------------
+# Any flushed change to the data a summary is built from marks the owner; once
+# the transaction commits their cached summaries are dropped.
+
+_REPORT_SOURCES = (JournalEntry, Visit, Medication)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault('summary_cache_users', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, _REPORT_SOURCES) and obj.user_id is not None:
+            changed.add(obj.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    changed = session.info.pop('summary_cache_users', None)
+    if not changed or not has_app_context() or 'summary_cache' not in current_app.extensions:
+        return
+    for user_id in changed:
+        get_summary_cache().invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_users(session):
+    session.info.pop('summary_cache_users', None)
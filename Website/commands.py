@@ -0,0 +1,138 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('check-query-plans')
+@with_appcontext
+@click.option('--user-id', default=1, show_default=True, help='User id bound into the sample queries.')
+def check_query_plans_command(user_id):
+    """EXPLAIN the hot per-user queries and fail if any of them needs a sequential scan."""
+    from .query_plans import check_query_plans
+
+    results = check_query_plans(user_id)
+    if not results:
+        click.echo('Skipped: query plans can only be checked on SQLite or PostgreSQL.')
+        return
+    failed = False
+    for name, (plan, ok) in results.items():
+        click.echo(f"{'ok  ' if ok else 'SCAN'} {name}")
+        for line in plan:
+            click.echo(f"       {line}")
+        failed = failed or not ok
+    if failed:
+        raise click.ClickException('Some hot queries are not using an index.')
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Create the full-text search index if needed and refill the SQLite mirror."""
+    from . import db
+    from .search import install_search_index
+
+    with db.engine.begin() as connection:
+        install_search_index(connection)
+    click.echo('Search index is up to date.')
+
+
+@click.command('rebuild-previews')
+@with_appcontext
+@click.option('--all', 'rebuild_all', is_flag=True, help='Re-render previews that are already ready.')
+def rebuild_previews_command(rebuild_all):
+    """Queue thumbnails for documents without one (older uploads, failed or interrupted renders)."""
+    from .models import MedicalDocument
+    from .previews import get_previews
+    from .storage import get_storage
+
+    previews = get_previews()
+    # the CLI process exits straight after, so render here instead of in a pool
+    previews.eager = True
+    query = MedicalDocument.query
+    if not rebuild_all:
+        query = query.filter((MedicalDocument.preview_status.is_(None)) |
+                             (MedicalDocument.preview_status != 'ready'))
+    count = 0
+    for doc in query.order_by(MedicalDocument.id):
+        previews.submit(doc, get_storage().resolve(doc))
+        count += 1
+    click.echo(f'Rendered previews for {count} document(s).')
+
+
+@click.command('import-records')
+@with_appcontext
+@click.argument('path', type=click.File('rb'))
+@click.option('--user', 'user_ref', required=True, help='Email or id of the user to import into.')
+@click.option('--type', 'kind', type=click.Choice(['journal', 'visit', 'medication']),
+              help='Every row is this type (otherwise each row needs a "type" column).')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per insert/commit (default IMPORT_BATCH_SIZE).')
+def import_records_command(path, user_ref, kind, fmt, batch_size):
+    """Bulk import journals, visits and medications from a CSV or NDJSON file ('-' for stdin)."""
+    from flask import current_app
+
+    from .importer import ImportFormatError, detect_format, import_records
+    from .models import User
+
+    user = User.query.filter((User.email == user_ref) |
+                             (User.id == (int(user_ref) if user_ref.isdigit() else -1))).first()
+    if user is None:
+        raise click.ClickException(f'No user {user_ref!r}.')
+    try:
+        fmt = fmt or detect_format(path.name)
+        progress = import_records(user.id, path, fmt, kind=kind,
+                                  batch_size=batch_size or current_app.config['IMPORT_BATCH_SIZE'])
+        for step in progress:
+            click.echo(f'{step.rows} rows read, {step.imported} imported, {step.failed} failed', err=True)
+    except ImportFormatError as e:
+        raise click.ClickException(str(e))
+    for line_num, message in step.errors:
+        click.echo(f'line {line_num}: {message}')
+    if step.failed > len(step.errors):
+        click.echo(f'... and {step.failed - len(step.errors)} more')
+
+
+@click.command('seed')
+@with_appcontext
+@click.option('--users', type=int, default=0,
+              help='Generate this many synthetic users for load testing (default: just the demo account).')
+@click.option('--journals-per-user', type=int, default=200, show_default=True)
+@click.option('--seed', 'seed', type=int, default=0, show_default=True,
+              help='Same seed, same data; pick a new one to add more users.')
+@click.option('--days', type=int, default=365, show_default=True, help='History length per user.')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Last day of the generated history (default today); fix it for identical reruns.')
+@click.option('--batch-users', type=int, default=200, show_default=True, help='Users per insert/commit.')
+def seed_command(users, journals_per_user, seed, days, end_date, batch_users):
+    """Create the demo account, or with --users, bulk-generate synthetic users (see seeding.py)."""
+    import time
+
+    from .models import User
+    from .seeding import DEMO_EMAIL, DEMO_PASSWORD, PASSWORD, generate, seed_demo
+
+    if not users:
+        user, counts = seed_demo()
+        for model, count in counts.items():
+            click.echo(f'{count} {model.__tablename__} rows')
+        click.echo(f'Login with {DEMO_EMAIL} / {DEMO_PASSWORD}')
+        return
+    started = time.perf_counter()
+    try:
+        for totals in generate(users, journals_per_user, seed=seed, days=days,
+                               end_date=end_date.date() if end_date else None, batch_users=batch_users):
+            rows = sum(totals.values())
+            elapsed = time.perf_counter() - started
+            click.echo(f'{totals[User]} users, {rows} rows, '
+                       f'{rows / elapsed:.0f} rows/s', err=True)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    for model, count in totals.items():
+        click.echo(f'{count} {model.__tablename__} rows')
+    click.echo(f'Users are loadtest{seed}_<n>@example.com, password {PASSWORD!r}')
+
+
+def register_commands(app):
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(rebuild_previews_command)
+    app.cli.add_command(import_records_command)
+    app.cli.add_command(seed_command)
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import os
+import zipfile
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from . import db
+from .models import JournalEntry, MedicalDocument, Medication, Visit
+
+'''
+Streaming export of everything a user has recorded.
+
+Rows are read with yield_per, so the database hands them over in batches
+(a server-side cursor on PostgreSQL) and only one batch is ever in memory;
+each row is formatted and handed to the response generator straight away.
+The zip variant is written to the response as it is built, with the document
+files copied in chunks, so memory stays flat however large the history is.
+
+Columns use the same names as the import (see importer.py), so the journal,
+visit and medication rows of an export can be imported into another account.
+'''
+
+YIELD_PER = 1000
+CHUNK_SIZE = 256 * 1024
+
+# record type -> (model, [(export column, model column)])
+_SOURCES = {
+    'journal': (JournalEntry, [('id', JournalEntry.id), ('date', JournalEntry.created_at),
+                               ('title', JournalEntry.title), ('content', JournalEntry.content),
+                               ('severity', JournalEntry.severity), ('visit_id', JournalEntry.visit_id)]),
+    'visit': (Visit, [('id', Visit.id), ('visit_date', Visit.visit_date), ('doctor_name', Visit.doctor_name),
+                      ('reason', Visit.reason), ('diagnosis', Visit.diagnosis)]),
+    'medication': (Medication, [('id', Medication.id), ('name', Medication.name), ('dosage', Medication.dosage),
+                                ('frequency', Medication.frequency), ('notes', Medication.notes),
+                                ('visit_id', Medication.visit_id)]),
+    'document': (MedicalDocument, [('id', MedicalDocument.id), ('filename', MedicalDocument.filename),
+                                   ('upload_date', MedicalDocument.upload_date), ('size', MedicalDocument.size),
+                                   ('content_hash', MedicalDocument.content_hash),
+                                   ('visit_id', MedicalDocument.visit_id)]),
+}
+
+CSV_COLUMNS = ['type']
+for _, _columns in _SOURCES.values():
+    CSV_COLUMNS += [name for name, _ in _columns if name not in CSV_COLUMNS]
+
+
+# the import (VisitForm) takes a plain date for these
+_DATE_ONLY = {'visit_date'}
+
+
+def _value(name, value):
+    if isinstance(value, datetime) and name in _DATE_ONLY:
+        value = value.date()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_records(user_id):
+    '''Yields one dict per record, type by type, oldest id first.'''
+    for kind, (model, columns) in _SOURCES.items():
+        stmt = (select(*[col for _, col in columns])
+                .where(model.user_id == user_id)
+                .order_by(model.id)
+                .execution_options(yield_per=YIELD_PER))
+        for row in db.session.execute(stmt):
+            record = {'type': kind}
+            record.update((name, _value(name, value)) for (name, _), value in zip(columns, row))
+            yield record
+
+
+def ndjson_lines(user_id):
+    for record in iter_records(user_id):
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def csv_lines(user_id):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for record in iter_records(user_id):
+        writer.writerow(record)
+        # hand over whatever the writer produced and reuse the buffer
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    '''Write-only, unseekable file for ZipFile; the bytes written since the
+    last drain() are handed to the response. Being unseekable makes zipfile
+    use data descriptors instead of going back to patch headers.'''
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def zip_chunks(user_id, records_format, resolve_path):
+    '''Zip with the records (records.ndjson or records.csv) and every document
+    file under documents/<id>-<filename>. resolve_path(doc) gives the file on
+    disk (DocumentStorage.resolve).'''
+    sink = _ChunkSink()
+    lines = ndjson_lines if records_format == 'ndjson' else csv_lines
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(f'records.{records_format}', 'w', force_zip64=True) as out:
+            for line in lines(user_id):
+                out.write(line.encode('utf-8'))
+                if sink.chunks:
+                    yield sink.drain()
+
+        docs = db.session.execute(
+            select(MedicalDocument).where(MedicalDocument.user_id == user_id)
+            .order_by(MedicalDocument.id).execution_options(yield_per=YIELD_PER)).scalars()
+        for doc in docs:
+            path = resolve_path(doc)
+            if not path or not os.path.isfile(path):
+                continue
+            info = zipfile.ZipInfo(f'documents/{doc.id}-{doc.filename}',
+                                   date_time=(doc.upload_date or datetime.now()).timetuple()[:6])
+            # scans and photos are already compressed
+            info.compress_type = zipfile.ZIP_STORED
+            with open(path, 'rb') as src, archive.open(info, 'w', force_zip64=True) as out:
+                while True:
+                    chunk = src.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                    yield sink.drain()
+            if sink.chunks:
+                yield sink.drain()
+    # the central directory, written on close
+    yield sink.drain()
@@ -47,10 +47,13 @@ class MedicationForm(FlaskForm):
     notes = TextAreaField('Notes (Optional)')
     submit = SubmitField('Save Medication')
 
+# also checked by the ASGI upload view, which parses the form itself
+DOCUMENT_EXTENSIONS = ['pdf', 'png', 'jpg', 'jpeg']
+
 class DocumentUploadForm(FlaskForm):
     file = FileField('Document', validators=[
         FileRequired(),
-        FileAllowed(['pdf', 'png', 'jpg', 'jpeg'], 'Images and PDFs only!')
+        FileAllowed(DOCUMENT_EXTENSIONS, 'Images and PDFs only!')
     ])
     visit = SelectField('Link to Visit (Optional)', coerce=int)
     submit = SubmitField('Upload')
@@ -90,4 +93,15 @@ class UpdateProfileForm(FlaskForm):
 class ReportForm(FlaskForm):
     start_date = DateField("From", format='%Y-%m-%d', validators=[DataRequired()])
     end_date = DateField("Till", format='%Y-%m-%d', validators=[DataRequired()])
-    submit = SubmitField('Generate Report')
\ No newline at end of file
+    submit = SubmitField('Generate Report')
+
+class ImportForm(FlaskForm):
+    file = FileField('CSV or NDJSON file', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'ndjson', 'jsonl', 'json'], 'CSV or NDJSON files only!')
+    ])
+    kind = SelectField('Records in the file', choices=[('', 'Mixed (a "type" column on every row)'),
+                                                      ('journal', 'Journal entries'),
+                                                      ('visit', 'Doctor visits'),
+                                                      ('medication', 'Medications')])
+    submit = SubmitField('Import')
\ No newline at end of file
@@ -0,0 +1,118 @@
+from flask import current_app, has_app_context, has_request_context, session
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from . import db
+from .cache import LRUCache
+from .models import User
+
+'''
+Cached identity for flask-login's user_loader.
+
+Every authenticated request used to load the full User row. Instead the loader
+returns a UserSnapshot (the handful of columns pages actually read) from a
+per-process LRU, keyed by (user id, identity version). The version lives on the
+User row and in the login session: editing the username, email or avatar bumps
+it, so the editing user's next request misses the cache on every gunicorn
+worker. Other sessions of the same user pick the change up when their entry's
+TTL runs out.
+'''
+
+_SNAPSHOT_FIELDS = ('id', 'username', 'email', 'role', 'image_file', 'created_at', 'identity_version')
+# changing any of these invalidates cached snapshots
+_IDENTITY_FIELDS = ('username', 'email', 'image_file')
+_SESSION_KEY = '_identity_version'
+
+
+class UserSnapshot(UserMixin):
+    '''Read-only stand-in for User as current_user. Code that writes to the
+    user (profile) loads the real row with db.session.get(User, ...).'''
+
+    def __init__(self, **fields):
+        for name in _SNAPSHOT_FIELDS:
+            setattr(self, name, fields[name])
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.id} v{self.identity_version}>'
+
+
+class IdentityCache:
+    def __init__(self, app=None):
+        self.memory = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.memory = LRUCache(maxsize=app.config.get('IDENTITY_CACHE_SIZE', 1024),
+                               ttl=app.config.get('IDENTITY_CACHE_TTL', 60))
+        app.extensions['identity_cache'] = self
+
+    def load(self, user_id):
+        version = session.get(_SESSION_KEY) if has_request_context() else None
+        snapshot = self.memory.get((user_id, version))
+        if snapshot is not None:
+            return snapshot
+
+        columns = [getattr(User, name) for name in _SNAPSHOT_FIELDS]
+        row = db.session.execute(db.select(*columns).where(User.id == user_id)).first()
+        if row is None:
+            return None
+        snapshot = UserSnapshot(**row._asdict())
+        self.memory.set((user_id, snapshot.identity_version), snapshot)
+        if has_request_context() and version != snapshot.identity_version:
+            session[_SESSION_KEY] = snapshot.identity_version
+        return snapshot
+
+    def invalidate_user(self, user_id):
+        self.memory.discard_where(lambda key, snapshot: key[0] == user_id)
+
+    def snapshot(self):
+        hits, misses = self.memory.hits, self.memory.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else None,
+            'size': len(self.memory),
+        }
+
+
+identity_cache = IdentityCache()
+
+
+def get_identity_cache():
+    return current_app.extensions['identity_cache']
+
+
+# --- invalidation -------------------------------------------------------------
+# Bumping the version in before_flush means it is written in the same UPDATE as
+# the change itself, whichever code path made it.
+
+@event.listens_for(Session, 'before_flush')
+def _bump_identity_versions(session_, flush_context, instances):
+    bumped = session_.info.setdefault('identity_versions', {})
+    for obj in session_.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in _IDENTITY_FIELDS):
+            obj.identity_version = (obj.identity_version or 0) + 1
+            bumped[obj.id] = obj.identity_version
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_stale_identities(session_):
+    bumped = session_.info.pop('identity_versions', None)
+    if not bumped or not has_app_context() or 'identity_cache' not in current_app.extensions:
+        return
+    for user_id, version in bumped.items():
+        get_identity_cache().invalidate_user(user_id)
+        # the user who made the change sees it on their very next request
+        if has_request_context() and session.get('_user_id') == str(user_id):
+            session[_SESSION_KEY] = version
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_identity_versions(session_):
+    session_.info.pop('identity_versions', None)
@@ -0,0 +1,190 @@
+import csv
+import io
+import json
+from collections import namedtuple
+from datetime import datetime, time, timezone
+
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+
+from . import db
+from .cache import get_summary_cache
+from .forms import JournalEntryForm, MedicationForm, VisitForm
+from .models import JournalEntry, Medication, Visit
+from .revisions import bump_data_revision
+
+'''
+Bulk import of journals, visits and medications from CSV or NDJSON.
+
+Input is read as a stream, one row at a time. Every row is validated with the
+same WTForms class the matching add_* page uses (one form instance per kind,
+re-processed per row, so validation costs microseconds), and valid rows are
+inserted with one executemany per IMPORT_BATCH_SIZE rows, committing after each
+batch. Progress is reported after every batch; invalid rows are skipped and
+reported with their line number.
+
+Each row needs a `type` (journal, visit or medication) unless the whole file
+is one kind. Columns are the form field names, plus an optional `date` for
+journal entries (YYYY-MM-DD or ISO datetime, default now):
+
+    type,date,title,content,severity
+    journal,2024-03-01,Migraine,Woke up with a migraine,High
+'''
+
+ImportProgress = namedtuple('ImportProgress', 'rows imported failed errors done')
+
+KINDS = ('journal', 'visit', 'medication')
+# errors kept for display; the count in ImportProgress.failed is always complete
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def _parse_datetime(value):
+    value = (value or '').strip()
+    if not value:
+        return datetime.now(timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Not a valid date: {value!r}')
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class _Kind:
+    def __init__(self, model, form_class, build):
+        self.model = model
+        self.form = form_class(formdata=None, meta={'csrf': False})
+        self.build = build
+        self.pending = []
+
+    def validate(self, row):
+        self.form.process(MultiDict(row))
+        if self.form.validate():
+            return None
+        return '; '.join(f'{name}: {", ".join(msgs)}' for name, msgs in self.form.errors.items())
+
+
+def _kinds(user_id):
+    def journal(form, row):
+        return {'user_id': user_id, 'title': form.title.data, 'content': form.content.data,
+                'severity': form.severity.data, 'created_at': _parse_datetime(row.get('date'))}
+
+    def visit(form, row):
+        return {'user_id': user_id, 'doctor_name': form.doctor_name.data or None, 'reason': form.reason.data,
+                'diagnosis': form.diagnosis.data or None,
+                'visit_date': datetime.combine(form.visit_date.data, time(), tzinfo=timezone.utc)}
+
+    def medication(form, row):
+        return {'user_id': user_id, 'name': form.name.data, 'dosage': form.dosage.data or None,
+                'frequency': form.frequency.data or None, 'notes': form.notes.data or None}
+
+    return {
+        'journal': _Kind(JournalEntry, JournalEntryForm, journal),
+        'visit': _Kind(Visit, VisitForm, visit),
+        'medication': _Kind(Medication, MedicationForm, medication),
+    }
+
+
+def detect_format(filename):
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    raise ImportFormatError('Unknown file type, use .csv or .ndjson')
+
+
+def _read_rows(binary_stream, fmt):
+    '''Yields (line number, dict of strings), or (line number, exception) for a
+    row that can't be used. If the file itself can't be read any further (not
+    UTF-8, broken CSV quoting) the last item is an ImportFormatError and the
+    rest of the file is skipped.'''
+    if fmt not in ('csv', 'ndjson'):
+        raise ImportFormatError(f'Unknown import format: {fmt}')
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    line_num = 0
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                line_num = reader.line_num
+                yield line_num, {k.strip(): (v or '') for k, v in row.items() if k}
+        else:
+            for line_num, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_num, ValueError(f'Invalid JSON: {e}')
+                    continue
+                if not isinstance(row, dict):
+                    yield line_num, ValueError('Each line must be a JSON object')
+                    continue
+                yield line_num, {str(k): '' if v is None else str(v) for k, v in row.items()}
+    except UnicodeDecodeError:
+        # decoding runs ahead in blocks, so the bad byte is somewhere after here
+        yield line_num + 1, ImportFormatError('The file is not UTF-8 text; the rest of it was not imported')
+    except csv.Error as e:
+        yield line_num + 1, ImportFormatError(f'Malformed CSV ({e}); the rest of the file was not imported')
+
+
+def import_records(user_id, binary_stream, fmt, kind=None, batch_size=1000):
+    '''Generator: imports the stream for user_id, yielding an ImportProgress
+    after every committed batch and a final one with done=True.'''
+    if kind is not None and kind not in KINDS:
+        raise ImportFormatError(f'Unknown record type: {kind}')
+    kinds = _kinds(user_id)
+    rows = imported = failed = 0
+    errors = []
+
+    def fail(line_num, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append((line_num, message))
+
+    def flush():
+        nonlocal imported
+        batch = 0
+        for k in kinds.values():
+            if k.pending:
+                db.session.execute(insert(k.model), k.pending)
+                batch += len(k.pending)
+                k.pending = []
+        if batch:
+            # bulk inserts don't go through the flush that normally bumps it
+            bump_data_revision(db.session, [user_id])
+        imported += batch
+        db.session.commit()
+
+    for line_num, row in _read_rows(binary_stream, fmt):
+        rows += 1
+        if isinstance(row, Exception):
+            fail(line_num, str(row))
+            continue
+        row_kind = kind or row.get('type', '').strip().lower()
+        target = kinds.get(row_kind)
+        if target is None:
+            fail(line_num, f'Unknown type {row_kind!r}, expected one of {", ".join(KINDS)}')
+            continue
+        error = target.validate(row)
+        if error is None:
+            try:
+                target.pending.append(target.build(target.form, row))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            fail(line_num, error)
+            continue
+        if sum(len(k.pending) for k in kinds.values()) >= batch_size:
+            flush()
+            yield ImportProgress(rows, imported, failed, errors, False)
+    flush()
+    if imported:
+        # bulk inserts skip the ORM events that normally drop cached summaries
+        get_summary_cache().invalidate_user(user_id)
+    yield ImportProgress(rows, imported, failed, errors, True)
@@ -0,0 +1,116 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import update
+
+from . import db
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+'''
+In-process worker pool for AI report generation.
+
+The request only inserts a ReportJob row and hands its id to the pool, so the
+gunicorn worker is free again straight away. Workers claim a job with a
+conditional UPDATE (queued -> running), which keeps a job from running twice
+when it is re-submitted after a restart.
+'''
+
+
+def _utc(dt):
+    if dt is not None and dt.tzinfo is None:
+        # SQLite hands back naive timestamps; they are stored as UTC
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class ReportJobQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.eager = app.config.get('REPORT_JOBS_EAGER', False)
+        self.executor = ThreadPoolExecutor(max_workers=app.config.get('REPORT_WORKERS', 2),
+                                           thread_name_prefix='report-job')
+        app.extensions['report_jobs'] = self
+
+    def submit(self, user_id, start_date, end_date):
+        job = ReportJob(id=uuid.uuid4().hex, user_id=user_id, status='queued',
+                        start_date=start_date, end_date=end_date)
+        db.session.add(job)
+        db.session.commit()
+        self._dispatch(job.id)
+        return job
+
+    def _dispatch(self, job_id):
+        if self.eager:
+            # tests and offline runs: do the work inline, same code path
+            self._run(job_id)
+        else:
+            self.executor.submit(self._run, job_id)
+
+    def _claim(self, job_id):
+        result = db.session.execute(
+            update(ReportJob)
+            .where(ReportJob.id == job_id, ReportJob.status == 'queued')
+            .values(status='running', started_at=datetime.now(timezone.utc))
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def _run(self, job_id):
+        from .ai_report import ReportGenerator
+
+        with self.app.app_context():
+            if not self._claim(job_id):
+                return
+            job = db.session.get(ReportJob, job_id)
+            try:
+                generator = ReportGenerator(job.user_id)
+                raw_data = generator.fetch_data(job.start_date, job.end_date)
+                stored = generator.find_report(job.start_date, job.end_date, raw_data)
+                if stored is None:
+                    summary = generator.summarize(raw_data)
+                    stored = generator.save_report(job.start_date, job.end_date, raw_data, summary)
+                job = db.session.get(ReportJob, job_id)
+                job.summary = stored.markdown
+                job.report_id = stored.id
+                job.status = 'done'
+            except Exception as e:
+                logger.exception('Report job %s failed', job_id)
+                db.session.rollback()
+                job = db.session.get(ReportJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+            db.session.commit()
+
+    def recover(self, job):
+        '''Called when a job is polled. Jobs are persistent but the pool is not:
+        a job still queued after a restart is re-submitted here, and one stuck
+        in running past the timeout is marked failed.'''
+        now = datetime.now(timezone.utc)
+        timeout = self.app.config.get('REPORT_JOB_TIMEOUT', 300)
+        if job.status == 'queued' and (now - _utc(job.created_at)).total_seconds() > timeout:
+            self._dispatch(job.id)
+        elif job.status == 'running' and (now - _utc(job.started_at)).total_seconds() > timeout:
+            job.status = 'failed'
+            job.error = 'Report generation timed out.'
+            job.finished_at = now
+            db.session.commit()
+        return job
+
+
+report_jobs = ReportJobQueue()
+
+
+def get_report_queue():
+    return current_app.extensions['report_jobs']
@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import threading
+import time
+
+from flask import current_app
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from .metrics import observe_llm_call
+
+logger = logging.getLogger(__name__)
+
+'''
+LLM backends used by ReportGenerator. The backend is chosen with the
+LLM_BACKEND config value, wrapped in ResilientLLM (retries, circuit breaker,
+counters) and stored on app.extensions['llm'] once per app, so report
+generation (and the job queue that runs it) can be exercised offline with
+the stub.
+'''
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class GeminiLLM:
+    '''One genai client per app, on top of pooled httpx clients (a sync one,
+    and an async one for client.aio under the ASGI app), so connections and
+    TLS sessions are reused across reports. The client is built on first use
+    so the app still starts without an API key.'''
+
+    def __init__(self, api_key, connect_timeout=5.0, read_timeout=60.0, pool_size=10):
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.http = None
+        self.async_http = None
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from google import genai
+                    from google.genai import types
+
+                    timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+                    # genai passes its own timeout to every request, which replaces
+                    # the client default and has no separate connect phase
+                    def apply_timeout(request):
+                        request.extensions['timeout'] = timeout.as_dict()
+
+                    async def aapply_timeout(request):
+                        apply_timeout(request)
+
+                    limits = httpx.Limits(max_connections=self.pool_size,
+                                          max_keepalive_connections=self.pool_size)
+                    self.http = httpx.Client(timeout=timeout, limits=limits,
+                                             event_hooks={'request': [apply_timeout]})
+                    self.async_http = httpx.AsyncClient(timeout=timeout, limits=limits,
+                                                        event_hooks={'request': [aapply_timeout]})
+                    # in milliseconds; also sent upstream as X-Server-Timeout
+                    http_options = types.HttpOptions(timeout=int(self.read_timeout * 1000),
+                                                     httpx_client=self.http,
+                                                     httpx_async_client=self.async_http)
+                    self._client = genai.Client(api_key=self.api_key, http_options=http_options)
+        return self._client
+
+    def generate(self, prompt, model):
+        response = self.client.models.generate_content(model=model, contents=prompt)
+        return response.text
+
+    def stream(self, prompt, model):
+        for chunk in self.client.models.generate_content_stream(model=model, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+    async def astream(self, prompt, model):
+        async for chunk in await self.client.aio.models.generate_content_stream(model=model, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubLLM:
+    '''Returns a canned markdown brief without any network access. `delay`
+    simulates the upstream round-trip.'''
+
+    DEFAULT_RESPONSE = (
+        "## Chief Concerns\n"
+        "- Offline stub report, no model was called.\n\n"
+        "## Subjective (Patient Narrative)\n"
+        "- Prompt length: {prompt_chars} characters\n"
+    )
+
+    def __init__(self, response=None, delay=0.0):
+        self.response = response
+        self.delay = delay
+        self.calls = []
+
+    def _text(self, prompt):
+        if self.response is not None:
+            return self.response
+        return self.DEFAULT_RESPONSE.format(prompt_chars=len(prompt))
+
+    def generate(self, prompt, model):
+        self.calls.append((model, prompt))
+        if self.delay:
+            time.sleep(self.delay)
+        return self._text(prompt)
+
+    def stream(self, prompt, model):
+        # same text as generate(), handed out a line at a time
+        text = self.generate(prompt, model)
+        for line in text.splitlines(keepends=True):
+            yield line
+
+    async def astream(self, prompt, model):
+        self.calls.append((model, prompt))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        for line in self._text(prompt).splitlines(keepends=True):
+            yield line
+
+
+class CircuitBreaker:
+    '''Closed -> open after `threshold` consecutive failures. While open every
+    call fails immediately; after `reset_timeout` seconds one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit.'''
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self.trial_in_flight):
+                raise CircuitOpenError('LLM upstream is unavailable, try again shortly.')
+            if state == 'half-open':
+                self.trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class LLMStats:
+    # upper bounds in seconds for the latency histogram
+    BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 40, 60, float('inf'))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * len(self.BUCKETS)
+
+    def observe(self, seconds, ok):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.latency_sum += seconds
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    self.latency_buckets[i] += 1
+                    break
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'errors': self.errors,
+                'retries': self.retries,
+                'rejected': self.rejected,
+                'latency_sum': round(self.latency_sum, 3),
+                'latency_buckets': {str(b): n for b, n in zip(self.BUCKETS, self.latency_buckets)},
+            }
+
+
+def is_transient(exc):
+    '''Errors worth retrying: timeouts, dropped connections, 429s and 5xx.'''
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    code = getattr(exc, 'code', None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+class ResilientLLM:
+    '''Wraps a backend with bounded, jittered retries, a circuit breaker and
+    call counters. Has the same generate()/stream()/astream() interface.'''
+
+    def __init__(self, backend, max_attempts=3, backoff_max=8.0, breaker=None):
+        self.backend = backend
+        self.max_attempts = max_attempts
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = LLMStats()
+
+    def _retrying(self, retrying_class=Retrying):
+        return retrying_class(
+            stop=stop_after_attempt(self.max_attempts),
+            wait=wait_random_exponential(multiplier=0.5, max=self.backoff_max),
+            retry=retry_if_exception(is_transient),
+            before_sleep=self._before_retry,
+            reraise=True,
+        )
+
+    def _before_retry(self, retry_state):
+        self.stats.incr('retries')
+        logger.warning('LLM call failed (attempt %d), retrying: %s',
+                       retry_state.attempt_number, retry_state.outcome.exception())
+
+    def _before_call(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.stats.incr('rejected')
+            raise
+
+    def _after_call(self, name, started, ok, exc=None):
+        elapsed = time.perf_counter() - started
+        if ok or not is_transient(exc):
+            # a 4xx or a bad prompt still means the upstream answered; only
+            # outages count towards opening the circuit for everyone
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        self.stats.observe(elapsed, ok=ok)
+        observe_llm_call(name, elapsed, ok=ok)
+
+    def _call(self, fn, name):
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            result = self._retrying()(fn)
+        except Exception as e:
+            self._after_call(name, started, ok=False, exc=e)
+            raise
+        self._after_call(name, started, ok=True)
+        return result
+
+    async def _acall(self, fn, name):
+        self._before_call()
+        started = time.perf_counter()
+        try:
+            result = await self._retrying(AsyncRetrying)(fn)
+        except Exception as e:
+            self._after_call(name, started, ok=False, exc=e)
+            raise
+        self._after_call(name, started, ok=True)
+        return result
+
+    def generate(self, prompt, model):
+        return self._call(lambda: self.backend.generate(prompt, model), 'generate')
+
+    def stream(self, prompt, model):
+        # retries only cover opening the stream (up to the first chunk);
+        # once text has reached the client a retry would duplicate it
+        def open_stream():
+            chunks = iter(self.backend.stream(prompt, model))
+            return next(chunks, None), chunks
+
+        first, chunks = self._call(open_stream, 'stream')
+        if first is None:
+            return
+        yield first
+        yield from chunks
+
+    async def astream(self, prompt, model):
+        # stream() for the ASGI app: waits for the model without holding a thread
+        async def open_stream():
+            chunks = aiter(self.backend.astream(prompt, model))
+            return await anext(chunks, None), chunks
+
+        first, chunks = await self._acall(open_stream, 'stream')
+        if first is None:
+            return
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    def snapshot(self):
+        return dict(self.stats.snapshot(), circuit=self.breaker.state)
+
+    def __getattr__(self, name):
+        # e.g. StubLLM.calls in tests
+        return getattr(self.backend, name)
+
+
+def init_llm(app):
+    backend = app.config.get('LLM_BACKEND', 'gemini')
+    if backend == 'stub':
+        llm = StubLLM(delay=app.config.get('LLM_STUB_DELAY', 0.0))
+    elif backend == 'gemini':
+        llm = GeminiLLM(app.config['GEMINI_API_KEY'],
+                        connect_timeout=app.config.get('LLM_CONNECT_TIMEOUT', 5.0),
+                        read_timeout=app.config.get('LLM_READ_TIMEOUT', 60.0),
+                        pool_size=app.config.get('LLM_POOL_SIZE', 10))
+    else:
+        raise ValueError(f'Unknown LLM_BACKEND: {backend}')
+    breaker = CircuitBreaker(threshold=app.config.get('LLM_BREAKER_THRESHOLD', 5),
+                             reset_timeout=app.config.get('LLM_BREAKER_RESET', 30.0))
+    app.extensions['llm'] = ResilientLLM(llm,
+                                         max_attempts=app.config.get('LLM_MAX_ATTEMPTS', 3),
+                                         backoff_max=app.config.get('LLM_BACKOFF_MAX', 8.0),
+                                         breaker=breaker)
+    return app.extensions['llm']
+
+
+def get_llm():
+    return current_app.extensions['llm']
@@ -0,0 +1,132 @@
+import hmac
+import logging
+import os
+import time
+from functools import wraps
+
+from flask import Response, abort, current_app, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY,
+                               generate_latest)
+from prometheus_client import multiprocess
+
+'''
+Prometheus metrics, served at /metrics when METRICS_ENABLED is set.
+
+The endpoint sits on the public app, so it only answers scrapers that send
+`Authorization: Bearer <METRICS_TOKEN>` or come from an address listed in
+METRICS_ALLOWED_IPS; with neither configured it answers nobody. The other
+operational endpoints (/health/*) use the same check, via @internal_only.
+
+Under gunicorn or `uvicorn --workers N` every worker is a separate process
+with its own counters, so prometheus_client runs in multiprocess mode: each
+worker writes its samples to files in PROMETHEUS_MULTIPROC_DIR and /metrics
+merges them, whichever worker answers the scrape. gunicorn.conf.py and asgi.py
+set that directory up before the app is imported. Without it (flask run,
+tests) the default in-process registry is used.
+'''
+
+logger = logging.getLogger(__name__)
+
+# seconds; page renders sit well under a second, report generation does not
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LLM_BUCKETS = (0.5, 1, 2.5, 5, 10, 20, 40, 60, 120)
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by endpoint',
+                            ['method', 'endpoint'], buckets=LATENCY_BUCKETS)
+REQUESTS = Counter('http_requests_total', 'Requests by endpoint and status',
+                   ['method', 'endpoint', 'status'])
+REQUEST_ERRORS = Counter('http_request_errors_total', 'Requests that ended in a 5xx',
+                         ['method', 'endpoint'])
+DB_TIME = Histogram('http_request_db_seconds', 'Time spent in SQL per request',
+                    ['endpoint'], buckets=LATENCY_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'SQL statements per request',
+                       ['endpoint'], buckets=(1, 2, 5, 10, 20, 50, 100))
+LLM_LATENCY = Histogram('llm_call_duration_seconds', 'LLM call duration (stream: until the first chunk)',
+                        ['call', 'outcome'], buckets=LLM_BUCKETS)
+
+
+def observe_llm_call(call, seconds, ok):
+    LLM_LATENCY.labels(call=call, outcome='ok' if ok else 'error').observe(seconds)
+
+
+def _endpoint():
+    # the endpoint name, not the path, so ids in URLs don't explode the label set
+    return request.endpoint or 'unmatched'
+
+
+def prune_multiproc_dir(path):
+    '''Removes the sample files of processes that are no longer running. For
+    servers without a master hook to clear the directory at start (uvicorn),
+    so a restart doesn't add the previous run's samples to the new ones.'''
+    for name in os.listdir(path):
+        pid = name.rsplit('_', 1)[-1].removesuffix('.db')
+        if not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            os.remove(os.path.join(path, name))
+        except PermissionError:
+            pass
+
+
+def _scrape_allowed(config):
+    token = config.get('METRICS_TOKEN')
+    if token:
+        auth = request.authorization
+        if auth and auth.type == 'bearer' and hmac.compare_digest(auth.token or '', token):
+            return True
+    return request.remote_addr in config.get('METRICS_ALLOWED_IPS', ())
+
+
+def internal_only(view):
+    '''For endpoints with process-wide stats: the same access rule as /metrics.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _scrape_allowed(current_app.config):
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED', False):
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        endpoint = _endpoint()
+        REQUEST_LATENCY.labels(method=request.method, endpoint=endpoint).observe(time.perf_counter() - started)
+        REQUESTS.labels(method=request.method, endpoint=endpoint, status=str(response.status_code)).inc()
+        if response.status_code >= 500:
+            REQUEST_ERRORS.labels(method=request.method, endpoint=endpoint).inc()
+        # collected by the engine hooks in sqlstats.py
+        stats = g.get('sql_stats')
+        if stats is not None:
+            DB_TIME.labels(endpoint=endpoint).observe(stats.seconds)
+            DB_QUERIES.labels(endpoint=endpoint).observe(stats.count)
+        return response
+
+    if not (app.config.get('METRICS_TOKEN') or app.config.get('METRICS_ALLOWED_IPS')):
+        logger.warning('METRICS_ENABLED without METRICS_TOKEN or METRICS_ALLOWED_IPS: /metrics will refuse every scrape')
+
+    @app.route('/metrics')
+    def metrics():
+        if not _scrape_allowed(app.config):
+            abort(403)
+        return Response(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
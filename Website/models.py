@@ -13,6 +13,10 @@ class User(db.Model, UserMixin):
     role = db.Column(db.String(50), default='patient', nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), default=func.now())
     image_file = db.Column(db.String(20), nullable=False, default='default.jpg')
+    # bumped whenever the cached identity fields change (see identity.py)
+    identity_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # bumped by every change to the user's records; the page ETags (see revisions.py)
+    data_revision = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     journal_entries = db.relationship('JournalEntry', backref='author', lazy=True)
     medications = db.relationship('Medication', backref='patient', lazy=True)
@@ -34,6 +38,10 @@ class Visit(db.Model):
     reason = db.Column(db.String(255), nullable=False)
     diagnosis = db.Column(db.Text)
     visit_date = db.Column(db.DateTime(timezone=True), default=func.now)
+
+    # every per-user list is filtered on user_id and sorted on a date or name,
+    # so each table gets a composite index in that order
+    __table_args__ = (db.Index('ix_visit_user_id_visit_date', 'user_id', 'visit_date'),)
     
     # These relationships will link other items to this visit
     journal_entries = db.relationship('JournalEntry', backref='visit', lazy=True)
@@ -48,7 +56,9 @@ class JournalEntry(db.Model):
     severity = db.Column(db.String(50))
     created_at = db.Column(db.DateTime(timezone=True), default=func.now())
     # NEW: Add an optional link to a Visit
-    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=True)
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=True, index=True)
+
+    __table_args__ = (db.Index('ix_journal_entry_user_id_created_at', 'user_id', 'created_at'),)
 
 class Medication(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -58,7 +68,9 @@ class Medication(db.Model):
     frequency = db.Column(db.String(100))
     notes = db.Column(db.Text)
     # NEW: Add an optional link to a Visit where this was prescribed
-    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=True)
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=True, index=True)
+
+    __table_args__ = (db.Index('ix_medication_user_id_name', 'user_id', 'name'),)
 
 class MedicalDocument(db.Model):
     # ... (no changes to this model yet, but you could add a visit_id here too)
@@ -67,4 +79,62 @@ class MedicalDocument(db.Model):
     filename = db.Column(db.String(200), nullable=False)
     filepath = db.Column(db.String(300), nullable=False)
     upload_date = db.Column(db.DateTime(timezone=True), default=func.now())
-    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=True)
\ No newline at end of file
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=True, index=True)
+    # the stored file (see storage.py); null for documents uploaded before it
+    content_hash = db.Column(db.String(64), db.ForeignKey('stored_blob.sha256'), nullable=True, index=True)
+    size = db.Column(db.BigInteger, nullable=True)
+    # thumbnail state (see previews.py): pending, ready, failed or unsupported
+    preview_status = db.Column(db.String(20), nullable=True)
+
+    __table_args__ = (db.Index('ix_medical_document_user_id_upload_date', 'user_id', 'upload_date'),)
+
+# One row per distinct uploaded file, keyed by its SHA-256. refcount is the
+# number of MedicalDocuments pointing at it
+class StoredBlob(db.Model):
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+
+# Report generation runs off the request thread (see jobs.py); this row is how
+# the request that queued it and the worker that runs it talk to each other
+class ReportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    summary = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True))
+    finished_at = db.Column(db.DateTime(timezone=True))
+    # set once the summary has been stored as a Report
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=True)
+
+# Persistent tier of the generated-summary cache (see cache.py). The key is a
+# hash of the report's source data, prompt version and model name.
+class SummaryCacheEntry(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    model = db.Column(db.String(100), nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+# A generated consultation brief, stored with its rendered HTML so history and
+# permalinks never need the LLM or the markdown renderer again
+class Report(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    # same hash as the summary cache key: source data + prompt version + model
+    source_hash = db.Column(db.String(64), nullable=False)
+    model = db.Column(db.String(100), nullable=False)
+    markdown = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (db.Index('ix_report_user_id_created_at', 'user_id', 'created_at'),
+                      db.Index('ix_report_user_id_source_hash', 'user_id', 'source_hash'))
\ No newline at end of file
@@ -0,0 +1,145 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from sqlalchemy import select, update
+
+from . import db
+from .models import MedicalDocument
+from .revisions import bump_data_revision
+
+logger = logging.getLogger(__name__)
+
+'''
+Document thumbnails, rendered off the request thread.
+
+upload_document marks the document preview_status='pending' and hands it to a
+process pool (decoding a scan is CPU-bound, so threads would just fight over
+the GIL). The worker writes <PREVIEW_CACHE_DIR>/<doc id>.webp and the parent
+records 'ready' / 'failed' / 'unsupported' on the row. List pages only ever
+link to the cached file.
+
+PDF first pages are rendered with pypdfium2; without it PDFs are marked
+unsupported and keep the plain icon.
+'''
+
+PREVIEW_SIZE = (320, 320)
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+
+
+def render_document_preview(source_path, dest_path, size, kind):
+    '''Runs in a pool process: no app, no database. `kind` is the file
+    extension. Returns the new preview_status.'''
+    from PIL import Image, ImageOps
+
+    if kind == '.pdf':
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            return 'unsupported'
+        pdf = pdfium.PdfDocument(source_path)
+        try:
+            page = pdf[0]
+            # render at about twice the thumbnail size, not at full page resolution
+            scale = 2 * max(size) / max(page.get_size())
+            image = page.render(scale=scale).to_pil()
+        finally:
+            pdf.close()
+    elif kind in IMAGE_EXTENSIONS:
+        image = Image.open(source_path)
+        # JPEG can decode straight at a fraction of full size
+        image.draft('RGB', size)
+        image = ImageOps.exif_transpose(image)
+    else:
+        return 'unsupported'
+
+    image.thumbnail(size)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    tmp_path = dest_path + '.tmp'
+    image.save(tmp_path, 'WEBP', quality=80)
+    os.replace(tmp_path, dest_path)
+    return 'ready'
+
+
+class PreviewQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self.executor = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.eager = app.config.get('PREVIEWS_EAGER', False)
+        self.workers = app.config.get('PREVIEW_WORKERS', 2)
+        self.cache_dir = app.config['PREVIEW_CACHE_DIR']
+        app.extensions['previews'] = self
+
+    def _pool(self):
+        # started on first use, so CLI commands and tests never spawn it.
+        # spawn rather than fork: the parent has DB connections and threads
+        if self.executor is None:
+            with self._lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                        mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def path_for(self, doc_id):
+        return os.path.join(self.cache_dir, f'{doc_id}.webp')
+
+    def submit(self, doc, source_path):
+        '''Queue a preview for a document that is already committed.'''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        kind = os.path.splitext(doc.filename)[1].lower()
+        args = (source_path, self.path_for(doc.id), PREVIEW_SIZE, kind)
+        if self.eager:
+            self._finish(doc.id, *self._run_inline(args))
+            return
+        try:
+            future = self._pool().submit(render_document_preview, *args)
+        except Exception as e:
+            # e.g. a broken pool; the upload itself has already succeeded
+            self._finish(doc.id, 'failed', e)
+            return
+        future.add_done_callback(lambda f, doc_id=doc.id: self._finish(doc_id, *self._outcome(f)))
+
+    def _run_inline(self, args):
+        try:
+            return render_document_preview(*args), None
+        except Exception as e:
+            return 'failed', e
+
+    def _outcome(self, future):
+        exc = future.exception()
+        return ('failed', exc) if exc else (future.result(), None)
+
+    def _finish(self, doc_id, status, exc):
+        if exc is not None:
+            logger.warning('Preview for document %s failed: %r', doc_id, exc)
+        with self.app.app_context():
+            db.session.execute(update(MedicalDocument)
+                               .where(MedicalDocument.id == doc_id)
+                               .values(preview_status=status))
+            # the documents page shows the thumbnail now
+            bump_data_revision(db.session, db.session.scalars(
+                select(MedicalDocument.user_id).where(MedicalDocument.id == doc_id)))
+            db.session.commit()
+
+    def discard(self, doc_id):
+        try:
+            os.remove(self.path_for(doc_id))
+        except FileNotFoundError:
+            pass
+
+
+previews = PreviewQueue()
+
+
+def get_previews():
+    return current_app.extensions['previews']
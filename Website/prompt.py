@@ -0,0 +1,155 @@
+import re
+from collections import OrderedDict
+from datetime import timedelta
+
+'''
+Keeps the report prompt inside a token budget.
+
+Journal entries are the only section that grows without bound, so when the
+prompt is over budget they are compacted in fixed stages, stopping as soon as
+the estimate fits:
+
+1. repeated symptoms (same text and severity) collapse into one line
+2. Low-severity entries are aggregated per week
+3. Medium-severity entries are aggregated per week
+4. weekly aggregates keep fewer example symptoms
+
+High-severity entries are always kept verbatim. Every stage is a pure function
+of the rows, so the same data always produces the same prompt (and therefore
+the same summary cache key).
+'''
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English text; cheap and good enough to
+    # compare against a budget without calling the model's tokenizer
+    return (len(text) + 3) // 4
+
+
+def format_entry(created_at, content, severity):
+    return f"{created_at.strftime('%Y-%m-%d')}: {content}. {severity}"
+
+
+def _normalize(content):
+    return re.sub(r'\s+', ' ', (content or '').strip().lower()).rstrip('.!')
+
+
+def _week_start(created_at):
+    day = created_at.date() if hasattr(created_at, 'date') else created_at
+    return day - timedelta(days=day.weekday())
+
+
+def _shorten(text, limit=80):
+    text = (text or '').strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+class _Item:
+    '''One prompt line plus what is needed to merge it further.'''
+
+    def __init__(self, sort_key, severity, line, occurrences, week=None):
+        self.sort_key = sort_key
+        self.severity = severity
+        self.line = line
+        # [(created_at, content)] of every entry folded into this line
+        self.occurrences = occurrences
+        # set on weekly aggregates
+        self.week = week
+
+    @property
+    def count(self):
+        return len(self.occurrences)
+
+    @property
+    def contents(self):
+        return [content for _, content in self.occurrences]
+
+
+def _initial_items(rows):
+    return [_Item(created_at, severity, format_entry(created_at, content, severity), [(created_at, content)])
+            for created_at, content, severity in rows]
+
+
+def _collapse_repeats(items):
+    groups = OrderedDict()
+    kept = []
+    for item in items:
+        if item.severity == 'High' or item.count > 1:
+            kept.append(item)
+            continue
+        groups.setdefault((_normalize(item.contents[0]), item.severity), []).append(item)
+    for group in groups.values():
+        if len(group) == 1:
+            kept.append(group[0])
+            continue
+        first, last = group[0].sort_key, group[-1].sort_key
+        content, severity = group[0].contents[0], group[0].severity
+        line = (f"{first.strftime('%Y-%m-%d')} to {last.strftime('%Y-%m-%d')} "
+                f"(x{len(group)}): {content}. {severity}")
+        occurrences = [occurrence for item in group for occurrence in item.occurrences]
+        kept.append(_Item(first, severity, line, occurrences))
+    return kept
+
+
+def _weekly_line(week, severity, count, contents, max_examples):
+    head = f"Week of {week.strftime('%Y-%m-%d')}: {count} {severity.lower()}-severity entries"
+    if max_examples == 0:
+        return head
+    distinct = list(OrderedDict.fromkeys(_shorten(c) for c in contents))
+    shown = '; '.join(distinct[:max_examples])
+    if len(distinct) > max_examples:
+        shown += f"; and {len(distinct) - max_examples} more"
+    return f"{head}: {shown}"
+
+
+def _aggregate_weekly(items, severity, max_examples=5):
+    weeks = OrderedDict()
+    kept = []
+    for item in items:
+        if item.severity != severity:
+            kept.append(item)
+            continue
+        # a collapsed repeat may span many weeks; count each entry in its own week
+        for occurrence in item.occurrences:
+            weeks.setdefault(_week_start(occurrence[0]), []).append(occurrence)
+    for week in sorted(weeks):
+        occurrences = sorted(weeks[week], key=lambda occurrence: occurrence[0])
+        line = _weekly_line(week, severity, len(occurrences), [c for _, c in occurrences], max_examples)
+        kept.append(_Item(occurrences[0][0], severity, line, occurrences, week=week))
+    return kept
+
+
+def _trim_examples(items, max_examples):
+    for item in items:
+        if item.week is not None:
+            item.line = _weekly_line(item.week, item.severity, item.count, item.contents, max_examples)
+    return items
+
+
+def _render(items):
+    return [item.line for item in sorted(items, key=lambda item: item.sort_key)]
+
+
+def compact_journal_lines(rows, budget_tokens):
+    '''rows are (created_at, content, severity) in date order. Returns
+    (lines, stages_applied); lines fit in budget_tokens unless only
+    High-severity entries are left.'''
+    items = _initial_items(rows)
+
+    def fits(items):
+        return estimate_tokens('\n'.join(item.line for item in items)) <= budget_tokens
+
+    stages = [
+        ('collapse repeats', _collapse_repeats),
+        ('weekly low', lambda items: _aggregate_weekly(items, 'Low')),
+        ('weekly medium', lambda items: _aggregate_weekly(items, 'Medium')),
+        ('fewer examples', lambda items: _trim_examples(items, 2)),
+        ('no examples', lambda items: _trim_examples(items, 0)),
+    ]
+    applied = []
+    for name, stage in stages:
+        if fits(items):
+            break
+        items = stage(sorted(items, key=lambda item: item.sort_key))
+        applied.append(name)
+    return _render(items), applied
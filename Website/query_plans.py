@@ -0,0 +1,113 @@
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select
+
+from . import db
+from .ai_report import ReportGenerator
+from .models import JournalEntry, Medication, MedicalDocument, Visit
+from .timeline import encode_cursor, fetch_timeline_page
+
+logger = logging.getLogger(__name__)
+
+# the databases explain() can read a plan from
+EXPLAIN_DIALECTS = ('sqlite', 'postgresql')
+
+
+def hot_queries(user_id):
+    '''The per-user queries that run on every page load or report. Report and
+    timeline queries are given as the functions that issue them, so the check
+    always sees the SQL production sends; the plain page queries as the
+    statements the routes build.'''
+    end = datetime.utcnow()
+    start = end - timedelta(days=30)
+    return {
+        'report rows': lambda: ReportGenerator(user_id).fetch_rows(start, end),
+        'timeline': lambda: fetch_timeline_page(user_id, limit=25),
+        'timeline next page': lambda: fetch_timeline_page(
+            user_id, cursor=encode_cursor(end, 'journal', 2 ** 31 - 1), limit=25),
+        'upload visits': select(Visit).where(Visit.user_id == user_id).order_by(Visit.visit_date.desc()),
+        'documents': select(MedicalDocument).where(
+            MedicalDocument.user_id == user_id).order_by(MedicalDocument.upload_date.desc()),
+        'medications': select(Medication).where(Medication.user_id == user_id).order_by(Medication.name),
+        'visit journals': select(JournalEntry).where(JournalEntry.visit_id == 1),
+    }
+
+
+def issued_statements(fn):
+    '''Calls fn() and returns the (sql, parameters) it sent to the database.'''
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.session.get_bind()
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    return statements
+
+
+def compiled_statement(stmt):
+    '''(sql, parameters) for a select, in the driver's paramstyle.'''
+    compiled = stmt.compile(dialect=db.session.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    return str(compiled), params
+
+
+def explain(sql, params):
+    '''Returns the plan lines the current database would use for `sql`.'''
+    engine = db.session.get_bind()
+    conn = db.session.connection()
+
+    if engine.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, params)
+        # (id, parent, notused, detail)
+        return [row[3] for row in rows]
+
+    if engine.dialect.name == 'postgresql':
+        # tables are tiny in dev databases and the planner would rightly pick a
+        # seq scan anyway; disabling it shows whether an index *can* be used
+        conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        rows = conn.exec_driver_sql('EXPLAIN ' + sql, params)
+        return [row[0] for row in rows]
+
+    raise ValueError(f'EXPLAIN is not supported for {engine.dialect.name}')
+
+
+def is_sequential_scan(plan_line):
+    line = plan_line.strip()
+    if 'Seq Scan' in line:
+        return True
+    # sqlite reports "SCAN table" for a full scan and
+    # "SCAN table USING [COVERING] INDEX ..." for an index walk; scans of a
+    # subquery's rows (UNION ALL branches) are not table scans
+    if not line.startswith('SCAN ') or 'USING' in line:
+        return False
+    return line.split()[1] in db.metadata.tables
+
+
+def check_query_plans(user_id=1):
+    '''Runs EXPLAIN on every hot query and returns {name: (plan_lines, ok)}.
+    A function that issues several statements gets one entry per statement.
+    On a database explain() can't read plans from, nothing is checked and the
+    result is empty.'''
+    results = {}
+    dialect = db.session.get_bind().dialect.name
+    if dialect not in EXPLAIN_DIALECTS:
+        logger.warning('Query plans can only be checked on %s, not %s; skipped', ' or '.join(EXPLAIN_DIALECTS), dialect)
+        return results
+    try:
+        for name, query in hot_queries(user_id).items():
+            statements = issued_statements(query) if callable(query) else [compiled_statement(query)]
+            for n, (sql, params) in enumerate(statements, 1):
+                plan = explain(sql, params)
+                key = name if len(statements) == 1 else f'{name} ({n})'
+                results[key] = (plan, not any(is_sequential_scan(line) for line in plan))
+    finally:
+        db.session.rollback()
+    return results
@@ -0,0 +1,59 @@
+import hashlib
+import threading
+
+import markdown
+from flask import current_app
+
+from .cache import LRUCache
+
+'''
+Markdown rendering for the `markdown` Jinja filter.
+
+markdown.markdown() builds a new Markdown instance and loads its extensions on
+every call. Here each thread keeps one configured instance (they are not
+thread-safe) and rendered HTML is kept in a bounded LRU keyed by a hash of the
+source, so re-viewing or printing a report does no markdown work at all.
+'''
+
+EXTENSIONS = ['nl2br', 'fenced_code']
+
+
+class MarkdownRenderer:
+    def __init__(self, extensions=EXTENSIONS, cache_size=128):
+        self.extensions = list(extensions)
+        self.cache = LRUCache(maxsize=cache_size)
+        self._local = threading.local()
+
+    def _markdown(self):
+        md = getattr(self._local, 'md', None)
+        if md is None:
+            md = self._local.md = markdown.Markdown(extensions=self.extensions)
+        return md
+
+    def convert(self, text):
+        '''Renders without touching the cache.'''
+        md = self._markdown()
+        try:
+            return md.convert(text)
+        finally:
+            md.reset()
+
+    def render(self, text):
+        text = text or ''
+        key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        html = self.cache.get(key)
+        if html is None:
+            html = self.convert(text)
+            self.cache.set(key, html)
+        return html
+
+
+def init_rendering(app):
+    renderer = MarkdownRenderer(cache_size=app.config.get('MARKDOWN_CACHE_SIZE', 128))
+    app.extensions['markdown'] = renderer
+    app.add_template_filter(renderer.render, 'markdown')
+    return renderer
+
+
+def get_renderer():
+    return current_app.extensions['markdown']
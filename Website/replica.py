@@ -0,0 +1,76 @@
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+'''
+Read-replica routing.
+
+With DATABASE_REPLICA_URL set there is a second engine, the 'replica' bind.
+Views decorated with @use_replica send their SELECTs to it; flushes and
+INSERT/UPDATE/DELETE statements always go to the primary, whatever the view.
+Without a replica configured the decorator does nothing.
+
+Replicas lag behind the primary, so a user who has just written something
+(add a journal entry, then land on the dashboard) reads from the primary for
+REPLICA_STICKY_SECONDS afterwards; the deadline is kept in their session.
+'''
+
+REPLICA_BIND = 'replica'
+_STICKY_KEY = '_primary_until'
+
+
+class RoutingSession(FlaskSession):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                self.info['wrote_primary'] = True
+            elif getattr(clause, 'is_select', False) and _reading_from_replica(self):
+                return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _reading_from_replica(db_session):
+    if not has_request_context() or not g.get('use_replica'):
+        return False
+    if REPLICA_BIND not in db_session._db.engines:
+        return False
+    return replica_allowed()
+
+
+def replica_allowed():
+    '''False while the current user is stuck to the primary after a write.'''
+    return session.get(_STICKY_KEY, 0) < time.time()
+
+
+def stick_to_primary():
+    '''Keeps the current user on the primary for REPLICA_STICKY_SECONDS. Called
+    after every commit that wrote; the async views (asyncdb.py) call it
+    themselves.'''
+    if REPLICA_BIND in (current_app.config.get('SQLALCHEMY_BINDS') or {}):
+        session[_STICKY_KEY] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 5)
+
+
+def use_replica(view):
+    '''Route the view's reads to the replica. Put it below @login_required, so
+    the logged-in user is still loaded from the primary.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@event.listens_for(Session, 'after_commit')
+def _stick_to_primary(session_):
+    if not session_.info.pop('wrote_primary', False) or not has_request_context():
+        return
+    stick_to_primary()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_writes(session_):
+    session_.info.pop('wrote_primary', None)
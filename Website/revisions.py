@@ -0,0 +1,91 @@
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import JournalEntry, MedicalDocument, Medication, User, Visit
+
+'''
+Per-user data revision, for conditional GETs of the record pages.
+
+user.data_revision goes up in the same transaction as any change to the user's
+journal entries, visits, medications or documents. ORM changes are caught at
+flush, whichever code path made them (views, the ASGI views, report jobs);
+Core bulk writes (import, preview status) call bump_data_revision themselves.
+
+@conditional_page turns it into a weak ETag. When the browser revalidates with
+a matching If-None-Match the view is skipped: one primary-key lookup and a 304,
+no page queries and no template rendering.
+'''
+
+_OWNED = (JournalEntry, Visit, Medication, MedicalDocument)
+
+
+def bump_data_revision(session_, user_ids):
+    user_ids = sorted(set(user_ids))
+    if user_ids:
+        session_.execute(update(User.__table__)
+                         .where(User.__table__.c.id.in_(user_ids))
+                         .values(data_revision=User.__table__.c.data_revision + 1))
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_changed_owners(session_, flush_context):
+    # new/dirty/deleted still describe what was just flushed
+    changed = {obj.user_id for obj in (*session_.new, *session_.dirty, *session_.deleted)
+               if isinstance(obj, _OWNED) and obj.user_id is not None
+               and (obj not in session_.dirty or session_.is_modified(obj))}
+    if changed:
+        bump_data_revision(session_.connection(), changed)
+
+
+def _fingerprint(app):
+    '''Hash of the templates and code the pages are rendered from, so a deploy
+    that changes a page doesn't answer 304 for the old one.'''
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(app.root_path):
+        dirnames[:] = sorted(d for d in dirnames if d not in ('static', '__pycache__'))
+        for name in sorted(filenames):
+            if name.endswith(('.py', '.html')):
+                path = os.path.join(dirpath, name)
+                digest.update(os.path.relpath(path, app.root_path).encode())
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def init_revisions(app):
+    app.extensions['page_fingerprint'] = _fingerprint(app)
+
+
+def page_etag():
+    revision = db.session.execute(select(User.data_revision).where(User.id == current_user.id)).scalar()
+    return (f'{current_app.extensions["page_fingerprint"]}-{current_user.id}'
+            f'-{revision}-{current_user.identity_version}')
+
+
+def conditional_page(view):
+    '''ETag/304 for a page built only from the current user's records. Put it
+    below @use_replica, so the revision is read where the page data is.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if '_flashes' in session:
+            # the page has a message to show once; render it
+            return view(*args, **kwargs)
+        etag = page_etag()
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # private data: the browser keeps it but has to revalidate every time
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
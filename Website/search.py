@@ -0,0 +1,287 @@
+import logging
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+from markupsafe import Markup, escape
+from sqlalchemy import and_, event, func, literal, or_, select, text, union_all
+
+from . import db
+from .models import JournalEntry, Medication, MedicalDocument, Visit
+
+logger = logging.getLogger(__name__)
+
+'''
+Full-text search over a user's records.
+
+PostgreSQL: every searchable table gets a generated `search_vector` tsvector
+column with a GIN index, so matching and ranking never scan the table.
+SQLite (local/dev): a single FTS5 table `search_fts` mirrors the same text and is
+kept in sync by triggers. Other databases get an unranked, unindexed
+substring match, with a warning in the log.
+
+Both backends are created by install_search_index(), which db.create_all()
+and `flask rebuild-search-index` call. The Alembic migration that added them
+keeps its own copy of the DDL as it was then; a change to SOURCES or the
+statements below needs a new migration.
+'''
+
+# highlight delimiters used inside the database; they are swapped for <mark>
+# only after the snippet has been HTML-escaped
+_HL_START = '\x02'
+_HL_STOP = '\x03'
+
+SearchHit = namedtuple('SearchHit', 'type data snippet rank')
+SearchPage = namedtuple('SearchPage', 'hits total page per_page')
+
+
+class _Source:
+    def __init__(self, kind, model, table, title_cols, body_cols, slot):
+        self.kind = kind
+        self.model = model
+        self.table = table
+        self.title_cols = title_cols
+        self.body_cols = body_cols
+        # fts5 rowid = record id * len(SOURCES) + slot, so a trigger can find
+        # the mirror row of a record without scanning the index
+        self.slot = slot
+
+    def _concat(self, cols, prefix=''):
+        parts = [f"coalesce({prefix}{col}, '')" for col in cols]
+        return " || ' ' || ".join(parts) if parts else "''"
+
+    def title_sql(self, prefix=''):
+        if self.table == 'medical_document':
+            # "blood_test-2024.pdf" -> "blood test 2024 pdf"
+            return f"replace(replace(replace({self._concat(self.title_cols, prefix)}, '_', ' '), '-', ' '), '.', ' ')"
+        return self._concat(self.title_cols, prefix)
+
+    def body_sql(self, prefix=''):
+        return self._concat(self.body_cols, prefix)
+
+    def tsvector_sql(self):
+        return (f"setweight(to_tsvector('english', {self.title_sql()}), 'A') || "
+                f"setweight(to_tsvector('english', {self.body_sql()}), 'B')")
+
+
+SOURCES = [
+    _Source('journal', JournalEntry, 'journal_entry', ['title'], ['content', 'severity'], 0),
+    _Source('visit', Visit, 'visit', ['reason'], ['doctor_name', 'diagnosis'], 1),
+    _Source('medication', Medication, 'medication', ['name'], ['dosage', 'frequency', 'notes'], 2),
+    _Source('document', MedicalDocument, 'medical_document', ['filename'], [], 3),
+]
+SOURCES_BY_KIND = {source.kind: source for source in SOURCES}
+
+
+def tokenize(query, max_terms=8):
+    '''Reduces free text to plain word tokens; both backends treat each token
+    as a prefix so partially typed words still match.'''
+    return re.findall(r'\w+', query.lower())[:max_terms]
+
+
+def _render_snippet(raw):
+    if not raw:
+        return Markup('')
+    html = str(escape(raw))
+    html = html.replace(_HL_START, '<mark class="highlight">').replace(_HL_STOP, '</mark>')
+    return Markup(html)
+
+
+# --- schema -----------------------------------------------------------------
+
+def _postgres_ddl():
+    for source in SOURCES:
+        yield (f"ALTER TABLE {source.table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+               f"GENERATED ALWAYS AS ({source.tsvector_sql()}) STORED")
+        yield (f"CREATE INDEX IF NOT EXISTS ix_{source.table}_search_vector "
+               f"ON {source.table} USING GIN (search_vector)")
+
+
+def _sqlite_ddl():
+    n = len(SOURCES)
+    yield ("CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+           "kind UNINDEXED, record_id UNINDEXED, owner, title, body, tokenize='porter unicode61')")
+    for source in SOURCES:
+        values = (f"new.id * {n} + {source.slot}, '{source.kind}', new.id, 'u' || new.user_id, "
+                  f"{source.title_sql('new.')}, {source.body_sql('new.')}")
+        insert = f"INSERT INTO search_fts(rowid, kind, record_id, owner, title, body) VALUES ({values});"
+        delete = f"DELETE FROM search_fts WHERE rowid = old.id * {n} + {source.slot};"
+        yield (f"CREATE TRIGGER IF NOT EXISTS {source.table}_fts_insert AFTER INSERT ON {source.table} "
+               f"BEGIN {insert} END")
+        yield (f"CREATE TRIGGER IF NOT EXISTS {source.table}_fts_update AFTER UPDATE ON {source.table} "
+               f"BEGIN {delete} {insert} END")
+        yield (f"CREATE TRIGGER IF NOT EXISTS {source.table}_fts_delete AFTER DELETE ON {source.table} "
+               f"BEGIN {delete} END")
+
+
+def install_search_index(connection):
+    '''Creates the search columns/indexes (PostgreSQL) or the FTS5 mirror and
+    its triggers (SQLite). Safe to run more than once.'''
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        statements = _postgres_ddl()
+    elif dialect == 'sqlite':
+        statements = _sqlite_ddl()
+    else:
+        return
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    if dialect == 'sqlite':
+        rebuild_search_index(connection)
+
+
+def drop_search_index(connection):
+    dialect = connection.dialect.name
+    for source in SOURCES:
+        if dialect == 'postgresql':
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{source.table}_search_vector")
+            connection.exec_driver_sql(f"ALTER TABLE {source.table} DROP COLUMN IF EXISTS search_vector")
+        elif dialect == 'sqlite':
+            for suffix in ('insert', 'update', 'delete'):
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {source.table}_fts_{suffix}")
+    if dialect == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS search_fts")
+
+
+def rebuild_search_index(connection):
+    '''Refills the SQLite mirror from the source tables. PostgreSQL keeps its
+    generated columns up to date by itself, so there is nothing to do there.'''
+    if connection.dialect.name != 'sqlite':
+        return
+    n = len(SOURCES)
+    connection.exec_driver_sql("DELETE FROM search_fts")
+    for source in SOURCES:
+        connection.exec_driver_sql(
+            f"INSERT INTO search_fts(rowid, kind, record_id, owner, title, body) "
+            f"SELECT id * {n} + {source.slot}, '{source.kind}', id, 'u' || user_id, "
+            f"{source.title_sql()}, {source.body_sql()} FROM {source.table}")
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    '''Alembic autogenerate hook: the search objects are created outside the
+    models, so keep autogenerate from proposing to drop them.'''
+    if not reflected or compare_to is not None:
+        return True
+    if type_ == 'table' and name.startswith('search_fts'):
+        return False
+    if type_ == 'column' and name == 'search_vector':
+        return False
+    if type_ == 'index' and name.endswith('_search_vector'):
+        return False
+    return True
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _install_after_create_all(target, connection, **kw):
+    install_search_index(connection)
+
+
+# --- querying ---------------------------------------------------------------
+
+def _sqlite_search(session, user_id, terms, limit, offset):
+    terms_sql = ' AND '.join(f'"{term}"*' for term in terms)
+    match = f'owner : "u{user_id}" AND {{title body}} : ({terms_sql})'
+    total = session.execute(
+        text("SELECT count(*) FROM search_fts WHERE search_fts MATCH :match"), {'match': match}).scalar()
+    rows = session.execute(text(
+        "SELECT kind, record_id, bm25(search_fts, 0, 0, 0, 10.0, 1.0) AS rank, "
+        "snippet(search_fts, 3, :hl_start, :hl_stop, '…', 16) AS title_snippet, "
+        "snippet(search_fts, 4, :hl_start, :hl_stop, '…', 16) AS body_snippet "
+        "FROM search_fts WHERE search_fts MATCH :match "
+        "ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), {'match': match, 'hl_start': _HL_START, 'hl_stop': _HL_STOP,
+        'limit': limit, 'offset': offset}).all()
+    hits = []
+    for row in rows:
+        # prefer the body excerpt unless only the title matched
+        snippet = row.body_snippet if _HL_START in (row.body_snippet or '') else row.title_snippet
+        # bm25 is "lower is better"; flip it so callers always sort descending
+        hits.append((row.kind, int(row.record_id), -row.rank, snippet))
+    return total, hits
+
+
+def _postgres_search(session, user_id, terms, limit, offset):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    params = {'tsquery': tsquery, 'user_id': user_id}
+    branches = [
+        f"SELECT '{source.kind}' AS kind, id, ts_rank(search_vector, q) AS rank "
+        f"FROM {source.table}, to_tsquery('english', :tsquery) q "
+        f"WHERE user_id = :user_id AND search_vector @@ q"
+        for source in SOURCES
+    ]
+    union = ' UNION ALL '.join(branches)
+    total = session.execute(text(f"SELECT count(*) FROM ({union}) hits"), params).scalar()
+    rows = session.execute(
+        text(f"SELECT kind, id, rank FROM ({union}) hits ORDER BY rank DESC, kind, id DESC "
+             f"LIMIT :limit OFFSET :offset"),
+        dict(params, limit=limit, offset=offset)).all()
+
+    # headlines are expensive, so they are only computed for the rows on this page
+    snippets = {}
+    options = f'StartSel={_HL_START}, StopSel={_HL_STOP}, MaxWords=30, MinWords=10'
+    for source in SOURCES:
+        ids = [row.id for row in rows if row.kind == source.kind]
+        if not ids:
+            continue
+        text_sql = f"{source.title_sql()} || ' ' || {source.body_sql()}"
+        for record_id, snippet in session.execute(
+            text(f"SELECT id, ts_headline('english', {text_sql}, to_tsquery('english', :tsquery), :options) "
+                 f"FROM {source.table} WHERE id = ANY(:ids)"),
+            {'tsquery': tsquery, 'options': options, 'ids': ids}
+        ):
+            snippets[(source.kind, record_id)] = snippet
+    return total, [(row.kind, row.id, row.rank, snippets.get((row.kind, row.id))) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def _warn_unindexed(dialect):
+    logger.warning('No full-text index on %s; search falls back to unindexed substring matching', dialect)
+
+
+def _like_search(session, user_id, terms, limit, offset):
+    '''Every term has to appear in one of the record's text columns.'''
+    branches = []
+    for source in SOURCES:
+        cols = [getattr(source.model, col) for col in source.title_cols + source.body_cols]
+        matches = [or_(*[col.icontains(term, autoescape=True) for col in cols]) for term in terms]
+        branches.append(select(literal(source.kind).label('kind'), source.model.id.label('id'))
+                        .where(source.model.user_id == user_id, and_(*matches)))
+    hits = union_all(*branches).subquery()
+    total = session.execute(select(func.count()).select_from(hits)).scalar()
+    rows = session.execute(select(hits.c.kind, hits.c.id).order_by(hits.c.kind, hits.c.id.desc())
+                           .limit(limit).offset(offset)).all()
+    return total, [(row.kind, row.id, 0.0, None) for row in rows]
+
+
+def search_records(user_id, query, page=1, per_page=20, session=None):
+    '''Ranked, paginated search across journals, visits, medications and
+    documents. Returns a SearchPage whose hits are in rank order and carry an
+    HTML-safe highlighted snippet. Runs on db.session unless `session` is given
+    (the ASGI view passes the sync side of an AsyncSession, see asyncdb.py).'''
+    session = db.session if session is None else session
+    page = max(page, 1)
+    terms = tokenize(query)
+    if not terms:
+        return SearchPage([], 0, page, per_page)
+
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        backend = _postgres_search
+    elif dialect == 'sqlite':
+        backend = _sqlite_search
+    else:
+        _warn_unindexed(dialect)
+        backend = _like_search
+    total, rows = backend(session, user_id, terms, per_page, (page - 1) * per_page)
+
+    loaded = {}
+    for source in SOURCES:
+        ids = [record_id for kind, record_id, _, _ in rows if kind == source.kind]
+        if ids:
+            for obj in session.scalars(select(source.model).where(source.model.id.in_(ids),
+                                                                   source.model.user_id == user_id)):
+                loaded[(source.kind, obj.id)] = obj
+
+    hits = [SearchHit(kind, loaded[(kind, record_id)], _render_snippet(snippet), rank)
+            for kind, record_id, rank, snippet in rows if (kind, record_id) in loaded]
+    return SearchPage(hits, total, page, per_page)
@@ -0,0 +1,407 @@
+import hashlib
+import os
+import random
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import func, insert, select, text, update
+from werkzeug.security import generate_password_hash
+
+from . import db
+from .cache import get_summary_cache
+from .models import JournalEntry, MedicalDocument, Medication, StoredBlob, User, Visit
+from .search import drop_search_index, install_search_index
+from .storage import get_storage
+
+'''
+Demo and synthetic data.
+
+seed_demo() sets up the demo account the README points at. generate() fills
+the database for load testing (`flask seed --users ...`):
+
+Rows are built as plain dicts and written with one executemany per table per
+batch of users, committing after each batch, so memory stays bounded and
+millions of rows go in at bulk-insert speed. Primary keys are assigned here,
+continuing after the current maximum, which lets journal entries, medications
+and documents point at their visits without reading anything back; on
+PostgreSQL the id sequences are moved past them at the end. On SQLite the
+full-text mirror is rebuilt once at the end instead of row by row.
+
+Each user gets their own random.Random seeded from (seed, user number), so the
+same --seed always produces the same data whatever the batch size, and a run
+with more users is a superset of a smaller one. Dates are laid out backwards
+from --end-date (default today).
+
+Every user's history is a handful of health episodes (a cold, back pain, a
+migraine spell...): each has a visit with its doctor, diagnosis and usually a
+prescription, and journal entries cluster around the visit with severity
+peaking near it; the rest are routine low-severity check-ins. Documents all
+share one small placeholder PDF in DOCUMENT_STORAGE_DIR, so downloads work.
+'''
+
+PASSWORD = 'loadtest'
+
+# reason, doctor specialty, diagnosis, medication (name, dosage, frequency) or None,
+# journal titles from onset to recovery
+EPISODES = [
+    ('Persistent cough and congestion', 'General practice',
+     'Upper respiratory infection. Rest, fluids and a humidifier recommended.',
+     ('Azithromycin', '500mg', 'Once daily for 3 days'),
+     ['Feeling under the weather', 'Cough getting worse', 'Post-appointment update', 'Much better']),
+    ('Lower back pain', 'Orthopedics',
+     'Lumbar muscle strain from poor ergonomics. Physical therapy referral.',
+     ('Ibuprofen', '400mg', 'As needed (max 3x daily)'),
+     ['Back pain after work', 'Back pain worse', 'Started PT exercises', 'Back feeling better']),
+    ('Skin rash on arms', 'Dermatology',
+     'Contact dermatitis, likely from laundry detergent.',
+     ('Hydrocortisone Cream 1%', 'Topical', 'Apply twice daily'),
+     ['Itchy rash on forearms', 'Rash spreading', 'Cream helping']),
+    ('Seasonal allergy consultation', 'Allergy',
+     'Allergic rhinitis to pollen. Air purifier recommended.',
+     ('Cetirizine', '10mg', 'Once daily in the morning'),
+     ['Sneezing all morning', 'Allergy symptoms persist', 'Allergies under control']),
+    ('Migraine headaches', 'Neurology',
+     'Migraine with visual aura. Stress management and sleep hygiene advised.',
+     ('Sumatriptan', '50mg', 'As needed for migraine'),
+     ['Bad headache', 'Migraine with aura', 'Headache improving']),
+    ('Stomach pain after meals', 'Gastroenterology',
+     'Mild gastritis. Avoid spicy food and alcohol for two weeks.',
+     ('Omeprazole', '20mg', 'Once daily before breakfast'),
+     ['Stomach ache again', 'Heartburn at night', 'Diet change helping']),
+    ('Sprained ankle', 'Orthopedics',
+     'Grade 1 ankle sprain. RICE protocol for one week.',
+     None,
+     ['Twisted my ankle', 'Swelling down a bit', 'Walking normally']),
+    ('Trouble sleeping', 'General practice',
+     'Insomnia related to stress. Sleep hygiene plan agreed.',
+     ('Melatonin', '3mg', 'Nightly before bed'),
+     ['Awake until 3am', 'Another bad night', 'Slept through the night']),
+]
+ROUTINE = [
+    ('Regular check-in', 'Overall health stable. Exercising and sleeping well.'),
+    ('Feeling great', 'No symptoms today. Energy is good.'),
+    ('Mild headache today', 'Tension headache from work. Taking breaks and staying hydrated.'),
+    ('A bit tired', 'Low energy this afternoon, probably a late night.'),
+]
+CHECKUP = ('Annual physical exam', 'General practice',
+           'Overall health good. Blood work normal. Continue current habits.')
+LAST_NAMES = ['Johnson', 'Chen', 'Rodriguez', 'Lee', 'Martinez', 'Patel', 'Nguyen', 'Okafor',
+              'Schmidt', 'Kowalski', 'Haddad', 'Silva', 'Tanaka', 'Murphy', 'Ivanova', 'Dubois']
+DOCUMENT_NAMES = ['blood_test', 'xray', 'lab_results', 'referral', 'prescription', 'mri_report']
+
+# a one-page blank PDF every generated document points at
+PLACEHOLDER_PDF = (b'%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n'
+                   b'2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n'
+                   b'3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>endobj\n'
+                   b'trailer<</Root 1 0 R>>\n%%EOF\n')
+
+
+# the hand-written demo account (`flask seed` / python seed.py): six months
+# ending today
+DEMO_EMAIL = 'demo@example.com'
+DEMO_PASSWORD = 'demo123'
+DEMO_VISITS = [
+    {
+        "reason": "Annual Physical Exam",
+        "doctor": "Dr. Sarah Johnson",
+        "diagnosis": "Overall health excellent. Blood pressure 120/80. BMI 23.5. Recommended maintaining current exercise routine and balanced diet.",
+        "days_ago": 170
+    },
+    {
+        "reason": "Persistent cough and congestion",
+        "doctor": "Dr. Mark Chen",
+        "diagnosis": "Upper respiratory infection. Prescribed azithromycin 500mg and recommended rest, fluids, and humidifier use.",
+        "days_ago": 140
+    },
+    {
+        "reason": "Follow-up for respiratory infection",
+        "doctor": "Dr. Mark Chen",
+        "diagnosis": "Full recovery confirmed. Lungs clear. Advised to complete antibiotic course and get flu vaccine.",
+        "days_ago": 130
+    },
+    {
+        "reason": "Lower back pain",
+        "doctor": "Dr. Emily Rodriguez",
+        "diagnosis": "Lumbar muscle strain from poor ergonomics. Prescribed ibuprofen 400mg TID, physical therapy referral, and posture correction exercises.",
+        "days_ago": 95
+    },
+    {
+        "reason": "Skin rash on arms",
+        "doctor": "Dr. Amanda Lee",
+        "diagnosis": "Contact dermatitis likely from laundry detergent. Prescribed hydrocortisone 1% cream BID and recommended hypoallergenic products.",
+        "days_ago": 70
+    },
+    {
+        "reason": "Seasonal allergy consultation",
+        "doctor": "Dr. Rachel Martinez",
+        "diagnosis": "Allergic rhinitis to pollen. Prescribed cetirizine 10mg daily and fluticasone nasal spray. Recommended air purifier.",
+        "days_ago": 45
+    },
+    {
+        "reason": "Migraine headaches",
+        "doctor": "Dr. Kevin Patel",
+        "diagnosis": "Tension-type migraine with visual aura. Prescribed sumatriptan 50mg as needed. Recommended stress management and sleep hygiene.",
+        "days_ago": 20
+    },
+    {
+        "reason": "Routine follow-up",
+        "doctor": "Dr. Sarah Johnson",
+        "diagnosis": "All previous conditions resolved. Blood work normal. Continue current medications and healthy lifestyle habits.",
+        "days_ago": 5
+    }
+]
+
+DEMO_JOURNALS = [
+    {"title": "Feeling under the weather", "content": "Started feeling congested and tired. Slight fever of 99.8°F. Taking it easy today.", "severity": "Medium", "days_ago": 142},
+    {"title": "Cough getting worse", "content": "Cough is more persistent today. Some chest tightness. Scheduled doctor appointment.", "severity": "High", "days_ago": 141},
+    {"title": "Post-appointment update", "content": "Doctor prescribed antibiotics. Already feeling a bit better after first dose.", "severity": "Medium", "days_ago": 140},
+    {"title": "Much better!", "content": "Cough almost gone. Energy levels back to normal. Glad the antibiotics worked.", "severity": "Low", "days_ago": 135},
+
+    {"title": "Back pain after work", "content": "Lower back is really sore after sitting at desk all day. Must improve my posture.", "severity": "Medium", "days_ago": 100},
+    {"title": "Back pain worse", "content": "Pain radiating down left leg. Hard to stand up straight. Need to see doctor.", "severity": "High", "days_ago": 96},
+    {"title": "Started PT exercises", "content": "Physical therapist showed me stretches. Doing them 3x daily. Some relief already.", "severity": "Medium", "days_ago": 90},
+    {"title": "Back feeling better", "content": "PT exercises are helping. Pain down to 3/10. Can sit for longer periods now.", "severity": "Low", "days_ago": 80},
+
+    {"title": "Itchy rash on forearms", "content": "Red, itchy patches appeared overnight. Maybe new laundry detergent?", "severity": "Medium", "days_ago": 72},
+    {"title": "Rash spreading", "content": "Rash now on both arms and chest. Very itchy. Appointment with dermatologist tomorrow.", "severity": "High", "days_ago": 71},
+    {"title": "Cream helping", "content": "Hydrocortisone cream from doctor is working. Rash fading and less itchy.", "severity": "Low", "days_ago": 68},
+
+    {"title": "Sneezing all morning", "content": "Seasonal allergies are back. Constant sneezing, runny nose, itchy eyes.", "severity": "Medium", "days_ago": 50},
+    {"title": "Allergy symptoms persist", "content": "Still sneezing a lot. Eyes watery. Pollen count must be high.", "severity": "Medium", "days_ago": 48},
+    {"title": "Allergies under control", "content": "New allergy medication working well. Minimal symptoms now.", "severity": "Low", "days_ago": 42},
+
+    {"title": "Bad headache", "content": "Woke up with throbbing headache on right side. Light sensitivity. Possible migraine.", "severity": "High", "days_ago": 22},
+    {"title": "Migraine with aura", "content": "Visual disturbances before headache. Took prescribed medication. Resting in dark room.", "severity": "High", "days_ago": 21},
+    {"title": "Headache improving", "content": "Sumatriptan helped. Headache down to dull ache. Able to eat light meal.", "severity": "Low", "days_ago": 20},
+
+    {"title": "Mild headache today", "content": "Tension headache from work stress. Taking breaks and staying hydrated.", "severity": "Low", "days_ago": 10},
+    {"title": "Feeling great!", "content": "No symptoms today. Energy is good. Maintaining healthy habits.", "severity": "Low", "days_ago": 3},
+    {"title": "Regular check-in", "content": "Overall health stable. Exercising 4x week, eating well, sleeping 7-8 hours.", "severity": "Low", "days_ago": 1},
+]
+
+DEMO_MEDICATIONS = [
+    {"name": "Cetirizine (Zyrtec)", "dosage": "10mg", "frequency": "Once daily in the morning", "notes": "For seasonal allergies. Take with or without food."},
+    {"name": "Fluticasone Nasal Spray", "dosage": "2 sprays each nostril", "frequency": "Once daily", "notes": "For allergy symptoms. Use consistently for best results."},
+    {"name": "Ibuprofen", "dosage": "400mg", "frequency": "As needed (max 3x daily)", "notes": "For back pain and inflammation. Take with food."},
+    {"name": "Sumatriptan", "dosage": "50mg", "frequency": "As needed for migraine", "notes": "Take at first sign of migraine. Max 2 doses per 24 hours."},
+    {"name": "Hydrocortisone Cream 1%", "dosage": "Topical", "frequency": "Apply twice daily", "notes": "For skin rash. Apply thin layer to affected areas."},
+]
+
+
+def _next_id(model):
+    return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _severity(rng, distance):
+    '''Weighted towards High close to the visit, Low away from it.'''
+    if distance <= 2:
+        weights = (15, 35, 50)
+    elif distance <= 7:
+        weights = (35, 45, 20)
+    else:
+        weights = (70, 25, 5)
+    return rng.choices(('Low', 'Medium', 'High'), weights)[0]
+
+
+class _Ids:
+    def __init__(self):
+        self.user = _next_id(User)
+        self.visit = _next_id(Visit)
+        self.journal = _next_id(JournalEntry)
+        self.medication = _next_id(Medication)
+        self.document = _next_id(MedicalDocument)
+
+    def take(self, name):
+        value = getattr(self, name)
+        setattr(self, name, value + 1)
+        return value
+
+
+class SyntheticData:
+    def __init__(self, seed, journals_per_user, days, end_date, password_hash, blob):
+        self.seed = seed
+        self.journals_per_user = journals_per_user
+        self.days = days
+        self.end = datetime.combine(end_date, time(20, 0), tzinfo=timezone.utc)
+        self.password_hash = password_hash
+        self.blob = blob
+        self.rows = {User: [], Visit: [], JournalEntry: [], Medication: [], MedicalDocument: []}
+
+    def _when(self, rng, days_ago):
+        return self.end - timedelta(days=days_ago, minutes=rng.randrange(12 * 60))
+
+    def add_user(self, ids, number):
+        rng = random.Random(f'{self.seed}:{number}')
+        user_id = ids.take('user')
+        self.rows[User].append({
+            'id': user_id, 'username': f'loadtest{self.seed}_{number}',
+            'email': f'loadtest{self.seed}_{number}@example.com', 'password_hash': self.password_hash,
+            'created_at': self.end - timedelta(days=self.days + rng.randrange(30)),
+        })
+
+        # an episode every month and a half or so, plus a yearly check-up
+        n_episodes = max(1, round(rng.gauss(self.days / 45, 1.5)))
+        remaining = self.journals_per_user
+        medications = {}
+        for year in range(0, self.days, 365):
+            reason, specialty, diagnosis = CHECKUP
+            self.rows[Visit].append({
+                'id': ids.take('visit'), 'user_id': user_id, 'reason': reason,
+                'doctor_name': f'Dr. {rng.choice(LAST_NAMES)} ({specialty})', 'diagnosis': diagnosis,
+                'visit_date': self._when(rng, year + rng.randrange(min(365, self.days - year))),
+            })
+        for _ in range(n_episodes):
+            reason, specialty, diagnosis, medication, titles = rng.choice(EPISODES)
+            visit_ago = rng.randrange(self.days)
+            visit_id = ids.take('visit')
+            self.rows[Visit].append({
+                'id': visit_id, 'user_id': user_id, 'reason': reason,
+                'doctor_name': f'Dr. {rng.choice(LAST_NAMES)} ({specialty})', 'diagnosis': diagnosis,
+                'visit_date': self._when(rng, visit_ago),
+            })
+            # entries from a few days before the visit to a couple of weeks after
+            for step, title in enumerate(titles[:remaining]):
+                offset = int((step - 1.5) * rng.uniform(1, 5))
+                self.rows[JournalEntry].append({
+                    'id': ids.take('journal'), 'user_id': user_id, 'title': title,
+                    'content': f'{title}. {diagnosis if step >= 2 else reason}.',
+                    'severity': _severity(rng, abs(offset)),
+                    'created_at': self._when(rng, max(0, visit_ago - offset)),
+                    'visit_id': visit_id if step == 2 else None,
+                })
+            remaining -= min(remaining, len(titles))
+            # a repeat prescription is one row, linked to the latest visit
+            if medication and (medication[0] not in medications or rng.random() < 0.3):
+                name, dosage, frequency = medication
+                medications[name] = {
+                    'id': medications.get(name, {}).get('id') or ids.take('medication'), 'user_id': user_id,
+                    'name': name, 'dosage': dosage, 'frequency': frequency,
+                    'notes': f'Prescribed for {reason.lower()}.', 'visit_id': visit_id,
+                }
+            for _ in range(rng.choices((0, 1, 2), (50, 35, 15))[0]):
+                doc_id = ids.take('document')
+                self.rows[MedicalDocument].append({
+                    'id': doc_id, 'user_id': user_id,
+                    'filename': f'{rng.choice(DOCUMENT_NAMES)}_{doc_id}.pdf', 'filepath': self.blob.path,
+                    'upload_date': self._when(rng, max(0, visit_ago - rng.randrange(3))),
+                    'visit_id': visit_id, 'content_hash': self.blob.sha256, 'size': len(PLACEHOLDER_PDF),
+                })
+
+        for _ in range(remaining):
+            title, content = rng.choice(ROUTINE)
+            self.rows[JournalEntry].append({
+                'id': ids.take('journal'), 'user_id': user_id, 'title': title, 'content': content,
+                'severity': rng.choices(('Low', 'Medium'), (85, 15))[0],
+                'created_at': self._when(rng, rng.randrange(self.days)), 'visit_id': None,
+            })
+        self.rows[Medication].extend(medications.values())
+
+    def flush(self):
+        '''Writes the pending rows; returns {model: count}.'''
+        counts = {}
+        for model, rows in self.rows.items():
+            if rows:
+                # Core insert on the table: one executemany per batch, where the
+                # ORM bulk path splits it wherever the set of NULL columns changes
+                db.session.execute(insert(model.__table__), rows)
+            counts[model] = len(rows)
+            rows.clear()
+        if counts[MedicalDocument]:
+            db.session.execute(update(StoredBlob).where(StoredBlob.sha256 == self.blob.sha256)
+                               .values(refcount=StoredBlob.refcount + counts[MedicalDocument]))
+        db.session.commit()
+        return counts
+
+
+class _PlaceholderBlob:
+    def __init__(self, storage):
+        self.sha256 = hashlib.sha256(PLACEHOLDER_PDF).hexdigest()
+        self.path = storage.path_for(self.sha256)
+
+
+def _store_placeholder(storage):
+    blob = _PlaceholderBlob(storage)
+    if not os.path.exists(blob.path):
+        os.makedirs(os.path.dirname(blob.path), exist_ok=True)
+        with open(blob.path, 'wb') as f:
+            f.write(PLACEHOLDER_PDF)
+    if db.session.get(StoredBlob, blob.sha256) is None:
+        db.session.add(StoredBlob(sha256=blob.sha256, size=len(PLACEHOLDER_PDF), refcount=0))
+        db.session.commit()
+    return blob
+
+
+def _advance_sequences():
+    '''PostgreSQL only: explicit ids don't move the SERIAL sequences.'''
+    if db.engine.dialect.name != 'postgresql':
+        return
+    for model in (User, Visit, JournalEntry, Medication, MedicalDocument):
+        table = model.__tablename__
+        db.session.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                                f"(SELECT coalesce(max(id), 1) FROM {table}))"))
+    db.session.commit()
+
+
+def generate(users, journals_per_user, seed=0, days=365, end_date=None, batch_users=200):
+    '''Generator: adds `users` synthetic users with their histories, yielding
+    the running {model: rows inserted} after every committed batch.'''
+    if db.session.execute(select(User.id).where(User.username == f'loadtest{seed}_0')).first():
+        raise ValueError(f'Seed {seed} has already been generated; use another --seed.')
+    blob = _store_placeholder(get_storage())
+    # hashing is deliberately slow, so every generated user shares one hash
+    data = SyntheticData(seed, journals_per_user, days, end_date or datetime.now(timezone.utc).date(),
+                         generate_password_hash(PASSWORD), blob)
+    ids = _Ids()
+    totals = dict.fromkeys(data.rows, 0)
+    # SQLite: the FTS triggers would more than double the insert time, so the
+    # mirror is dropped for the load and rebuilt in one pass afterwards
+    rebuild_search = db.engine.dialect.name == 'sqlite'
+    if rebuild_search:
+        with db.engine.begin() as connection:
+            drop_search_index(connection)
+    try:
+        for number in range(users):
+            data.add_user(ids, number)
+            if (number + 1) % batch_users == 0 or number + 1 == users:
+                for model, count in data.flush().items():
+                    totals[model] += count
+                yield totals
+    finally:
+        db.session.rollback()
+        if rebuild_search:
+            with db.engine.begin() as connection:
+                install_search_index(connection)
+    _advance_sequences()
+
+
+def seed_demo():
+    '''(Re)creates the demo account with six months of hand-written history.
+    Returns (user, {model: rows created}).'''
+    hashes = []
+    user = User.query.filter_by(email=DEMO_EMAIL).first()
+    if user is None:
+        user = User(username='DemoUser', email=DEMO_EMAIL)
+        user.set_password(DEMO_PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+    else:
+        hashes = [doc.content_hash for doc in user.documents if doc.content_hash]
+        for model in (MedicalDocument, JournalEntry, Medication, Visit):
+            model.query.filter_by(user_id=user.id).delete()
+        for sha256 in hashes:
+            get_storage().release(sha256)
+
+    end_date = datetime.now()
+    for data in DEMO_VISITS:
+        db.session.add(Visit(reason=data['reason'], doctor_name=data['doctor'], diagnosis=data['diagnosis'],
+                             visit_date=end_date - timedelta(days=data['days_ago']), patient=user))
+    for data in DEMO_JOURNALS:
+        db.session.add(JournalEntry(title=data['title'], content=data['content'], severity=data['severity'],
+                                    created_at=end_date - timedelta(days=data['days_ago']), author=user))
+    for data in DEMO_MEDICATIONS:
+        db.session.add(Medication(patient=user, **data))
+    db.session.commit()
+    for sha256 in hashes:
+        get_storage().collect(sha256)
+    # bulk deletes skip the ORM events that normally drop cached summaries
+    get_summary_cache().invalidate_user(user.id)
+    return user, {Visit: len(DEMO_VISITS), JournalEntry: len(DEMO_JOURNALS), Medication: len(DEMO_MEDICATIONS)}
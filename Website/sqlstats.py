@@ -0,0 +1,97 @@
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+'''
+Per-request SQL instrumentation.
+
+Engine events count and time every statement a request issues. Statements are
+reduced to a "shape" (literals and IN-lists stripped); a shape that runs
+SQL_NPLUSONE_THRESHOLD or more times in one request is almost always a lazy
+relationship loaded once per row, so it is flagged as a likely N+1. Totals go
+out in X-SQL-* response headers and one log line per request.
+
+The statement count and DB time are also collected (without shapes) whenever
+METRICS_ENABLED is on, for the /metrics histograms in metrics.py. Work done
+outside a request (report jobs, CLI commands) is not counted.
+'''
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:[^()]*)\)', re.IGNORECASE)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACES = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    shape = _IN_LIST.sub('IN (...)', statement)
+    shape = _LITERALS.sub('?', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+class RequestStats:
+    def __init__(self, track_shapes=True):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter() if track_shapes else None
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get('sql_stats')
+    return None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('sql_stats_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = conn.info.get('sql_stats_started')
+    if stats is None or not started:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started.pop()
+    if stats.shapes is not None:
+        stats.shapes[statement_shape(statement)] += 1
+
+
+def init_sql_stats(app):
+    profiling = app.config.get('SQL_PROFILING', False)
+    if not (profiling or app.config.get('METRICS_ENABLED', False)):
+        return
+    threshold = app.config.get('SQL_NPLUSONE_THRESHOLD', 3)
+
+    @app.before_request
+    def _start_sql_stats():
+        g.sql_stats = RequestStats(track_shapes=profiling)
+
+    if not profiling:
+        return
+
+    @app.after_request
+    def _report_sql_stats(response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+        repeated = stats.repeated(threshold)
+        response.headers['X-SQL-Queries'] = str(stats.count)
+        response.headers['X-SQL-Time-Ms'] = f'{stats.seconds * 1000:.1f}'
+        response.headers['X-SQL-Repeated'] = str(len(repeated))
+        logger.info('%s %s: %d queries in %.1f ms', request.method, request.path,
+                    stats.count, stats.seconds * 1000)
+        for shape, n in repeated:
+            logger.warning('Possible N+1 on %s %s: %d x %s', request.method, request.path, n, shape[:200])
+        return response
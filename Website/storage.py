@@ -0,0 +1,226 @@
+import hashlib
+import mimetypes
+import os
+import tempfile
+from contextlib import contextmanager
+from uuid import uuid4
+
+from flask import Response, current_app, request, send_file
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .models import StoredBlob
+
+'''
+Content-addressed storage for uploaded documents.
+
+An upload is streamed to a temp file in fixed-size chunks while its SHA-256 is
+computed, and is rejected as soon as it passes MAX_DOCUMENT_SIZE. The file is
+then kept once, under its hash (<DOCUMENT_STORAGE_DIR>/ab/cd/abcd...), however
+many documents point at it; stored_blob.refcount counts those documents and the
+file is removed when the last one is deleted.
+
+The storage directory lives outside static/, so documents are only reachable
+through the ownership check in views.get_file.
+'''
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class PendingBlob:
+    def __init__(self, sha256, size, temp_path, path):
+        self.sha256 = sha256
+        self.size = size
+        self.temp_path = temp_path
+        self.path = path
+
+
+class BlobWriter:
+    '''Writes an upload to a temp file chunk by chunk, hashing as it goes and
+    failing with UploadTooLarge past the limit. Filled by receive() from a
+    werkzeug FileStorage, or directly by the ASGI upload view.'''
+
+    def __init__(self, tmp_dir, max_size):
+        os.makedirs(tmp_dir, exist_ok=True)
+        self.max_size = max_size
+        self.digest = hashlib.sha256()
+        self.size = 0
+        fd, self.temp_path = tempfile.mkstemp(dir=tmp_dir)
+        self.out = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_size:
+            raise UploadTooLarge(f'Documents can be at most {self.max_size // (1024 * 1024)} MB.')
+        self.digest.update(chunk)
+        self.out.write(chunk)
+
+    def discard(self):
+        self.out.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class DocumentStorage:
+    def __init__(self, root, max_size):
+        self.root = root
+        self.max_size = max_size
+
+    def path_for(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def resolve(self, doc):
+        '''Where a MedicalDocument's bytes are on disk. Documents uploaded
+        before this storage existed keep their original path.'''
+        if doc.content_hash:
+            return self.path_for(doc.content_hash)
+        return doc.filepath
+
+    def writer(self):
+        return BlobWriter(os.path.join(self.root, 'tmp'), self.max_size)
+
+    @contextmanager
+    def receive(self, file_storage):
+        '''Streams an upload to a temp file and yields a PendingBlob; see store().'''
+        writer = self.writer()
+        try:
+            stream = file_storage.stream
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        except BaseException:
+            writer.discard()
+            raise
+        with self.store(writer) as blob:
+            yield blob
+
+    @contextmanager
+    def store(self, writer):
+        '''Yields a PendingBlob for a finished BlobWriter. The caller records the
+        document (and add_reference) inside the block; on a clean exit the file
+        is moved to its content address, otherwise the temp file is dropped.
+
+        The file is moved in after the caller's commit, and even when the
+        content is already stored: a collect() of that content which didn't see
+        our reference may be removing the old copy (see collect()).'''
+        try:
+            writer.out.close()
+            sha256 = writer.digest.hexdigest()
+            blob = PendingBlob(sha256, writer.size, writer.temp_path, self.path_for(sha256))
+            yield blob
+            os.makedirs(os.path.dirname(blob.path), exist_ok=True)
+            os.replace(writer.temp_path, blob.path)
+        except BaseException:
+            writer.discard()
+            raise
+
+    def add_reference(self, blob, session=None):
+        '''+1 on the blob's refcount, creating the row for new content. Runs in
+        the caller's transaction (db.session unless another session is given).'''
+        session = db.session if session is None else session
+        bumped = session.execute(
+            update(StoredBlob).where(StoredBlob.sha256 == blob.sha256)
+            .values(refcount=StoredBlob.refcount + 1))
+        if bumped.rowcount:
+            return
+        try:
+            with session.begin_nested():
+                session.add(StoredBlob(sha256=blob.sha256, size=blob.size, refcount=1))
+        except IntegrityError:
+            # someone else stored the same content first
+            session.execute(
+                update(StoredBlob).where(StoredBlob.sha256 == blob.sha256)
+                .values(refcount=StoredBlob.refcount + 1))
+
+    def release(self, sha256):
+        '''-1 on the refcount, dropping the row when it reaches zero. Runs in
+        the caller's transaction; call collect() after the commit.'''
+        db.session.execute(
+            update(StoredBlob).where(StoredBlob.sha256 == sha256)
+            .values(refcount=StoredBlob.refcount - 1))
+        blob = db.session.get(StoredBlob, sha256, populate_existing=True)
+        if blob is not None and blob.refcount <= 0:
+            db.session.delete(blob)
+
+    def send(self, doc):
+        '''Response for downloading a document the caller has already checked
+        ownership of. Conditional GETs (ETag / Last-Modified) and Range
+        requests are answered by werkzeug; with DOCUMENT_SENDFILE set, only
+        the headers are built here and the front proxy streams the bytes.'''
+        path = self.resolve(doc)
+        if not os.path.isfile(path):
+            return None
+        # stored content never changes under a hash, so the hash is a strong ETag
+        etag = doc.content_hash or True
+        last_modified = doc.upload_date or os.path.getmtime(path)
+        offload = current_app.config.get('DOCUMENT_SENDFILE')
+        if offload and doc.content_hash:
+            response = self._offload(offload, doc, path)
+            response.set_etag(doc.content_hash)
+            response.last_modified = last_modified
+            response = response.make_conditional(request)
+        else:
+            response = send_file(path, as_attachment=True, download_name=doc.filename,
+                                 conditional=True, etag=etag, last_modified=last_modified)
+        # private data: browsers may keep it but must revalidate (and so pass
+        # the ownership check) before reusing it; shared caches must not store it
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def _offload(self, mode, doc, path):
+        response = Response(status=200)
+        response.headers['Content-Disposition'] = f'attachment; filename="{doc.filename}"'
+        response.headers['Content-Type'] = mimetypes.guess_type(doc.filename)[0] or 'application/octet-stream'
+        if mode == 'x-accel':
+            # nginx: an `internal` location whose alias is DOCUMENT_STORAGE_DIR
+            prefix = current_app.config.get('DOCUMENT_ACCEL_PREFIX', '/_documents/').rstrip('/')
+            response.headers['X-Accel-Redirect'] = f'{prefix}/{os.path.relpath(path, self.root)}'
+        elif mode == 'x-sendfile':
+            # Apache mod_xsendfile, lighttpd
+            response.headers['X-Sendfile'] = os.path.abspath(path)
+        else:
+            raise ValueError(f'Unknown DOCUMENT_SENDFILE: {mode}')
+        return response
+
+    def _referenced(self, sha256):
+        # a connection of its own, so each check sees what has been committed since
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(StoredBlob.sha256).where(StoredBlob.sha256 == sha256)).first() is not None
+
+    def collect(self, sha256):
+        '''Removes the file if no document refers to it any more.
+
+        An upload of the same content can commit a new reference between the
+        check and the removal. So the file is moved aside first and the check
+        repeated: if the upload committed by then, the file goes back; if not,
+        the upload's store() moves its own copy in after its commit.'''
+        if self._referenced(sha256):
+            return
+        path = self.path_for(sha256)
+        doomed = f'{path}.{uuid4().hex}.gc'
+        try:
+            os.replace(path, doomed)
+        except FileNotFoundError:
+            return
+        if self._referenced(sha256) and not os.path.exists(path):
+            os.replace(doomed, path)
+        else:
+            os.remove(doomed)
+
+
+def init_storage(app):
+    app.extensions['document_storage'] = DocumentStorage(
+        app.config['DOCUMENT_STORAGE_DIR'],
+        app.config.get('MAX_DOCUMENT_SIZE', 25 * 1024 * 1024))
+
+
+def get_storage():
+    return current_app.extensions['document_storage']
@@ -0,0 +1,95 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import select, literal, union_all, and_, or_
+
+from . import db
+from .models import JournalEntry, Visit
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(event_date, kind, event_id):
+    '''the cursor is the (date, kind, id) of the last row shown, packed so the
+    client treats it as an opaque token'''
+    raw = json.dumps([event_date.isoformat(), kind, event_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        date_str, kind, event_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(date_str), str(kind), int(event_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+
+def _branch(kind, id_col, date_col, filters, cursor, limit):
+    '''One side of the UNION ALL. The keyset predicate is pushed into each
+    branch (instead of being applied to the merged rows) so that every branch
+    can walk the (user_id, date) index and stop after `limit` rows.'''
+    if cursor is not None:
+        after_date, after_kind, after_id = cursor
+        # rows are ordered by (date, kind, id) descending; kind is a constant
+        # per branch so the row comparison collapses to a plain date/id check
+        if kind < after_kind:
+            filters.append(date_col <= after_date)
+        elif kind > after_kind:
+            filters.append(date_col < after_date)
+        else:
+            filters.append(or_(date_col < after_date,
+                               and_(date_col == after_date, id_col < after_id)))
+    stmt = (select(literal(kind).label('kind'), id_col.label('id'), date_col.label('event_date'))
+            .where(*filters)
+            .order_by(date_col.desc(), id_col.desc())
+            .limit(limit))
+    # wrapped in a subquery because SQLite rejects LIMIT inside compound selects
+    return select(stmt.subquery())
+
+
+def fetch_timeline_page(user_id, cursor=None, limit=25):
+    '''Returns (events, next_cursor) for one page of the dashboard timeline.
+    Visits and journal entries not linked to a visit are merged and ordered in
+    the database; only the rows for this page are loaded as ORM objects.'''
+    after = decode_cursor(cursor) if cursor else None
+
+    visits = _branch('visit', Visit.id, Visit.visit_date,
+                     [Visit.user_id == user_id], after, limit + 1)
+    journals = _branch('journal', JournalEntry.id, JournalEntry.created_at,
+                       [JournalEntry.user_id == user_id, JournalEntry.visit_id.is_(None)],
+                       after, limit + 1)
+    merged = union_all(visits, journals).subquery()
+    rows = db.session.execute(
+        select(merged.c.kind, merged.c.id, merged.c.event_date)
+        .order_by(merged.c.event_date.desc(), merged.c.kind.desc(), merged.c.id.desc())
+        .limit(limit + 1)
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    visit_ids = [r.id for r in rows if r.kind == 'visit']
+    journal_ids = [r.id for r in rows if r.kind == 'journal']
+    loaded = {}
+    if visit_ids:
+        for visit in Visit.query.filter(Visit.id.in_(visit_ids)):
+            loaded[('visit', visit.id)] = visit
+    if journal_ids:
+        for journal in JournalEntry.query.filter(JournalEntry.id.in_(journal_ids)):
+            loaded[('journal', journal.id)] = journal
+
+    events = []
+    for row in rows:
+        data = loaded[(row.kind, row.id)]
+        date = data.visit_date if row.kind == 'visit' else data.created_at
+        events.append({'type': row.kind, 'date': date, 'data': data})
+
+    next_cursor = None
+    if has_more and events:
+        last = events[-1]
+        next_cursor = encode_cursor(last['date'], last['type'], last['data'].id)
+    return events, next_cursor
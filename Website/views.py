@@ -1,17 +1,32 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, jsonify
+from flask import Response, stream_with_context, send_file, send_from_directory
 from flask_login import login_required, current_user
 from flask import current_app
-from .forms import JournalEntryForm, MedicationForm, DocumentUploadForm, VisitForm, UpdateProfileForm, ReportForm
-from .models import JournalEntry, Medication, MedicalDocument, Visit
+from .forms import JournalEntryForm, MedicationForm, DocumentUploadForm, VisitForm, UpdateProfileForm, ReportForm, ImportForm
+from .models import User, JournalEntry, Medication, MedicalDocument, Visit, ReportJob, Report
 from werkzeug.utils import secure_filename
 from . import db
-from sqlalchemy import or_
 import os
-from flask import send_from_directory
-import secrets
+import json
+import shutil
+import tempfile
+from datetime import datetime
 import os
-from PIL import Image
 from .ai_report import ReportGenerator
+from .jobs import get_report_queue
+from .llm import get_llm
+from .metrics import internal_only
+from .identity import get_identity_cache
+from .timeline import fetch_timeline_page, InvalidCursor
+from .search import search_records
+from .storage import get_storage, UploadTooLarge
+from .previews import get_previews
+from .avatars import get_avatars, AvatarBusy, AvatarTooLarge
+from .importer import import_records, detect_format, ImportFormatError
+from .exporter import ndjson_lines, csv_lines, zip_chunks
+from .replica import use_replica
+from .revisions import conditional_page
+from sqlalchemy.orm import selectinload
 
 views = Blueprint('views',__name__)
 
@@ -24,38 +39,31 @@ def home():
 
 @views.route('/dashboard')
 @login_required
+@use_replica
+@conditional_page
 def dashboard():
-    # --- Start of Debugging ---
-    print("\n--- DEBUG: Dashboard Route Started ---")
-
-    # Step 1: Fetching the data
-    visits = Visit.query.filter_by(user_id=current_user.id).all()
-    journals = JournalEntry.query.filter_by(user_id=current_user.id).all()
-    print(f"Found {len(visits)} visits in the database.")
-    print(f"Found {len(journals)} journal entries in the database.")
-
-    # Step 2: Combining the data
-    timeline_events = []
-    for visit in visits:
-        timeline_events.append({'type': 'visit', 'date': visit.visit_date, 'data': visit})
-    print(f"After adding visits, the timeline has {len(timeline_events)} events.")
-
-    for journal in journals:
-        if not journal.visit_id:
-            timeline_events.append({'type': 'journal', 'date': journal.created_at, 'data': journal})
-    print(f"After adding journal entries, the timeline now has {len(timeline_events)} events.")
-
-    # Step 3: Sorting
-    print("Sorting the timeline events...")
-    try:
-        timeline_events.sort(key=lambda x: x['date'], reverse=True)
-        print(f"Sorting complete. The final timeline has {len(timeline_events)} events.")
-    except Exception as e:
-        print(f"!!! ERROR DURING SORTING: {e}")
+    # only the first page is rendered here, the rest comes from views.timeline
+    timeline_events, next_cursor = fetch_timeline_page(
+        current_user.id, limit=current_app.config['TIMELINE_PAGE_SIZE'])
+    return render_template("dashboard.html", user=current_user,
+                           timeline_events=timeline_events, next_cursor=next_cursor)
+
 
-    # Step 4: Rendering
-    print("--- DEBUG: Sending final list to template and rendering. ---\n")
-    return render_template("dashboard.html", user=current_user, timeline_events=timeline_events)
+@views.route('/timeline')
+@login_required
+def timeline():
+    """Load-more endpoint for the dashboard: returns the next page of timeline
+    events as an HTML fragment together with the cursor for the page after it."""
+    cursor = request.args.get('cursor', '')
+    if not cursor:
+        abort(400)
+    try:
+        timeline_events, next_cursor = fetch_timeline_page(
+            current_user.id, cursor=cursor, limit=current_app.config['TIMELINE_PAGE_SIZE'])
+    except InvalidCursor:
+        abort(400)
+    html = render_template("_timeline_events.html", timeline_events=timeline_events)
+    return jsonify(html=html, next_cursor=next_cursor)
 
 
 @views.route('/add-journal',methods=['GET','POST'])
@@ -122,6 +130,9 @@ def delete_medication(med_id):
 @views.route('/upload-document', methods=['GET', 'POST'])
 @login_required
 def upload_document():
+    # werkzeug spools the upload to disk while parsing the form, so refuse
+    # oversized bodies before that; BlobWriter enforces the exact limit
+    request.max_content_length = current_app.config['MAX_DOCUMENT_SIZE'] + 64 * 1024
     form = DocumentUploadForm()
     visits = Visit.query.filter_by(user_id=current_user.id).order_by(Visit.visit_date.desc()).all()
     form.visit.choices = [(v.id, f"{v.visit_date.strftime('%Y-%m-%d')} - {v.reason}") for v in visits]
@@ -129,29 +140,101 @@ def upload_document():
     if form.validate_on_submit():
         file = form.file.data
         filename = secure_filename(file.filename)
-        
-        # Ensure the upload directory exists
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        filepath = os.path.join(upload_folder, filename)
-        file.save(filepath)
         selected_visit_id = form.visit.data if form.visit.data > 0 else None
 
-        # Save file info to the database
-        new_doc = MedicalDocument(
-            filename=filename,
-            filepath=filepath,
-            user_id=current_user.id,
-            visit_id=selected_visit_id  # Save the selected visit_id
-        )
-        db.session.add(new_doc)
-        db.session.commit()
+        # Streamed to disk and stored under its content hash, so the same
+        # file uploaded twice (or by two users) is only kept once
+        storage = get_storage()
+        try:
+            with storage.receive(file) as blob:
+                new_doc = MedicalDocument(
+                    filename=filename,
+                    filepath=blob.path,
+                    content_hash=blob.sha256,
+                    size=blob.size,
+                    preview_status='pending',
+                    user_id=current_user.id,
+                    visit_id=selected_visit_id  # Save the selected visit_id
+                )
+                storage.add_reference(blob)
+                db.session.add(new_doc)
+                db.session.commit()
+        except UploadTooLarge as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+            return render_template('upload_document.html', form=form)
+        # the thumbnail is rendered by the preview pool, not on this request
+        get_previews().submit(new_doc, blob.path)
         flash('Document uploaded successfully!', 'success')
         return redirect(url_for('views.dashboard'))
     return render_template('upload_document.html', form=form)
 
 
+@views.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_data():
+    """Bulk import from CSV/NDJSON (see importer.py). Clients that ask for
+    application/x-ndjson get one progress line per committed batch instead of
+    the results page."""
+    # werkzeug spools the upload to disk while parsing the form; cap it first
+    request.max_content_length = current_app.config['MAX_IMPORT_SIZE'] + 64 * 1024
+    form = ImportForm()
+    result = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        try:
+            fmt = detect_format(upload.filename)
+        except ImportFormatError as e:
+            flash(str(e), 'danger')
+            return render_template('import_records.html', form=form, result=None)
+
+        stream_progress = request.accept_mimetypes.best == 'application/x-ndjson'
+        source = upload.stream
+        if stream_progress:
+            # werkzeug closes request.files when the view returns, before the
+            # streamed response has read the upload, so keep a private copy
+            source = tempfile.TemporaryFile()
+            shutil.copyfileobj(upload.stream, source)
+            source.seek(0)
+        progress = import_records(current_user.id, source, fmt, kind=form.kind.data or None,
+                                  batch_size=current_app.config['IMPORT_BATCH_SIZE'])
+
+        if stream_progress:
+            def lines():
+                with source:
+                    for step in progress:
+                        yield json.dumps({'rows': step.rows, 'imported': step.imported, 'failed': step.failed,
+                                          'done': step.done,
+                                          'errors': step.errors if step.done else []}) + '\n'
+            return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+
+        for result in progress:
+            pass
+        flash(f'Imported {result.imported} record(s).', 'success' if not result.failed else 'warning')
+    return render_template('import_records.html', form=form, result=result)
+
+@views.route('/export/<fmt>')
+@login_required
+def export_data(fmt):
+    """Streams all of the user's records (see exporter.py) as NDJSON or CSV;
+    with ?files=1, a zip of the records plus the document files."""
+    if fmt not in ('ndjson', 'csv'):
+        abort(404)
+    # the generators run after the view returns; don't touch current_user there
+    user_id = current_user.id
+    name = f'medical-journal-export-{datetime.now():%Y-%m-%d}'
+    if request.args.get('files'):
+        storage = get_storage()
+        body, mimetype, name = zip_chunks(user_id, fmt, storage.resolve), 'application/zip', name + '.zip'
+    elif fmt == 'csv':
+        body, mimetype, name = csv_lines(user_id), 'text/csv', name + '.csv'
+    else:
+        body, mimetype, name = ndjson_lines(user_id), 'application/x-ndjson', name + '.ndjson'
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{name}"'
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
 @views.route('/add-visit', methods=['GET', 'POST'])
 @login_required
 def add_visit():
@@ -172,8 +255,16 @@ def add_visit():
 
 @views.route('/visit/<int:visit_id>')
 @login_required
+@use_replica
+@conditional_page
 def visit_detail(visit_id):
-    visit = Visit.query.get_or_404(visit_id)
+    # the template lists all three child collections; load them up front in
+    # one SELECT ... IN each instead of lazily while rendering
+    visit = (Visit.query
+             .options(selectinload(Visit.journal_entries),
+                      selectinload(Visit.prescriptions),
+                      selectinload(Visit.documents))
+             .get_or_404(visit_id))
     
     # Security check: ensure the visit belongs to the current user
     if visit.user_id != current_user.id:
@@ -185,38 +276,71 @@ def visit_detail(visit_id):
 
 @views.route('/medications')
 @login_required
+@use_replica
+@conditional_page
 def medications():
     meds = Medication.query.filter_by(user_id=current_user.id).order_by(Medication.name).all()
     return render_template("medications.html", medications=meds)
 
 @views.route('/documents')
 @login_required
+@use_replica
+@conditional_page
 def documents():
     docs = MedicalDocument.query.filter_by(user_id=current_user.id).order_by(MedicalDocument.upload_date.desc()).all()
     return render_template("documents.html", documents=docs)
 
 # This route serves the files securely
-@views.route('/uploads/<filename>')
+@views.route('/documents/<int:doc_id>/download')
 @login_required
-def get_file(filename):
-    # Security check to ensure user can only access their own files
-    doc = MedicalDocument.query.filter_by(user_id=current_user.id, filename=filename).first_or_404()
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], doc.filename, as_attachment=True)
+def get_file(doc_id):
+    # Security check to ensure user can only access their own files; by id, as
+    # several of them may share a filename
+    doc = MedicalDocument.query.filter_by(id=doc_id, user_id=current_user.id).first_or_404()
+    # Range / conditional GET / sendfile offload are handled in storage.send
+    response = get_storage().send(doc)
+    if response is None:
+        abort(404)
+    return response
+
+@views.route('/documents/<int:doc_id>/preview')
+@login_required
+def document_preview(doc_id):
+    # only serves what the preview pool has already rendered
+    doc = MedicalDocument.query.get_or_404(doc_id)
+    if doc.user_id != current_user.id or doc.preview_status != 'ready':
+        abort(404)
+    path = get_previews().path_for(doc.id)
+    if not os.path.isfile(path):
+        abort(404)
+    response = send_file(path, mimetype='image/webp', conditional=True)
+    response.headers['Cache-Control'] = 'private, max-age=86400'
+    return response
 
 @views.route('/delete-document/<int:doc_id>', methods=['POST'])
 @login_required
 def delete_document(doc_id):
     doc_to_delete = MedicalDocument.query.get(doc_id)
     if doc_to_delete and doc_to_delete.user_id == current_user.id:
-        # Delete the file from the server
-        try:
-            os.remove(doc_to_delete.filepath)
-        except OSError as e:
-            flash(f"Error deleting file from server: {e}", category='error')
+        storage = get_storage()
+        content_hash = doc_to_delete.content_hash
+        if not content_hash:
+            # Delete the file from the server
+            try:
+                os.remove(doc_to_delete.filepath)
+            except OSError as e:
+                flash(f"Error deleting file from server: {e}", category='error')
         
         # Delete the record from the database
         db.session.delete(doc_to_delete)
+        if content_hash:
+            # the file itself goes only when no other document shares it
+            db.session.flush()
+            storage.release(content_hash)
         db.session.commit()
+        if content_hash:
+            storage.collect(content_hash)
+        get_previews().discard(doc_id)
         flash('Document deleted.', category='success')
     else:
         flash('Document not found or you do not have permission.', category='error')
@@ -229,7 +353,7 @@ def edit_journal(entry_id):
     entry = JournalEntry.query.get_or_404(entry_id)
 
     # Security Check: Make sure the logged-in user is the one who created this entry
-    if entry.author != current_user:
+    if entry.user_id != current_user.id:
         abort(403) # 403 Forbidden error
 
     # We can reuse the same form we use for adding an entry
@@ -253,40 +377,39 @@ def edit_journal(entry_id):
 
     return render_template('edit_journal.html', form=form)
 
-def save_picture(form_picture):
-    # Create a random, secure filename
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    picture_path = os.path.join(current_app.root_path, 'static/profile_pics', picture_fn)
-
-    # Make sure the upload folder exists
-    os.makedirs(os.path.dirname(picture_path), exist_ok=True)
-    
-    # Resize the image to save space
-    output_size = (125, 125)
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
-    
-    return picture_fn
+@views.route('/avatars/<filename>')
+@login_required
+def avatar(filename):
+    # names are content hashes, so a given URL never changes (see avatars.py)
+    response = send_from_directory(current_app.config['AVATAR_DIR'], filename, max_age=365 * 24 * 3600)
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
 
 
 @views.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
+    # werkzeug spools the upload to disk while parsing the form, so cap the
+    # body before that happens (the picture plus room for the other fields)
+    request.max_content_length = current_app.config['MAX_AVATAR_SIZE'] + 64 * 1024
     form = UpdateProfileForm()
     if form.validate_on_submit():
-        if form.picture.data:
-            picture_file = save_picture(form.picture.data)
-            current_user.image_file = picture_file
-        
+        # current_user is a read-only snapshot, so edit the actual row
+        user = db.session.get(User, current_user.id)
         # ADD THIS: Save the updated username and email
-        current_user.username = form.username.data
-        current_user.email = form.email.data
+        user.username = form.username.data
+        user.email = form.email.data
         
         db.session.commit()
-        flash('Your profile has been updated!', 'success')
+        if form.picture.data:
+            # resized in the avatar pool; image_file switches over once it is done
+            try:
+                get_avatars().submit(current_user.id, form.picture.data)
+                flash('Your profile has been updated! Your new picture will appear in a moment.', 'success')
+            except (AvatarBusy, AvatarTooLarge) as e:
+                flash(str(e), 'warning')
+        else:
+            flash('Your profile has been updated!', 'success')
         return redirect(url_for('views.profile'))
     
     elif request.method == 'GET':
@@ -294,83 +417,56 @@ def profile():
         form.username.data = current_user.username
         form.email.data = current_user.email
     
-    image_file = url_for('static', filename='profile_pics/' + current_user.image_file)
-    return render_template("profile.html", user=current_user, image_file=image_file, form=form)
+    return render_template("profile.html", user=current_user, form=form)
 
-@views.route('/search', methods=['POST'])
+@views.route('/search', methods=['GET', 'POST'])
 @login_required
+@use_replica
 def search():
     """
     Global search across all user's medical records.
     Searches in: Journal Entries, Visits, Medications, and Documents
+    Results come from the full-text index (see search.py), ranked and paginated.
     """
-    query = request.form.get('search_query', '').strip()
+    query = request.values.get('search_query', '').strip()
+    page = request.args.get('page', 1, type=int)
     
     if not query:
         flash('Please enter a search term.', 'warning')
         return redirect(url_for('views.dashboard'))
     
-    # Search pattern for case-insensitive matching
-    search_pattern = f'%{query}%'
+    results = search_records(current_user.id, query, page=page,
+                             per_page=current_app.config['SEARCH_PAGE_SIZE'])
+    return render_search_results(query, results)
+
+def render_search_results(query, results):
+    """The results page for a SearchPage; shared with the ASGI search view."""
+    # Group this page's hits by type; each section keeps the rank order
+    grouped = {'journal': [], 'visit': [], 'medication': [], 'document': []}
+    snippets = {}
+    for hit in results.hits:
+        grouped[hit.type].append(hit.data)
+        snippets[(hit.type, hit.data.id)] = hit.snippet
     
-    # Search Journal Entries (title, content)
-    journal_results = JournalEntry.query.filter(
-        JournalEntry.user_id == current_user.id,
-        or_(
-            JournalEntry.title.ilike(search_pattern),
-            JournalEntry.content.ilike(search_pattern),
-            JournalEntry.severity.ilike(search_pattern)
-        )
-    ).order_by(JournalEntry.created_at.desc()).all()
-    
-    # Search Visits (doctor_name, reason, diagnosis)
-    visit_results = Visit.query.filter(
-        Visit.user_id == current_user.id,
-        or_(
-            Visit.doctor_name.ilike(search_pattern),
-            Visit.reason.ilike(search_pattern),
-            Visit.diagnosis.ilike(search_pattern)
-        )
-    ).order_by(Visit.visit_date.desc()).all()
-    
-    # Search Medications (name, dosage, frequency, notes)
-    medication_results = Medication.query.filter(
-        Medication.user_id == current_user.id,
-        or_(
-            Medication.name.ilike(search_pattern),
-            Medication.dosage.ilike(search_pattern),
-            Medication.frequency.ilike(search_pattern),
-            Medication.notes.ilike(search_pattern)
-        )
-    ).all()
-    
-    # Search Documents (filename)
-    document_results = MedicalDocument.query.filter(
-        MedicalDocument.user_id == current_user.id,
-        MedicalDocument.filename.ilike(search_pattern)
-    ).order_by(MedicalDocument.upload_date.desc()).all()
-    
-    # Calculate total results
-    total_results = (
-        len(journal_results) + 
-        len(visit_results) + 
-        len(medication_results) + 
-        len(document_results)
-    )
-    
-    if total_results == 0:
-        flash(f'No results found for "{query}".', 'info')
-    else:
-        flash(f'Found {total_results} result(s) for "{query}".', 'success')
+    total_results = results.total
+    if results.page == 1:
+        if total_results == 0:
+            flash(f'No results found for "{query}".', 'info')
+        else:
+            flash(f'Found {total_results} result(s) for "{query}".', 'success')
     
     return render_template(
         'search_results.html',
         query=query,
-        journal_results=journal_results,
-        visit_results=visit_results,
-        medication_results=medication_results,
-        document_results=document_results,
-        total_results=total_results
+        journal_results=grouped['journal'],
+        visit_results=grouped['visit'],
+        medication_results=grouped['medication'],
+        document_results=grouped['document'],
+        snippets=snippets,
+        total_results=total_results,
+        page=results.page,
+        has_prev=results.page > 1,
+        has_next=results.page * results.per_page < total_results
     )
 
 @views.route('/generate-report',methods=['GET','POST'])
@@ -386,20 +482,125 @@ def generate_report():
             flash('Start date must be before end date.', 'danger')
             return render_template('generate_report.html', form=form)
         
-        # Generate report using existing ReportGenerator
-        report = ReportGenerator(current_user.id)
-        raw_data = report.fetch_data(start_date, end_date)
-        summary = report.generate_summary(raw_data_list=raw_data)
+        # Same data as a report we already stored: no need to generate again
+        generator = ReportGenerator(current_user.id)
+        existing = generator.find_report(start_date, end_date, generator.fetch_data(start_date, end_date))
+        if existing:
+            flash('Nothing has changed since this report was generated.', 'info')
+            return redirect(url_for('views.report_detail', report_id=existing.id))
+        
+        if current_app.config['REPORT_STREAMING']:
+            # The page opens views.report_stream and renders the brief as it arrives
+            return render_template('view_report.html',
+                                   summary=None,
+                                   stream_url=url_for('views.report_stream',
+                                                      start_date=start_date.isoformat(),
+                                                      end_date=end_date.isoformat()),
+                                   start_date=start_date,
+                                   end_date=end_date)
         
-        # Display the report
-        return render_template('view_report.html', 
-                             summary=summary,
-                             start_date=start_date,
-                             end_date=end_date)
+        # Queue the report; the LLM call runs on the report worker pool
+        job = get_report_queue().submit(current_user.id, start_date, end_date)
+        return redirect(url_for('views.report_job', job_id=job.id))
     
     # Show the form (GET request or validation failed)
     return render_template('generate_report.html', form=form)
 
+def _get_own_job(job_id):
+    job = ReportJob.query.get_or_404(job_id)
+    if job.user_id != current_user.id:
+        abort(404)
+    return get_report_queue().recover(job)
+
+@views.route('/reports/jobs/<job_id>')
+@login_required
+def report_job(job_id):
+    job = _get_own_job(job_id)
+    if job.status == 'done' and job.report_id:
+        return redirect(url_for('views.report_detail', report_id=job.report_id))
+    # While the job is pending the page polls views.report_job_status
+    return render_template('view_report.html',
+                           job=job,
+                           summary=job.summary if job.status == 'done' else None,
+                           start_date=job.start_date,
+                           end_date=job.end_date)
+
+@views.route('/reports/jobs/<job_id>/status')
+@login_required
+def report_job_status(job_id):
+    job = _get_own_job(job_id)
+    return jsonify(id=job.id, status=job.status, error=job.error,
+                   result_url=url_for('views.report_job', job_id=job.id))
+
+@views.route('/reports')
+@login_required
+def reports():
+    # Only the listing columns; the stored markdown/HTML stays in the database
+    history = db.session.execute(
+        db.select(Report.id, Report.start_date, Report.end_date, Report.model, Report.created_at)
+        .where(Report.user_id == current_user.id)
+        .order_by(Report.created_at.desc())
+    ).all()
+    return render_template('reports.html', reports=history)
+
+@views.route('/reports/<int:report_id>')
+@login_required
+def report_detail(report_id):
+    # Permalink: serves the stored HTML, no LLM call and no markdown rendering
+    report = Report.query.get_or_404(report_id)
+    if report.user_id != current_user.id:
+        abort(404)
+    return render_template('view_report.html',
+                           report=report,
+                           summary=None,
+                           start_date=report.start_date,
+                           end_date=report.end_date)
+
+@views.route('/reports/stream')
+@login_required
+def report_stream():
+    """Server-Sent Events: one `data:` event per markdown chunk from the model,
+    then a `done` event carrying the rendered HTML and the stored report's URL."""
+    try:
+        start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        abort(400)
+    if start_date > end_date:
+        abort(400)
+
+    report = ReportGenerator(current_user.id)
+    raw_data = report.fetch_data(start_date, end_date)
+    render_markdown = current_app.jinja_env.filters['markdown']
+
+    def events():
+        parts = []
+        for chunk in report.stream_summary(raw_data):
+            parts.append(chunk)
+            yield f"data: {json.dumps(chunk)}\n\n"
+        summary = ''.join(parts)
+        done = {'html': render_markdown(summary), 'url': None}
+        if report.last_error is None:
+            stored = (report.find_report(start_date, end_date, raw_data)
+                      or report.save_report(start_date, end_date, raw_data, summary))
+            done = {'html': stored.html, 'url': url_for('views.report_detail', report_id=stored.id)}
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@views.route('/health/llm')
+@internal_only
+def llm_health():
+    # Per-process counters for the shared LLM client
+    return jsonify(get_llm().snapshot())
+
+@views.route('/health/identity')
+@internal_only
+def identity_health():
+    # Per-process hit ratio of the user_loader cache
+    return jsonify(get_identity_cache().snapshot())
+
 @views.route('/about')
 def about():
     return render_template("about.html")
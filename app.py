@@ -1,8 +1,9 @@
 from Website import create_app
+from config import get_config
 import os
 
 
-app = create_app()
+app = create_app(get_config())
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
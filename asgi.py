@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+# As in gunicorn.conf.py: every uvicorn worker is its own process, so the
+# Prometheus client keeps its samples in files under one shared directory and
+# /metrics merges them (see Website/metrics.py). It has to be set before the app
+# (and prometheus_client) is imported. uvicorn has no master hook to clear it at
+# start, so each worker drops the files of processes that are gone.
+multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                      os.path.join(tempfile.gettempdir(), 'medical-journal-metrics'))
+os.makedirs(multiproc_dir, exist_ok=True)
+
+from Website import create_app
+from Website.asgi import create_asgi_app
+from Website.metrics import prune_multiproc_dir
+from config import get_config
+
+prune_multiproc_dir(multiproc_dir)
+
+
+# uvicorn asgi:app --workers 4
+app = create_asgi_app(create_app(get_config()))
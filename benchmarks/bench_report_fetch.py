@@ -0,0 +1,115 @@
+"""Fetch cost of ReportGenerator.fetch_data for a user with a long history.
+
+Compares the old fetch (three ORM queries hydrating full objects, visits and
+medications unbounded) with the current one (projection-only, date-bounded,
+single UNION ALL round-trip).
+
+    python benchmarks/bench_report_fetch.py --journals 10000
+    DATABASE_URL=postgresql://... python benchmarks/bench_report_fetch.py
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import Config
+from Website import create_app, db
+from Website.ai_report import ReportGenerator
+from Website.models import JournalEntry, Medication, User, Visit
+
+
+class BenchConfig(Config):
+    SECRET_KEY = 'bench'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+        'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    LLM_BACKEND = 'stub'
+
+
+def legacy_fetch_data(user_id, start, end):
+    # fetch_data as it was before the projection/date-window rework
+    journals = JournalEntry.query.filter(JournalEntry.user_id == user_id,
+                                         JournalEntry.created_at.between(start, end)).all()
+    j_list = [f"{j.created_at.strftime('%Y-%m-%d')}: {j.content}. {j.severity}" for j in journals]
+    visits = Visit.query.filter(Visit.user_id == user_id).all()
+    v_list = [f"{v.visit_date.strftime('%Y-%m-%d')}: {v.reason}.  {v.diagnosis}" for v in visits]
+    medications = Medication.query.filter(Medication.user_id == user_id).all()
+    m_list = [f"{m.name}  {m.dosage}" for m in medications]
+    return [j_list, v_list, m_list]
+
+
+def populate(journals, visits, medications):
+    user = User(username='bench', email='bench@example.com')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+    rng = random.Random(42)
+    now = datetime(2026, 1, 1)
+    days = 5 * 365
+    db.session.execute(JournalEntry.__table__.insert(), [
+        {'user_id': user.id, 'title': f'Entry {i}', 'severity': rng.choice(['Low', 'Medium', 'High']),
+         'content': 'Headache and mild nausea after lunch, resolved after rest. ' * 4,
+         'created_at': now - timedelta(days=rng.uniform(0, days))}
+        for i in range(journals)])
+    db.session.execute(Visit.__table__.insert(), [
+        {'user_id': user.id, 'reason': f'Follow-up {i}', 'doctor_name': 'Dr. Bench',
+         'diagnosis': 'Stable. Continue current plan and review in three months. ' * 3,
+         'visit_date': now - timedelta(days=rng.uniform(0, days))}
+        for i in range(visits)])
+    db.session.execute(Medication.__table__.insert(), [
+        {'user_id': user.id, 'name': f'Medication {i}', 'dosage': '10mg', 'frequency': 'daily',
+         'notes': 'Take with food.'}
+        for i in range(medications)])
+    db.session.commit()
+    return user.id, now
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--journals', type=int, default=10000)
+    parser.add_argument('--visits', type=int, default=500)
+    parser.add_argument('--medications', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30, help='report window length')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        user_id, now = populate(args.journals, args.visits, args.medications)
+        start, end = now - timedelta(days=args.days), now
+        report = ReportGenerator(user_id)
+
+        cases = [
+            ('before: 3 ORM queries, unbounded visits', lambda: legacy_fetch_data(user_id, start, end)),
+            ('after: 3 projection queries', lambda: report.fetch_rows(start, end, single_round_trip=False)),
+            ('after: 1 UNION ALL round-trip', lambda: report.fetch_rows(start, end)),
+            ('after: fetch_data (round-trip + formatting)', lambda: report.fetch_data(start, end)),
+        ]
+        print(f"{args.journals} journals, {args.visits} visits, {args.medications} medications, "
+              f"{args.days}-day window on {db.engine.dialect.name}")
+        for name, fn in cases:
+            median, best = timed(fn, args.repeat)
+            print(f"  {name:<46} median {median:8.2f} ms   best {best:8.2f} ms")
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
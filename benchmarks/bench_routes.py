@@ -0,0 +1,227 @@
+"""End-to-end latency, SQL count and memory of the key routes, with a regression gate.
+
+Generates a dataset with the `flask seed` generator, then drives each route
+through the Flask test client as a logged-in generated user: latency
+percentiles, SQL statements per request (from the SQL_PROFILING headers) and
+peak RSS. Every route runs in a fresh process, so its peak RSS is its own.
+Reports are generated inline against the stub LLM.
+
+    python benchmarks/bench_routes.py --save baseline.json
+    python benchmarks/bench_routes.py --compare baseline.json     # exit 1 on regression
+    DATABASE_URL=postgresql://... python benchmarks/bench_routes.py --users 2000
+
+A route regresses when its p95 or peak RSS grows by more than --threshold /
+--rss-threshold over the baseline, or when it issues more SQL statements.
+Baselines are only comparable on the same machine, dataset and backend.
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from config import Config
+from Website import create_app, db
+
+ROUTES = ['dashboard', 'search', 'medications', 'documents', 'visit_detail', 'upload_document',
+          'generate_report']
+SEARCH_TERMS = ['migraine', 'back pain', 'rash', 'cough', 'headache', 'allergy']
+END_DATE = date(2025, 1, 1)
+
+
+def make_config(workdir, database_url):
+    class BenchConfig(Config):
+        SECRET_KEY = 'bench'
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        WTF_CSRF_ENABLED = False
+        LLM_BACKEND = 'stub'
+        REPORT_JOBS_EAGER = True
+        SQL_PROFILING = True
+        METRICS_ENABLED = False
+        DOCUMENT_STORAGE_DIR = os.path.join(workdir, 'documents')
+        PREVIEW_CACHE_DIR = os.path.join(workdir, 'previews')
+    return BenchConfig
+
+
+def peak_rss_mb():
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def generate_dataset(args, config):
+    from Website.seeding import generate
+
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        try:
+            for totals in generate(args.users, args.journals_per_user, seed=args.seed, end_date=END_DATE):
+                pass
+        except ValueError:
+            # a DATABASE_URL that already holds this seed's users: measure against it
+            return 0
+    return sum(totals.values())
+
+
+def requests_for(route, visit_ids):
+    '''Yields (method, url, kwargs) for successive requests to `route`.'''
+    for i in range(10 ** 9):
+        if route == 'dashboard':
+            yield 'GET', '/dashboard', {}
+        elif route == 'search':
+            yield 'GET', '/search', {'query_string': {'search_query': SEARCH_TERMS[i % len(SEARCH_TERMS)]}}
+        elif route == 'medications':
+            yield 'GET', '/medications', {}
+        elif route == 'documents':
+            yield 'GET', '/documents', {}
+        elif route == 'visit_detail':
+            yield 'GET', f'/visit/{visit_ids[i % len(visit_ids)]}', {}
+        elif route == 'upload_document':
+            # new content every time, so each upload stores a new blob
+            content = b'%PDF-1.4\n%bench ' + str(i).encode() + b'\n' + b'0' * 64 * 1024
+            yield 'POST', '/upload-document', {'data': {'file': (io.BytesIO(content), f'bench_{i}.pdf'),
+                                                        'visit': 0},
+                                               'content_type': 'multipart/form-data'}
+        elif route == 'generate_report':
+            # a different window every time: no stored report or cached summary to reuse
+            end = END_DATE - timedelta(days=i)
+            yield 'POST', '/generate-report', {'data': {'start_date': (end - timedelta(days=90)).isoformat(),
+                                                        'end_date': end.isoformat()}}
+        else:
+            raise ValueError(f'Unknown route: {route}')
+
+
+def run_route(args, config):
+    '''Child process: measures one route and prints its result as JSON.'''
+    from Website.models import User, Visit
+    from Website.seeding import PASSWORD
+
+    app = create_app(config)
+    client = app.test_client()
+    email = f'loadtest{args.seed}_0@example.com'
+    response = client.post('/login', data={'email': email, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise SystemExit(f'Could not log in as {email}')
+    with app.app_context():
+        user_id = User.query.filter_by(email=email).first().id
+        visit_ids = [v for (v,) in db.session.execute(
+            db.select(Visit.id).where(Visit.user_id == user_id).order_by(Visit.id))]
+    plan = requests_for(args.run_route, visit_ids)
+
+    samples, queries = [], []
+    for n in range(args.warmup + args.requests):
+        method, url, kwargs = next(plan)
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise SystemExit(f'{method} {url} returned {response.status_code}')
+        if n >= args.warmup:
+            samples.append(elapsed)
+            queries.append(int(response.headers.get('X-SQL-Queries', 0)))
+    json.dump({
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+        'sql_queries': max(queries),
+        'peak_rss_mb': peak_rss_mb(),
+    }, sys.stdout)
+
+
+def compare(results, baseline, args):
+    failures = []
+    for route, result in results.items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + args.threshold):
+            failures.append(f"{route}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result['sql_queries'] > before['sql_queries']:
+            failures.append(f"{route}: SQL statements {before['sql_queries']} -> {result['sql_queries']}")
+        if result['peak_rss_mb'] > before['peak_rss_mb'] * (1 + args.rss_threshold):
+            failures.append(f"{route}: peak RSS {before['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--journals-per-user', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--requests', type=int, default=100, help='measured requests per route')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--routes', default=','.join(ROUTES), help='comma-separated subset of the routes')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='baseline to gate against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed p95 growth (0.25 = +25%%)')
+    parser.add_argument('--rss-threshold', type=float, default=0.15, help='allowed peak RSS growth')
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--database-url', help=argparse.SUPPRESS)
+    parser.add_argument('--run-route', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_route:
+        run_route(args, make_config(args.workdir, args.database_url))
+        return
+
+    workdir = tempfile.mkdtemp(prefix='bench-routes-')
+    database_url = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    config = make_config(workdir, database_url)
+    started = time.perf_counter()
+    rows = generate_dataset(args, config)
+    if rows:
+        print(f"{rows} rows for {args.users} users on {database_url.split(':')[0]} "
+              f"in {time.perf_counter() - started:.0f}s; {args.requests} requests per route")
+    else:
+        print(f'Reusing the seed {args.seed} users already in the database')
+
+    results = {}
+    print(f"  {'route':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL':>6}{'RSS MB':>9}")
+    for route in args.routes.split(','):
+        child = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-route', route, '--workdir', workdir,
+             '--database-url', database_url, '--seed', str(args.seed),
+             '--requests', str(args.requests), '--warmup', str(args.warmup)],
+            capture_output=True, text=True)
+        if child.returncode != 0:
+            raise SystemExit(f'{route} failed:\n{child.stderr}')
+        results[route] = result = json.loads(child.stdout)
+        print(f"  {route:<18}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+              f"{result['sql_queries']:>6}{result['peak_rss_mb']:>9.0f}")
+
+    report = {'dataset': {'users': args.users, 'journals_per_user': args.journals_per_user, 'seed': args.seed,
+                          'backend': database_url.split(':')[0]},
+              'routes': results}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Saved baseline to {args.save}')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != report['dataset']:
+            print(f"warning: baseline was taken on a different dataset: {baseline.get('dataset')}")
+        failures = compare(results, baseline, args)
+        for failure in failures:
+            print(f'REGRESSION {failure}')
+        if failures:
+            sys.exit(1)
+        print('No regressions against the baseline.')
+
+
+if __name__ == '__main__':
+    main()
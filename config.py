@@ -1,5 +1,7 @@
 import os
+import tempfile
 from dotenv import load_dotenv
+from sqlalchemy.pool import NullPool
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
@@ -9,6 +11,108 @@ load_dotenv(os.path.join(basedir, '.env'))
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY')
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
-    SQLALCHEMY_TRACK_MODIFICATIONS = True
+    # Flask-SQLAlchemy's per-object modification signals; nothing listens to them
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # optional read replica for @use_replica views (see Website/replica.py); after
+    # a write the user reads from the primary for REPLICA_STICKY_SECONDS
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': DATABASE_REPLICA_URL} if DATABASE_REPLICA_URL else {}
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
     UPLOAD_FOLDER = os.path.join(basedir, 'Website/static/uploads')
-    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
\ No newline at end of file
+    # uploaded documents, stored once per distinct content (see Website/storage.py)
+    DOCUMENT_STORAGE_DIR = os.environ.get('DOCUMENT_STORAGE_DIR', os.path.join(basedir, 'storage', 'documents'))
+    MAX_DOCUMENT_SIZE = int(os.environ.get('MAX_DOCUMENT_SIZE', 25 * 1024 * 1024))
+    # '' (serve from Python), 'x-accel' (nginx) or 'x-sendfile' (Apache/lighttpd): after the
+    # ownership check the front proxy streams the file. DOCUMENT_ACCEL_PREFIX is the
+    # nginx `internal` location aliased to DOCUMENT_STORAGE_DIR
+    DOCUMENT_SENDFILE = os.environ.get('DOCUMENT_SENDFILE', '')
+    DOCUMENT_ACCEL_PREFIX = os.environ.get('DOCUMENT_ACCEL_PREFIX', '/_documents/')
+    # document thumbnails, rendered by a process pool (see Website/previews.py)
+    PREVIEW_CACHE_DIR = os.environ.get('PREVIEW_CACHE_DIR', os.path.join(basedir, 'storage', 'previews'))
+    PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 2))
+    # profile pictures, resized by a process pool into <hash>-<size>.webp (see Website/avatars.py)
+    AVATAR_DIR = os.environ.get('AVATAR_DIR', os.path.join(basedir, 'Website/static/profile_pics'))
+    AVATAR_WORKERS = int(os.environ.get('AVATAR_WORKERS', 1))
+    MAX_AVATAR_SIZE = int(os.environ.get('MAX_AVATAR_SIZE', 5 * 1024 * 1024))
+    # originals waiting for the pool; AVATAR_DIR is publicly served, so not under it
+    AVATAR_TMP_DIR = os.environ.get('AVATAR_TMP_DIR', os.path.join(tempfile.gettempdir(), 'medical-journal-avatars'))
+    # rows per executemany/commit for bulk imports (see Website/importer.py)
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    MAX_IMPORT_SIZE = int(os.environ.get('MAX_IMPORT_SIZE', 100 * 1024 * 1024))
+    GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+    GEMINI_MODEL = os.environ.get('GEMINI_MODEL', 'gemini-2.5-flash')
+    # 'gemini' or 'stub' (canned offline responses, for tests and local dev)
+    LLM_BACKEND = os.environ.get('LLM_BACKEND', 'gemini')
+    # shared Gemini client: timeouts in seconds, bounded retries, circuit breaker
+    LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+    LLM_READ_TIMEOUT = float(os.environ.get('LLM_READ_TIMEOUT', 60))
+    LLM_POOL_SIZE = int(os.environ.get('LLM_POOL_SIZE', 10))
+    LLM_MAX_ATTEMPTS = int(os.environ.get('LLM_MAX_ATTEMPTS', 3))
+    LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 8))
+    LLM_BREAKER_THRESHOLD = int(os.environ.get('LLM_BREAKER_THRESHOLD', 5))
+    LLM_BREAKER_RESET = float(os.environ.get('LLM_BREAKER_RESET', 30))
+    # Stream the brief to the page over SSE instead of queueing a job. This keeps
+    # the connection open for the whole generation, so use it with threaded or
+    # async workers rather than plain sync gunicorn workers
+    REPORT_STREAMING = os.environ.get('REPORT_STREAMING', '').lower() in ('1', 'true', 'yes')
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    # under the ASGI server (asgi.py) the routes without an async view run on this
+    # many threads per worker; the async ones need no thread while they wait
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+    # estimated tokens; long journal histories are compacted to fit (see prompt.py)
+    PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', 24000))
+    MARKDOWN_CACHE_SIZE = int(os.environ.get('MARKDOWN_CACHE_SIZE', 128))
+    REPORT_JOB_TIMEOUT = int(os.environ.get('REPORT_JOB_TIMEOUT', 300))
+    SUMMARY_CACHE_TTL = int(os.environ.get('SUMMARY_CACHE_TTL', 7 * 24 * 3600))
+    SUMMARY_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_SIZE', 256))
+    TIMELINE_PAGE_SIZE = int(os.environ.get('TIMELINE_PAGE_SIZE', 25))
+    SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', 20))
+    IDENTITY_CACHE_SIZE = int(os.environ.get('IDENTITY_CACHE_SIZE', 1024))
+    IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+    # count/time SQL per request and warn about repeated statements (likely N+1)
+    SQL_PROFILING = os.environ.get('SQL_PROFILING', '').lower() in ('1', 'true', 'yes')
+    SQL_NPLUSONE_THRESHOLD = int(os.environ.get('SQL_NPLUSONE_THRESHOLD', 3))
+    # Prometheus endpoint at /metrics, off unless enabled. Scrapers must send
+    # "Authorization: Bearer <METRICS_TOKEN>" or come from one of the comma-separated
+    # METRICS_ALLOWED_IPS. See gunicorn.conf.py / asgi.py for multi-worker setup
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+
+
+class DevelopmentConfig(Config):
+    pass
+
+
+class ProductionConfig(Config):
+    # Connections per gunicorn worker process: one per request thread
+    # (GUNICORN_THREADS, see gunicorn.conf.py) plus the report job threads, with a
+    # little overflow for preview/avatar callbacks. Postgres must allow
+    # WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections per bind.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE',
+                                      int(os.environ.get('GUNICORN_THREADS', 1)) + Config.REPORT_WORKERS))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 2))
+    # PgBouncer in transaction pooling mode does the pooling itself, so the app
+    # opens a connection per checkout and never holds one idle. psycopg2 does
+    # not use server-side prepared statements, which transaction mode can't keep
+    DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+    if DB_PGBOUNCER:
+        SQLALCHEMY_ENGINE_OPTIONS = {'poolclass': NullPool}
+    else:
+        SQLALCHEMY_ENGINE_OPTIONS = {
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            # fail fast instead of queueing requests behind an exhausted pool
+            'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            # drop connections the server, a proxy or a failover has closed
+            'pool_pre_ping': True,
+            'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        }
+
+
+CONFIGS = {'development': DevelopmentConfig, 'production': ProductionConfig}
+
+
+def get_config(name=None):
+    '''Config class for APP_ENV (development by default).'''
+    return CONFIGS[(name or os.environ.get('APP_ENV', 'development')).lower()]
@@ -0,0 +1,26 @@
+import os
+import shutil
+import tempfile
+
+# gunicorn picks this file up automatically. Each worker is its own process, so
+# the Prometheus client keeps its samples in files under this directory and
+# /metrics merges them (see Website/metrics.py). It has to be set before the
+# workers import the app, hence here and not in config.py.
+multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                      os.path.join(tempfile.gettempdir(), 'medical-journal-metrics'))
+
+
+# gunicorn reads WEB_CONCURRENCY for the worker count itself. Threads per worker
+# also size the database pool in config.ProductionConfig.
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+
+def on_starting(server):
+    # samples from a previous run would otherwise be added to the new ones
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
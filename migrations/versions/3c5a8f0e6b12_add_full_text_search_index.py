@@ -0,0 +1,77 @@
+"""add full text search index
+
+Revision ID: 3c5a8f0e6b12
+Revises: b7e2c91d4a30
+Create Date: 2026-10-18 10:03:17.220914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5a8f0e6b12'
+down_revision = 'b7e2c91d4a30'
+branch_labels = None
+depends_on = None
+
+
+# The search schema as of this revision (Website/search.py may change later):
+# table -> (kind, fts5 rowid slot, title expression, body expression), with
+# column references prefixed by {p} ('' for the table itself, 'new.' in triggers)
+SOURCES = {
+    'journal_entry': ('journal', 0, "coalesce({p}title, '')",
+                      "coalesce({p}content, '') || ' ' || coalesce({p}severity, '')"),
+    'visit': ('visit', 1, "coalesce({p}reason, '')",
+              "coalesce({p}doctor_name, '') || ' ' || coalesce({p}diagnosis, '')"),
+    'medication': ('medication', 2, "coalesce({p}name, '')",
+                   "coalesce({p}dosage, '') || ' ' || coalesce({p}frequency, '') || ' ' || coalesce({p}notes, '')"),
+    'medical_document': ('document', 3,
+                         "replace(replace(replace(coalesce({p}filename, ''), '_', ' '), '-', ' '), '.', ' ')",
+                         "''"),
+}
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # generated tsvector columns + GIN indexes
+        for table, (kind, slot, title, body) in SOURCES.items():
+            op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                       f"GENERATED ALWAYS AS (setweight(to_tsvector('english', {title.format(p='')}), 'A') || "
+                       f"setweight(to_tsvector('english', {body.format(p='')}), 'B')) STORED")
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+    elif bind.dialect.name == 'sqlite':
+        # FTS5 mirror table kept in sync by triggers, filled from the existing rows
+        n = len(SOURCES)
+        op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+                   "kind UNINDEXED, record_id UNINDEXED, owner, title, body, tokenize='porter unicode61')")
+        for table, (kind, slot, title, body) in SOURCES.items():
+            values = (f"new.id * {n} + {slot}, '{kind}', new.id, 'u' || new.user_id, "
+                      f"{title.format(p='new.')}, {body.format(p='new.')}")
+            insert = f"INSERT INTO search_fts(rowid, kind, record_id, owner, title, body) VALUES ({values});"
+            delete = f"DELETE FROM search_fts WHERE rowid = old.id * {n} + {slot};"
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} "
+                       f"BEGIN {insert} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE ON {table} "
+                       f"BEGIN {delete} {insert} END")
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} "
+                       f"BEGIN {delete} END")
+        op.execute("DELETE FROM search_fts")
+        for table, (kind, slot, title, body) in SOURCES.items():
+            op.execute(f"INSERT INTO search_fts(rowid, kind, record_id, owner, title, body) "
+                       f"SELECT id * {n} + {slot}, '{kind}', id, 'u' || user_id, "
+                       f"{title.format(p='')}, {body.format(p='')} FROM {table}")
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table in SOURCES:
+        if bind.dialect.name == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+        elif bind.dialect.name == 'sqlite':
+            for suffix in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+    if bind.dialect.name == 'sqlite':
+        op.execute("DROP TABLE IF EXISTS search_fts")
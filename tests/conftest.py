@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from config import Config
+from Website import create_app, db
+from Website.models import User
+
+'''
+Fixtures for the tests. The app runs against a throwaway SQLite database
+unless TEST_DATABASE_URL points at another one (e.g. a scratch PostgreSQL
+database, for the query-plan checks), with the offline LLM stub and every
+file it writes under pytest's tmp_path.
+'''
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test'
+        SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or f'sqlite:///{tmp_path / "app.db"}'
+        SQLALCHEMY_BINDS = {}
+        WTF_CSRF_ENABLED = False
+        LLM_BACKEND = 'stub'
+        # run report jobs, previews and avatars inline rather than in pools
+        REPORT_JOBS_EAGER = True
+        PREVIEWS_EAGER = True
+        AVATARS_EAGER = True
+        METRICS_ENABLED = False
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        DOCUMENT_STORAGE_DIR = str(tmp_path / 'documents')
+        PREVIEW_CACHE_DIR = str(tmp_path / 'previews')
+        AVATAR_DIR = str(tmp_path / 'avatars')
+        AVATAR_TMP_DIR = str(tmp_path / 'avatar-uploads')
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='patient', email='patient@example.com')
+    user.set_password('patient')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture
+def client(app, user):
+    '''A test client logged in as `user`.'''
+    client = app.test_client()
+    response = client.post('/login', data={'email': 'patient@example.com', 'password': 'patient'})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import json
+
+import httpx
+import pytest
+
+from Website import db
+from Website.asgi import create_asgi_app
+from Website.models import JournalEntry, MedicalDocument
+
+PDF = b'%PDF-1.4 async upload'
+
+
+@pytest.fixture
+def asgi(app):
+    return create_asgi_app(app)
+
+
+def run(asgi, *requests, login=True):
+    '''Sends each (method, url, kwargs) through the ASGI app in turn, logged
+    in as the `user` fixture, and returns the responses.'''
+    async def send_all():
+        transport = httpx.ASGITransport(app=asgi)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            if login:
+                response = await client.post('/login', data={'email': 'patient@example.com',
+                                                             'password': 'patient'})
+                assert response.status_code == 302
+            responses = [await client.request(method, url, **kwargs) for method, url, kwargs in requests]
+        await asgi.flask_app.extensions['async_db'].dispose()
+        return responses
+
+    return asyncio.run(send_all())
+
+
+def test_async_views_require_login(app, user, asgi):
+    response, = run(asgi, ('GET', '/search?search_query=headache', {}), login=False)
+
+    assert response.status_code == 302
+    assert '/login' in response.headers['location']
+
+
+def test_search_runs_on_the_async_engine(app, user, asgi, monkeypatch):
+    # the sync view must not be reached
+    monkeypatch.setitem(app.view_functions, 'views.search', None)
+    db.session.add(JournalEntry(user_id=user.id, title='Migraine', content='throbbing headache', severity='High'))
+    db.session.commit()
+
+    response, = run(asgi, ('GET', '/search?search_query=headache', {}))
+
+    assert response.status_code == 200
+    assert 'Migraine' in response.text
+
+
+def test_upload_is_streamed_to_storage_and_downloaded(app, user, asgi):
+    files = {'file': ('scan.pdf', PDF, 'application/pdf')}
+    upload, = run(asgi, ('POST', '/upload-document', {'data': {'visit': '0'}, 'files': files}))
+
+    assert upload.status_code == 302
+    assert upload.headers['location'].endswith('/dashboard')
+    db.session.expire_all()
+    doc = MedicalDocument.query.one()
+    assert doc.content_hash == hashlib.sha256(PDF).hexdigest()
+
+    full, partial, cached = run(asgi,
+                                ('GET', f'/documents/{doc.id}/download', {}),
+                                ('GET', f'/documents/{doc.id}/download', {'headers': {'Range': 'bytes=9-13'}}),
+                                ('GET', f'/documents/{doc.id}/download',
+                                 {'headers': {'If-None-Match': f'"{doc.content_hash}"'}}))
+    assert full.status_code == 200
+    assert full.content == PDF
+    assert partial.status_code == 206
+    assert partial.content == PDF[9:14]
+    assert cached.status_code == 304
+    assert cached.content == b''
+
+
+def test_upload_of_the_wrong_type_is_refused(app, user, asgi):
+    files = {'file': ('notes.exe', b'MZ', 'application/octet-stream')}
+    response, = run(asgi, ('POST', '/upload-document', {'data': {'visit': '0'}, 'files': files}))
+
+    assert response.status_code == 302
+    assert response.headers['location'].endswith('/upload-document')
+    assert MedicalDocument.query.count() == 0
+
+
+def test_report_stream_sends_the_summary_as_events(app, user, asgi):
+    response, = run(asgi, ('GET', '/reports/stream?start_date=2026-01-01&end_date=2026-01-31', {}))
+
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = response.text.split('\n\n')
+    chunks = [json.loads(event[len('data: '):]) for event in events if event.startswith('data: ')]
+    assert 'Offline stub report' in ''.join(chunks)
+    done = [event for event in events if event.startswith('event: done')]
+    assert json.loads(done[0].split('data: ', 1)[1])['url'].startswith('/reports/')
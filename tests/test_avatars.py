@@ -0,0 +1,39 @@
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from Website import db
+from Website.avatars import AvatarTooLarge, get_avatars
+from Website.models import User
+
+
+def test_oversized_avatar_is_refused_while_streaming(app):
+    avatars = get_avatars()
+    avatars.max_size = 1024
+    upload = FileStorage(io.BytesIO(b'x' * 4096), filename='me.png')
+
+    with pytest.raises(AvatarTooLarge):
+        avatars.submit(1, upload)
+
+    # no temp file left behind, and the processing slot is free again
+    assert os.listdir(avatars.tmp_dir) == []
+    # originals never sit in the publicly served avatar directory
+    assert not os.path.exists(os.path.join(avatars.directory, 'tmp'))
+    assert avatars.slots.acquire(blocking=False)
+
+
+def test_profile_rejects_body_past_avatar_limit(app):
+    app.config['MAX_AVATAR_SIZE'] = 1024
+    user = User(username='avatar', email='avatar@example.com')
+    user.set_password('avatar')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'email': 'avatar@example.com', 'password': 'avatar'})
+
+    response = client.post('/profile', data={'username': 'avatar', 'email': 'avatar@example.com',
+                                             'picture': (io.BytesIO(b'x' * 256 * 1024), 'me.png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 413
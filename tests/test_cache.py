@@ -0,0 +1,80 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from Website import db
+from Website.cache import LRUCache, get_summary_cache, summary_cache_key
+from Website.models import JournalEntry, SummaryCacheEntry
+
+DATA = ['2026-01-02: headache (Severity: High)', '', 'Ibuprofen 200mg']
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_lru_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = LRUCache(ttl=10)
+    cache.set('short', 1, ttl=1)
+    cache.set('default', 2)
+
+    now[0] += 5
+    assert cache.get('short') is None
+    assert cache.get('default') == 2
+    now[0] += 10
+    assert cache.get('default') is None
+    assert len(cache) == 0
+
+
+def test_key_changes_with_data_model_and_prompt_version():
+    key = summary_cache_key(DATA, 'gemini-2.5-flash', 1)
+
+    assert key == summary_cache_key(list(DATA), 'gemini-2.5-flash', 1)
+    assert key != summary_cache_key([*DATA[:2], 'Ibuprofen 400mg'], 'gemini-2.5-flash', 1)
+    assert key != summary_cache_key(DATA, 'gemini-2.5-pro', 1)
+    assert key != summary_cache_key(DATA, 'gemini-2.5-flash', 2)
+
+
+def test_summary_survives_a_cold_process_cache(app, user):
+    cache = get_summary_cache()
+    key = summary_cache_key(DATA, 'model', 1)
+    cache.set(key, user.id, 'summary', 'model')
+
+    cache.memory.clear()
+    assert cache.get(key) == 'summary'
+    # the database hit warms the in-process tier again
+    assert len(cache.memory) == 1
+
+
+def test_expired_rows_are_not_served(app, user):
+    cache = get_summary_cache()
+    key = summary_cache_key(DATA, 'model', 1)
+    cache.set(key, user.id, 'summary', 'model')
+    cache.memory.clear()
+    db.session.get(SummaryCacheEntry, key).expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.session.commit()
+
+    assert cache.get(key) is None
+
+
+def test_changing_report_data_drops_the_owners_summaries(app, user):
+    cache = get_summary_cache()
+    key = summary_cache_key(DATA, 'model', 1)
+    cache.set(key, user.id, 'summary', 'model')
+
+    db.session.add(JournalEntry(user_id=user.id, title='Headache', content='since morning'))
+    db.session.commit()
+
+    assert cache.get(key) is None
+    assert db.session.get(SummaryCacheEntry, key) is None
@@ -0,0 +1,91 @@
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from Website import db
+from Website.importer import import_records
+from Website.models import JournalEntry, Medication, User, Visit
+
+
+@pytest.fixture
+def records(user):
+    visit = Visit(user_id=user.id, doctor_name='Dr. Okafor', reason='Follow-up', diagnosis='Tension headache',
+                  visit_date=datetime(2024, 3, 3, tzinfo=timezone.utc))
+    db.session.add(visit)
+    db.session.flush()
+    db.session.add_all([
+        JournalEntry(user_id=user.id, title='Migraine', content='Woke up with one, "bad"', severity='High',
+                     created_at=datetime(2024, 3, 1, 7, 30, tzinfo=timezone.utc), visit_id=visit.id),
+        JournalEntry(user_id=user.id, title='Headache', content='Mild,\nafter lunch', severity='Low',
+                     created_at=datetime(2024, 3, 2, 13, 0, tzinfo=timezone.utc)),
+        Medication(user_id=user.id, name='Ibuprofen', dosage='200mg', frequency='As needed', notes='With food'),
+    ])
+    db.session.commit()
+
+
+def other_user():
+    other = User(username='other', email='other@example.com')
+    other.set_password('other')
+    db.session.add(other)
+    db.session.commit()
+    return other
+
+
+def snapshot(user_id):
+    journals = db.session.execute(
+        db.select(JournalEntry.title, JournalEntry.content, JournalEntry.severity, JournalEntry.created_at)
+        .where(JournalEntry.user_id == user_id).order_by(JournalEntry.created_at)).all()
+    visits = db.session.execute(
+        db.select(Visit.doctor_name, Visit.reason, Visit.diagnosis, Visit.visit_date)
+        .where(Visit.user_id == user_id)).all()
+    medications = db.session.execute(
+        db.select(Medication.name, Medication.dosage, Medication.frequency, Medication.notes)
+        .where(Medication.user_id == user_id)).all()
+    return journals, visits, medications
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_export_imports_into_another_account(app, client, user, records, fmt):
+    response = client.get(f'/export/{fmt}')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'private, no-store'
+    assert response.headers['Content-Disposition'].endswith(f'.{fmt}"')
+
+    other = other_user()
+    result = list(import_records(other.id, io.BytesIO(response.data), fmt))[-1]
+
+    assert (result.imported, result.failed) == (4, 0)
+    assert snapshot(other.id) == snapshot(user.id)
+
+
+def test_ndjson_export_has_one_record_per_line(app, client, user, records):
+    lines = client.get('/export/ndjson').data.decode('utf-8').splitlines()
+    exported = [json.loads(line) for line in lines]
+
+    assert [record['type'] for record in exported] == ['journal', 'journal', 'visit', 'medication']
+    assert exported[0]['date'].startswith('2024-03-01T07:30:00')
+    assert exported[0]['visit_id'] == exported[2]['id']
+    assert exported[2]['visit_date'] == '2024-03-03'
+
+
+def test_zip_export_includes_the_documents(app, client, user, records):
+    client.post('/upload-document', data={'file': (io.BytesIO(b'%PDF-1.4 scan'), 'scan.pdf'), 'visit': 0},
+                content_type='multipart/form-data')
+
+    response = client.get('/export/csv?files=1')
+
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        names = archive.namelist()
+        assert names[0] == 'records.csv'
+        document, = [name for name in names if name.startswith('documents/')]
+        assert document.endswith('-scan.pdf')
+        assert archive.read(document) == b'%PDF-1.4 scan'
+        assert b'document,' in archive.read('records.csv')
+
+
+def test_export_is_only_available_as_ndjson_or_csv(app, client):
+    assert client.get('/export/xml').status_code == 404
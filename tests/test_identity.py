@@ -0,0 +1,50 @@
+from Website import db
+from Website.identity import UserSnapshot, get_identity_cache
+from Website.models import User
+
+
+def test_loader_serves_snapshots_from_the_cache(app, user):
+    cache = get_identity_cache()
+
+    # the first load records the version in the login session; later ones hit
+    with app.test_request_context():
+        first = cache.load(user.id)
+        second = cache.load(user.id)
+
+    assert isinstance(first, UserSnapshot) and first.username == 'patient'
+    assert second is first
+    assert cache.snapshot()['hits'] == 1
+
+
+def test_identity_edits_bump_the_version_and_drop_the_cached_snapshot(user):
+    cache = get_identity_cache()
+    cache.load(user.id)
+
+    db.session.get(User, user.id).username = 'renamed'
+    db.session.commit()
+
+    assert db.session.get(User, user.id).identity_version == 1
+    assert cache.load(user.id).username == 'renamed'
+
+
+def test_other_user_changes_keep_the_version(user):
+    row = db.session.get(User, user.id)
+    row.set_password('changed')
+    db.session.commit()
+    assert row.identity_version == 0
+
+
+def test_profile_edit_shows_on_the_next_request(client, user):
+    assert b'patient' in client.get('/profile').data
+
+    client.post('/profile', data={'username': 'renamed', 'email': 'patient@example.com'})
+
+    with client.session_transaction() as session:
+        assert session['_identity_version'] == 1
+    page = client.get('/profile').get_data(as_text=True)
+    assert 'value="renamed"' in page
+
+
+def test_identity_health_is_internal(client):
+    # a logged-in patient is not enough
+    assert client.get('/health/identity').status_code == 403
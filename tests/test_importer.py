@@ -0,0 +1,92 @@
+import csv
+import io
+
+from Website import db
+from Website.importer import import_records
+from Website.models import JournalEntry, Medication, User, Visit
+
+
+def run_import(user, data, fmt='csv', **kwargs):
+    return list(import_records(user.id, io.BytesIO(data), fmt, **kwargs))
+
+
+def test_valid_rows_are_inserted_in_batches(user):
+    data = ('type,date,title,content,severity,name,reason,visit_date\n'
+            'journal,2024-03-01,Migraine,Woke up with one,High,,,\n'
+            'journal,2024-03-02,Migraine,Again,Low,,,\n'
+            'medication,,,,,Aspirin,,\n'
+            'visit,,,,,,Checkup,2024-03-03\n'
+            'journal,,Headache,Mild,Medium,,,\n').encode()
+
+    steps = run_import(user, data, batch_size=2)
+
+    assert [step.done for step in steps] == [False, False, True]
+    assert steps[-1].rows == 5 and steps[-1].imported == 5 and steps[-1].failed == 0
+    assert JournalEntry.query.filter_by(user_id=user.id).count() == 3
+    assert Medication.query.filter_by(user_id=user.id).count() == 1
+    assert Visit.query.filter_by(user_id=user.id).count() == 1
+    # one bump per committed batch, for the page ETags
+    assert db.session.get(User, user.id).data_revision == 3
+
+
+def test_invalid_rows_are_skipped_with_their_line_number(user):
+    data = ('type,title,content,severity\n'
+            'journal,Migraine,Bad one,High\n'
+            'journal,ab,too short a title,High\n'
+            'surgery,x,y,z\n').encode()
+
+    result = run_import(user, data)[-1]
+
+    assert (result.rows, result.imported, result.failed) == (3, 1, 2)
+    assert [line for line, _ in result.errors] == [3, 4]
+    assert result.errors[0][1].startswith('title:')
+
+
+def test_single_kind_file_needs_no_type_column(user):
+    result = run_import(user, b'name,dosage\nAspirin,100mg\n', kind='medication')[-1]
+    assert result.imported == 1
+
+
+def test_ndjson_lines_that_are_not_objects_are_reported(user):
+    data = (b'{"type": "medication", "name": "Aspirin"}\n'
+            b'[1, 2]\n'
+            b'{not json\n')
+
+    result = run_import(user, data, fmt='ndjson')[-1]
+
+    assert (result.imported, result.failed) == (1, 2)
+    assert result.errors[0] == (2, 'Each line must be a JSON object')
+    assert result.errors[1][0] == 3
+
+
+def test_non_utf8_file_is_reported_not_raised(user):
+    data = 'type,name\nmedication,Aspirin\nmedication,Café\n'.encode('latin-1')
+
+    result = run_import(user, data)[-1]
+
+    assert result.done and result.failed == 1
+    assert 'not UTF-8' in result.errors[-1][1]
+
+
+def test_malformed_csv_is_reported_not_raised(user):
+    data = b'type,name\nmedication,' + b'x' * (csv.field_size_limit() + 1) + b'\n'
+
+    result = run_import(user, data)[-1]
+
+    assert result.done and result.failed == 1
+    assert 'Malformed CSV' in result.errors[-1][1]
+
+
+def test_import_page_reports_unreadable_file(client):
+    response = client.post('/import', data={'file': (io.BytesIO('type,name\nmedication,Café\n'.encode('latin-1')),
+                                                     'meds.csv'), 'kind': ''},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert b'not UTF-8' in response.data
+
+
+def test_import_page_refuses_oversized_upload(app, client):
+    app.config['MAX_IMPORT_SIZE'] = 1024
+    response = client.post('/import', data={'file': (io.BytesIO(b'x' * 256 * 1024), 'big.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 413
@@ -0,0 +1,102 @@
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from Website import db
+from Website.ai_report import ReportGenerator
+from Website.jobs import get_report_queue
+from Website.models import Report, ReportJob
+
+START = date(2026, 1, 1)
+END = date(2026, 1, 31)
+
+
+def make_job(user, status, **fields):
+    job = ReportJob(id=uuid.uuid4().hex, user_id=user.id, status=status,
+                    start_date=START, end_date=END, **fields)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def test_submitted_job_stores_the_report(app, user):
+    job = get_report_queue().submit(user.id, START, END)
+
+    db.session.expire_all()
+    job = db.session.get(ReportJob, job.id)
+    assert job.status == 'done'
+    assert job.finished_at is not None
+    report = db.session.get(Report, job.report_id)
+    assert report.user_id == user.id
+    assert job.summary == report.markdown
+    assert 'Offline stub report' in job.summary
+
+
+def test_failed_job_records_the_error(app, user, monkeypatch):
+    def fail(self, raw_data_list):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(ReportGenerator, 'summarize', fail)
+    job = get_report_queue().submit(user.id, START, END)
+
+    db.session.expire_all()
+    job = db.session.get(ReportJob, job.id)
+    assert job.status == 'failed'
+    assert job.error == 'model unavailable'
+    assert job.report_id is None
+
+
+def test_a_job_is_only_claimed_once(app, user):
+    queue = get_report_queue()
+    job = make_job(user, 'queued')
+
+    assert queue._claim(job.id)
+    assert not queue._claim(job.id)
+
+
+def test_running_job_is_not_run_again(app, user):
+    job = make_job(user, 'running', started_at=datetime.now(timezone.utc))
+
+    get_report_queue()._run(job.id)
+
+    db.session.expire_all()
+    job = db.session.get(ReportJob, job.id)
+    assert job.status == 'running'
+    assert job.summary is None
+    assert app.extensions['llm'].calls == []
+
+
+def test_recover_resubmits_a_stale_queued_job(app, user):
+    stale = datetime.now(timezone.utc) - timedelta(seconds=app.config.get('REPORT_JOB_TIMEOUT', 300) + 60)
+    job = make_job(user, 'queued', created_at=stale)
+
+    job = get_report_queue().recover(job)
+
+    db.session.expire_all()
+    assert db.session.get(ReportJob, job.id).status == 'done'
+
+
+def test_recover_fails_a_job_stuck_in_running(app, user):
+    stale = datetime.now(timezone.utc) - timedelta(seconds=app.config.get('REPORT_JOB_TIMEOUT', 300) + 60)
+    job = make_job(user, 'running', created_at=stale, started_at=stale)
+
+    job = get_report_queue().recover(job)
+
+    assert job.status == 'failed'
+    assert job.error == 'Report generation timed out.'
+
+
+def test_recover_leaves_a_fresh_job_alone(app, user):
+    job = make_job(user, 'running', started_at=datetime.now(timezone.utc))
+
+    assert get_report_queue().recover(job).status == 'running'
+
+
+def test_job_status_is_only_visible_to_its_owner(app, client, user):
+    job_id = get_report_queue().submit(user.id, START, END).id
+    # the requests share this app context's session; drop its stale copy
+    db.session.expire_all()
+
+    response = client.get(f'/reports/jobs/{job_id}/status')
+    assert response.status_code == 200
+    assert response.json['status'] == 'done'
+    assert client.get(f'/reports/jobs/{uuid.uuid4().hex}/status').status_code == 404
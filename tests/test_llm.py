@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+import pytest
+
+from Website.llm import CircuitBreaker, CircuitOpenError, GeminiLLM, ResilientLLM
+
+RESPONSE = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': 'ok'}]}}]}
+
+
+def _mock(llm):
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(200, json=RESPONSE)
+
+    llm.client  # builds the pooled httpx clients
+    llm.http._transport = httpx.MockTransport(handler)
+    llm.async_http._transport = httpx.MockTransport(handler)
+    return sent
+
+
+def test_gemini_requests_carry_connect_and_read_timeouts():
+    llm = GeminiLLM('test-key', connect_timeout=2.0, read_timeout=7.0)
+    sent = _mock(llm)
+
+    assert llm.generate('prompt', 'gemini-2.5-flash') == 'ok'
+
+    async def collect():
+        return [chunk async for chunk in llm.astream('prompt', 'gemini-2.5-flash')]
+
+    asyncio.run(collect())
+    assert len(sent) == 2
+    for request in sent:
+        assert request.extensions['timeout'] == {'connect': 2.0, 'read': 7.0, 'write': 7.0, 'pool': 7.0}
+
+
+class FailingLLM:
+    def __init__(self, exc):
+        self.exc = exc
+        self.calls = 0
+
+    def generate(self, prompt, model):
+        self.calls += 1
+        raise self.exc
+
+
+def resilient(exc):
+    return ResilientLLM(FailingLLM(exc), max_attempts=2, backoff_max=0,
+                        breaker=CircuitBreaker(threshold=3, reset_timeout=60))
+
+
+def test_transient_failures_are_retried_and_open_the_circuit():
+    llm = resilient(TimeoutError('upstream stalled'))
+    for _ in range(3):
+        with pytest.raises(TimeoutError):
+            llm.generate('prompt', 'model')
+    assert llm.backend.calls == 6
+    assert llm.breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        llm.generate('prompt', 'model')
+
+
+def test_bad_requests_are_not_retried_and_leave_the_circuit_closed():
+    llm = resilient(ValueError('invalid prompt'))
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            llm.generate('prompt', 'model')
+    assert llm.backend.calls == 5
+    assert llm.breaker.state == 'closed'
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from Website import create_app
+from Website.metrics import prune_multiproc_dir
+
+
+@pytest.fixture
+def metrics_app(app):
+    config = type('MetricsConfig', (), dict(app.config, METRICS_ENABLED=True, METRICS_TOKEN='s3cret',
+                                             METRICS_ALLOWED_IPS=['10.0.0.5']))
+    return create_app(config)
+
+
+def test_metrics_refuses_anonymous_scrapes(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+
+
+def test_metrics_answers_token_or_allowed_address(metrics_app):
+    client = metrics_app.test_client()
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert b'http_requests_total' in response.data
+    assert client.get('/metrics', environ_base={'REMOTE_ADDR': '10.0.0.5'}).status_code == 200
+
+
+def test_metrics_route_absent_when_disabled(app):
+    assert app.test_client().get('/metrics').status_code == 404
+
+
+def test_prune_multiproc_dir_keeps_live_processes(tmp_path):
+    live = tmp_path / f'counter_{os.getpid()}.db'
+    dead = tmp_path / 'histogram_999999999.db'
+    live.touch()
+    dead.touch()
+    prune_multiproc_dir(tmp_path)
+    assert live.exists() and not dead.exists()
+
+
+def test_llm_health_is_internal(metrics_app):
+    client = metrics_app.test_client()
+    assert client.get('/health/llm').status_code == 403
+    response = client.get('/health/llm', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert response.json['circuit'] == 'closed'
@@ -0,0 +1,82 @@
+from datetime import date, datetime, timedelta
+
+from Website import db
+from Website.ai_report import ReportGenerator
+from Website.models import JournalEntry
+from Website.prompt import compact_journal_lines, estimate_tokens, format_entry
+
+MONDAY = datetime(2026, 1, 5, 9, 0)
+
+
+def rows(days, content, severity):
+    return [(MONDAY + timedelta(days=day), content, severity) for day in days]
+
+
+def test_small_histories_are_left_alone():
+    journal = rows(range(3), 'mild headache', 'Low')
+
+    lines, stages = compact_journal_lines(journal, budget_tokens=1000)
+
+    assert lines == [format_entry(*row) for row in journal]
+    assert stages == []
+
+
+def test_repeated_symptoms_collapse_into_one_line():
+    journal = rows(range(3), 'Mild headache.', 'Low') + rows([1], 'mild  headache', 'Low')
+    journal.sort(key=lambda row: row[0])
+    budget = estimate_tokens('\n'.join(format_entry(*row) for row in journal)) - 1
+
+    lines, stages = compact_journal_lines(journal, budget)
+
+    assert stages == ['collapse repeats']
+    assert lines == ['2026-01-05 to 2026-01-07 (x4): Mild headache.. Low']
+
+
+def test_low_and_medium_entries_are_aggregated_per_week():
+    journal = sorted(rows(range(0, 14, 2), 'stiff neck', 'Low')
+                     + rows(range(1, 14, 2), 'nausea', 'Medium'), key=lambda row: row[0])
+    journal = [(created_at, f'{content} {n}', severity) for n, (created_at, content, severity) in enumerate(journal)]
+
+    lines, stages = compact_journal_lines(journal, budget_tokens=90)
+
+    assert stages == ['collapse repeats', 'weekly low', 'weekly medium']
+    assert lines == [
+        'Week of 2026-01-05: 4 low-severity entries: stiff neck 0; stiff neck 2; stiff neck 4; stiff neck 6',
+        'Week of 2026-01-05: 3 medium-severity entries: nausea 1; nausea 3; nausea 5',
+        'Week of 2026-01-12: 4 medium-severity entries: nausea 7; nausea 9; nausea 11; nausea 13',
+        'Week of 2026-01-12: 3 low-severity entries: stiff neck 8; stiff neck 10; stiff neck 12',
+    ]
+    assert estimate_tokens('\n'.join(lines)) <= 90
+
+
+def test_high_severity_entries_are_always_kept_verbatim():
+    high = rows(range(3), 'chest pain radiating to the left arm', 'High')
+    journal = sorted(high + rows(range(7), 'runny nose', 'Low'), key=lambda row: row[0])
+
+    lines, stages = compact_journal_lines(journal, budget_tokens=1)
+
+    assert stages[-1] == 'no examples'
+    for row in high:
+        assert format_entry(*row) in lines
+    assert 'Week of 2026-01-05: 7 low-severity entries' in lines
+
+
+def test_compaction_is_deterministic():
+    journal = sorted(rows(range(20), 'cough', 'Low') + rows(range(0, 20, 3), 'fever', 'Medium'),
+                     key=lambda row: row[0])
+
+    assert compact_journal_lines(journal, 20) == compact_journal_lines(list(journal), 20)
+
+
+def test_report_prompt_stays_within_the_budget(app, user):
+    app.config['PROMPT_TOKEN_BUDGET'] = 1500
+    for day in range(200):
+        db.session.add(JournalEntry(user_id=user.id, title='Log', content=f'headache, day {day % 7}',
+                                    severity='Low', created_at=MONDAY + timedelta(hours=12 * day)))
+    db.session.commit()
+    generator = ReportGenerator(user.id)
+
+    raw_data = generator.fetch_data(date(2026, 1, 1), date(2026, 5, 1))
+
+    assert raw_data[0].startswith('### RECENT SYMPTOMS\n')
+    assert estimate_tokens(generator.build_prompt(raw_data)) <= 1500
@@ -0,0 +1,47 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from Website import db
+from Website.models import JournalEntry, User, Visit
+from Website.query_plans import check_query_plans
+
+
+@pytest.fixture
+def user(app):
+    user = User(username='plans', email='plans@example.com')
+    user.set_password('plans')
+    db.session.add(user)
+    db.session.flush()
+    visit = Visit(reason='checkup', doctor_name='Dr. A', visit_date=datetime.utcnow(), user_id=user.id)
+    db.session.add(visit)
+    db.session.flush()
+    # one linked and one standalone entry, so the timeline also loads both kinds
+    db.session.add_all([JournalEntry(title='linked', content='c', severity='Low', user_id=user.id, visit_id=visit.id),
+                        JournalEntry(title='standalone', content='c', severity='Low', user_id=user.id)])
+    db.session.commit()
+    return user
+
+
+def test_hot_queries_use_indexes(user):
+    results = check_query_plans(user.id)
+    assert any(name.startswith('report rows') for name in results)
+    assert any(name.startswith('timeline') for name in results)
+    scans = {name: plan for name, (plan, ok) in results.items() if not ok}
+    assert not scans
+
+
+def test_missing_index_is_reported(user):
+    if db.engine.dialect.name != 'sqlite':
+        pytest.skip('drops an index; only on the throwaway SQLite database')
+    db.session.execute(db.text('DROP INDEX ix_medication_user_id_name'))
+    results = check_query_plans(user.id)
+    assert not results['medications'][1]
+
+
+def test_other_databases_are_skipped(user, monkeypatch, caplog):
+    monkeypatch.setattr(db.session, 'get_bind', lambda *args, **kwargs: SimpleNamespace(
+        dialect=SimpleNamespace(name='mysql')))
+    assert check_query_plans(user.id) == {}
+    assert 'skipped' in caplog.text
@@ -0,0 +1,94 @@
+import pytest
+
+from Website import db
+from Website.models import JournalEntry, Medication, User
+
+
+@pytest.fixture
+def client(client):
+    # shows the login flash message, after which the pages are conditional
+    client.get('/dashboard')
+    return client
+
+
+def etag_of(client, url='/dashboard'):
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def revalidate(client, etag, url='/dashboard'):
+    return client.get(url, headers={'If-None-Match': etag})
+
+
+def test_unchanged_page_is_answered_with_304(app, client):
+    response = client.get('/dashboard')
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+    response = revalidate(client, etag)
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_a_change_to_the_users_records_changes_the_etag(app, client, user):
+    etag = etag_of(client, '/medications')
+
+    db.session.add(Medication(user_id=user.id, name='Ibuprofen', dosage='200mg'))
+    db.session.commit()
+
+    response = revalidate(client, etag, '/medications')
+    assert response.status_code == 200
+    assert b'Ibuprofen' in response.data
+    assert response.headers['ETag'] != etag
+
+
+def test_writes_through_the_views_change_the_etag(app, client):
+    etag = etag_of(client)
+
+    client.post('/add-journal', data={'title': 'Migraine', 'content': 'Woke up with one', 'severity': 'High'})
+    # the redirect target shows the flash and renders in full
+    assert client.get('/dashboard').status_code == 200
+
+    assert revalidate(client, etag).status_code == 200
+
+
+def test_a_no_op_write_keeps_the_etag(app, client, user):
+    entry = JournalEntry(user_id=user.id, title='Migraine', content='Woke up with one', severity='High')
+    db.session.add(entry)
+    db.session.commit()
+    etag = etag_of(client)
+
+    entry.title = 'Migraine'
+    db.session.commit()
+
+    assert revalidate(client, etag).status_code == 304
+
+
+def test_other_users_writes_keep_the_etag(app, client):
+    etag = etag_of(client)
+    other = User(username='other', email='other@example.com')
+    other.set_password('other')
+    db.session.add(other)
+    db.session.commit()
+
+    db.session.add(Medication(user_id=other.id, name='Aspirin'))
+    db.session.commit()
+
+    assert revalidate(client, etag).status_code == 304
+
+
+def test_a_pending_flash_message_is_always_rendered(app, client):
+    etag = etag_of(client)
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Entry saved')]
+
+    response = revalidate(client, etag)
+
+    assert response.status_code == 200
+    assert b'Entry saved' in response.data
+    # shown once; the next revalidation is a 304 again
+    assert revalidate(client, etag).status_code == 304
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from Website import db
+from Website.models import JournalEntry, Medication, User
+from Website.search import search_records
+
+
+def add_records(user):
+    db.session.add_all([
+        JournalEntry(title='Migraine attack', content='Throbbing headache since morning', severity='High',
+                     user_id=user.id),
+        JournalEntry(title='Knee', content='Sore after running', severity='Low', user_id=user.id),
+        Medication(name='Sumatriptan', dosage='50mg', notes='for migraine', user_id=user.id),
+    ])
+    db.session.commit()
+
+
+def test_ranked_prefix_search_with_highlighted_snippets(user):
+    add_records(user)
+
+    results = search_records(user.id, 'migr')
+
+    assert results.total == 2
+    assert {hit.type for hit in results.hits} == {'journal', 'medication'}
+    # a title match ranks above a notes match
+    assert results.hits[0].data.title == 'Migraine attack'
+    assert '<mark class="highlight">Migraine</mark>' in results.hits[0].snippet
+
+
+def test_search_only_sees_the_users_own_records(user):
+    add_records(user)
+    other = User(username='other', email='other@example.com')
+    other.set_password('other')
+    db.session.add(other)
+    db.session.commit()
+
+    assert search_records(other.id, 'migraine').total == 0
+
+
+def test_search_index_follows_edits_and_deletes(user):
+    add_records(user)
+    entry = JournalEntry.query.filter_by(title='Knee').one()
+
+    entry.content = 'Swollen after cycling'
+    db.session.commit()
+    assert search_records(user.id, 'running').total == 0
+    assert search_records(user.id, 'cycling').total == 1
+
+    db.session.delete(entry)
+    db.session.commit()
+    assert search_records(user.id, 'cycling').total == 0
+
+
+def test_snippets_are_html_escaped(user):
+    db.session.add(JournalEntry(title='Odd entry', content='<script>alert(1)</script> xss attempt', severity='Low',
+                                user_id=user.id))
+    db.session.commit()
+
+    snippet = search_records(user.id, 'xss').hits[0].snippet
+    assert '<script>' not in snippet and '&lt;script&gt;' in snippet
+
+
+def test_other_databases_fall_back_to_substring_search(user, monkeypatch, caplog):
+    add_records(user)
+    bind = db.session.get_bind()
+    monkeypatch.setattr(db.session, 'get_bind', lambda *args, **kwargs: SimpleNamespace(
+        dialect=SimpleNamespace(name='mysql'), url=bind.url))
+
+    results = search_records(user.id, 'migraine', per_page=1)
+
+    assert results.total == 2
+    assert len(results.hits) == 1
+    assert search_records(user.id, 'migraine headache').total == 1
+    # "_" is a LIKE wildcard; it must be matched literally
+    assert search_records(user.id, 'a_b').total == 0
+    assert 'falls back' in caplog.text
@@ -0,0 +1,142 @@
+import hashlib
+import io
+import os
+
+from Website import db
+from Website.models import MedicalDocument, StoredBlob, User
+from Website.storage import get_storage
+
+PDF = b'%PDF-1.4 test document'
+
+
+def upload(client, data=PDF, name='report.pdf'):
+    return client.post('/upload-document', data={'file': (io.BytesIO(data), name), 'visit': 0},
+                       content_type='multipart/form-data')
+
+
+def stored_blob(data=PDF):
+    sha256 = hashlib.sha256(data).hexdigest()
+    return sha256, get_storage().path_for(sha256)
+
+
+def test_same_content_is_stored_once_and_refcounted(app, client):
+    upload(client)
+    upload(client, name='copy.pdf')
+    sha256, path = stored_blob()
+
+    docs = MedicalDocument.query.order_by(MedicalDocument.id).all()
+    assert [doc.content_hash for doc in docs] == [sha256, sha256]
+    assert db.session.get(StoredBlob, sha256).refcount == 2
+    with open(path, 'rb') as f:
+        assert f.read() == PDF
+
+    client.post(f'/delete-document/{docs[0].id}')
+    db.session.expire_all()
+    assert db.session.get(StoredBlob, sha256).refcount == 1
+    assert os.path.exists(path)
+
+    client.post(f'/delete-document/{docs[1].id}')
+    db.session.expire_all()
+    assert db.session.get(StoredBlob, sha256) is None
+    assert not os.path.exists(path)
+
+
+def test_collect_puts_the_file_back_for_a_reference_committed_meanwhile(app, client, monkeypatch):
+    upload(client)
+    sha256, path = stored_blob()
+    storage = get_storage()
+    # first check: no reference yet; by the second, a new upload has committed one
+    answers = iter([False, True])
+    monkeypatch.setattr(storage, '_referenced', lambda _: next(answers))
+
+    storage.collect(sha256)
+
+    assert os.path.exists(path)
+    assert not [name for name in os.listdir(os.path.dirname(path)) if name.endswith('.gc')]
+
+
+def test_store_moves_its_copy_in_even_if_a_collect_removed_the_file(app, user):
+    storage = get_storage()
+    writer = storage.writer()
+    writer.write(PDF)
+    with storage.store(writer) as blob:
+        storage.add_reference(blob)
+        db.session.commit()
+        # a collect() that checked before our commit removes the existing copy
+        if os.path.exists(blob.path):
+            os.remove(blob.path)
+    with open(blob.path, 'rb') as f:
+        assert f.read() == PDF
+
+
+def test_upload_past_max_document_size_is_refused(app, client):
+    app.config['MAX_DOCUMENT_SIZE'] = 1024
+    get_storage().max_size = 1024
+
+    # well past the limit: refused while the request body is parsed
+    assert upload(client, PDF + b'x' * 256 * 1024).status_code == 413
+    # just past it: refused by the streaming writer, nothing stored
+    response = upload(client, PDF + b'x' * 2048)
+    assert response.status_code == 200
+    assert b'at most' in response.data
+    assert MedicalDocument.query.count() == 0
+    assert os.listdir(os.path.join(get_storage().root, 'tmp')) == []
+
+
+def download(client, **headers):
+    doc = MedicalDocument.query.one()
+    return client.get(f'/documents/{doc.id}/download', headers=headers)
+
+
+def test_download_answers_range_requests(app, client):
+    upload(client)
+
+    response = download(client, Range='bytes=5-8')
+
+    assert response.status_code == 206
+    assert response.data == PDF[5:9]
+    assert response.headers['Content-Range'] == f'bytes 5-8/{len(PDF)}'
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_download_revalidates_with_the_content_hash(app, client):
+    upload(client)
+    sha256, _ = stored_blob()
+
+    response = download(client)
+    assert response.status_code == 200
+    assert response.data == PDF
+    assert response.headers['ETag'] == f'"{sha256}"'
+
+    response = download(client, **{'If-None-Match': f'"{sha256}"'})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_download_is_handed_to_the_proxy(app, client):
+    app.config['DOCUMENT_SENDFILE'] = 'x-accel'
+    upload(client)
+    sha256, path = stored_blob()
+
+    response = download(client)
+
+    assert response.status_code == 200
+    assert response.data == b''
+    relpath = os.path.relpath(path, get_storage().root).replace(os.sep, '/')
+    assert response.headers['X-Accel-Redirect'] == f'/_documents/{relpath}'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="report.pdf"'
+    assert response.headers['Content-Type'] == 'application/pdf'
+    assert download(client, **{'If-None-Match': f'"{sha256}"'}).status_code == 304
+
+
+def test_other_users_documents_are_not_served(app, client):
+    upload(client)
+    other = User(username='other', email='other@example.com')
+    other.set_password('other')
+    db.session.add(other)
+    db.session.commit()
+    doc = MedicalDocument.query.one()
+    doc.user_id = other.id
+    db.session.commit()
+
+    assert client.get(f'/documents/{doc.id}/download').status_code == 404
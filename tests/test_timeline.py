@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from Website import db
+from Website.models import JournalEntry, Visit
+from Website.timeline import InvalidCursor, decode_cursor, encode_cursor, fetch_timeline_page
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def add_history(user):
+    '''Visits every 3 days and entries every day (every 5th linked to a
+    visit), so visits share their timestamp with an entry: the tie-break.'''
+    visits = [Visit(reason=f'visit {i}', visit_date=START + timedelta(days=3 * i), user_id=user.id)
+              for i in range(10)]
+    db.session.add_all(visits)
+    db.session.flush()
+    entries = [JournalEntry(title=f'entry {i}', content='c', severity='Low', created_at=START + timedelta(days=i),
+                            user_id=user.id, visit_id=visits[0].id if i % 5 == 0 else None)
+               for i in range(30)]
+    db.session.add_all(entries)
+    db.session.commit()
+
+
+def walk(user, limit):
+    events, cursor = fetch_timeline_page(user.id, limit=limit)
+    pages = [events]
+    while cursor:
+        events, cursor = fetch_timeline_page(user.id, cursor=cursor, limit=limit)
+        pages.append(events)
+    return pages
+
+
+def test_pages_cover_the_merged_timeline_once_in_order(user):
+    add_history(user)
+
+    pages = walk(user, limit=7)
+    events = [(e['type'], e['data'].id) for page in pages for e in page]
+
+    # 10 visits + the 24 entries not linked to a visit
+    assert len(events) == 34 and len(set(events)) == 34
+    assert all(len(page) == 7 for page in pages[:-1])
+    keys = [(e['date'], e['type'], e['data'].id) for page in pages for e in page]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_page_size_dividing_the_total_has_no_empty_last_page(user):
+    add_history(user)
+    pages = walk(user, limit=17)
+    assert [len(page) for page in pages] == [17, 17]
+
+
+def test_other_users_events_are_not_included(user):
+    add_history(user)
+    assert fetch_timeline_page(user.id + 1) == ([], None)
+
+
+def test_cursor_round_trip():
+    when = datetime(2024, 5, 6, 7, 8, 9)
+    assert decode_cursor(encode_cursor(when, 'visit', 42)) == (when, 'visit', 42)
+
+
+@pytest.mark.parametrize('token', ['', 'not base64!', 'bm90IGpzb24', 'WyJ4Il0', 'WyJub3QgYSBkYXRlIiwgInZpc2l0IiwgMV0'])
+def test_malformed_cursors_are_rejected(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_timeline_endpoint(client, user):
+    add_history(user)
+    first = client.get('/dashboard').get_data(as_text=True)
+    cursor = first.split('data-cursor="')[1].split('"')[0]
+
+    response = client.get('/timeline', query_string={'cursor': cursor})
+    assert response.status_code == 200
+    assert 'entry' in response.json['html']
+
+    assert client.get('/timeline').status_code == 400
+    assert client.get('/timeline', query_string={'cursor': 'garbage'}).status_code == 400